@@ -27,6 +27,7 @@ def run_mcda_lcpa(
     human_designed_route: shapely.LineString,
     raster_name_prefix: str,
     compute_rasters_in_parallel: bool,
+    search_method: str = "mcp",
 ):
     reset_geopackage(Config.PATH_GEOPACKAGE_MCDA_OUTPUT, truncate=False)
 
@@ -34,23 +35,27 @@ def run_mcda_lcpa(
 
     mcda_engine = McdaCostSurfaceEngine(preset, path_geopackage_mcda_input, project_area_geometry, raster_name_prefix)
     mcda_engine.preprocess_vectors()
-    path_suitability_raster = mcda_engine.preprocess_rasters(
+    # Keep the cost surface in memory such that LCPA and the evaluation do not read it from disk again.
+    cost_surface = mcda_engine.preprocess_rasters(
         mcda_engine.processed_vectors,
         cell_size=Config.RASTER_CELL_SIZE,
         max_block_size=Config.MAX_BLOCK_SIZE,
         run_in_parallel=compute_rasters_in_parallel,
+        use_shared_memory=True,
+        in_memory=True,
     )
 
     lcpa_engine = LcpaUtilityRouteEngine()
     lcpa_engine.get_lcpa_route(
-        path_suitability_raster,
+        cost_surface,
         shapely.LineString(start_mid_end_points),
         mcda_engine.raster_preset.general.project_area_geometry,
+        search_method=search_method,
     )
 
     logger.info(f"Route CPU time: {(time.process_time_ns() - start_cpu_time) / 1e9:.2f} seconds.")
     route_evaluation_metrics = RouteEvaluationMetrics(
-        lcpa_engine.lcpa_result, path_suitability_raster, human_designed_route, project_area_geometry
+        lcpa_engine.lcpa_result, cost_surface, human_designed_route, project_area_geometry
     )
     route_evaluation_metrics.get_route_evaluation_metrics()
 
@@ -29,10 +29,35 @@ class Config:
     FINAL_RASTER_VALUE_LIMIT_LOWER = 1
     FINAL_RASTER_VALUE_LIMIT_UPPER = 126
 
+    # LCPA
+    # Hierarchical routing: cells combined to one coarse cell in each direction and the initial corridor around the
+    # coarse route in meters in which the route is refined at full resolution.
+    LCPA_DOWNSAMPLE_FACTOR = 8
+    LCPA_CORRIDOR_WIDTH = 25
+    # Quadtree graph: distance in cells between the portals on the boundary of a leaf, 1 keeps the exact route costs and
+    # a larger spacing gives approximate route costs, and the size in cells of the largest leaf, a power of 2.
+    LCPA_QUADTREE_PORTAL_SPACING = 1
+    LCPA_QUADTREE_MAX_LEAF_SIZE = 32
+    # Overlay graph: size in cells of the square blocks of which the boundary-to-boundary costs are precomputed.
+    LCPA_OVERLAY_BLOCK_SIZE = 64
+    # Landmarks: number of landmark cells of which the cost distance is precomputed as lower bound for the A* search.
+    LCPA_NUMBER_OF_LANDMARKS = 8
+    # Landmarks: priority range expanded per iteration, the tight landmark bounds favour a narrow bucket.
+    LCPA_LANDMARK_BUCKET_WIDTH = 16
+    # Out-of-core search: size in cells of the square blocks which are read from the raster on demand, and the number
+    # of decoded blocks kept in memory.
+    LCPA_OUT_OF_CORE_BLOCK_SIZE = 512
+    LCPA_OUT_OF_CORE_MAX_BLOCKS = 64
+    # Route cache: maximum size in bytes of the cached routes, the least recently used routes are evicted first.
+    LCPA_ROUTE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    # Trace the peak memory of the searches with tracemalloc, off by default as tracing slows down the searches.
+    LCPA_TRACE_PEAK_MEMORY = False
+
     # input/output paths.
     PATH_RESULTS = BASEDIR / "data/processed"
     PATH_GEOPACKAGE_MCDA_OUTPUT = BASEDIR / "data/processed/mcda_output.gpkg"
     PATH_GEOPACKAGE_LCPA_OUTPUT = BASEDIR / "data/processed/lcpa_results.gpkg"
+    PATH_LCPA_ROUTE_CACHE = BASEDIR / "data/processed/lcpa_route_cache.sqlite"
 
     # Testing paths.
     PATH_EXAMPLE_RASTER = BASEDIR / "data/examples/pytest_example_suitability_raster.tif"
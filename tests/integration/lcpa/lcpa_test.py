@@ -3,22 +3,58 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import pytest
+import rasterio
 import shapely
+from affine import Affine
+from skimage.graph import route_through_array
 
+from utility_route_planner.models.lcpa.lcpa_csr_graph import load_csr_graph
 from utility_route_planner.models.lcpa.lcpa_datastructures import LcpaInputModel
 from utility_route_planner.models.lcpa.lcpa_engine import LcpaUtilityRouteEngine
+from utility_route_planner.models.lcpa.lcpa_route_cache import RouteCache
+from utility_route_planner.models.mcda.mcda_datastructures import CostSurface
 from settings import Config
+from utility_route_planner.util.geo_utilities import read_cost_surface
 from utility_route_planner.util.write import reset_geopackage
 import geopandas as gpd
 import numpy as np
 
 
+# Project area covering the complete cost surface, and a route sketch with a stop in it.
+PROJECT_AREA = shapely.box(174000.0, 450900.0, 174100.0, 451000.0)
+UTILITY_ROUTE_SKETCH = shapely.LineString([(174001.2, 450950.2), (174050.7, 450990.2), (174098.7, 450950.2)])
+
+
 @pytest.fixture
 def setup_clean_start(monkeypatch):
     reset_geopackage(Config.PATH_GEOPACKAGE_LCPA_OUTPUT)
     monkeypatch.setattr(Config, "DEBUG", True)
 
 
+@pytest.fixture
+def cost_surface():
+    """Random cost surface of 200x200 cells with a wall of no data, of which PROJECT_AREA is the extent."""
+    array = np.random.default_rng(4).integers(1, 127, (200, 200)).astype("int8")
+    array[50:150, 100] = Config.FINAL_RASTER_NO_DATA
+    return CostSurface(array, Affine(0.5, 0.0, 174000.0, 0.0, -0.5, 451000.0))
+
+
+def assert_route_equals_lcpa_route(
+    lcpa_engine: LcpaUtilityRouteEngine,
+    route: shapely.LineString,
+    path_raster: str | CostSurface,
+    utility_route_sketch: shapely.LineString = UTILITY_ROUTE_SKETCH,
+):
+    """Check the legs and end points of the route against get_lcpa_route on the suitability raster."""
+    expected_engine = LcpaUtilityRouteEngine()
+    expected_route = expected_engine.get_lcpa_route(path_raster, utility_route_sketch, PROJECT_AREA)
+    assert [leg_result.cost for leg_result in lcpa_engine.leg_results] == pytest.approx(
+        [leg_result.cost for leg_result in expected_engine.leg_results]
+    )
+    assert route.coords[0] == expected_route.coords[0]
+    assert route.coords[-1] == expected_route.coords[-1]
+
+
 @pytest.mark.usefixtures("setup_clean_start")
 class TestUtilityRoutes:
     @pytest.mark.parametrize(
@@ -38,6 +74,18 @@ class TestUtilityRoutes:
         for route_point in lcpa_engine.route_model.route_points.geometry.tolist():
             assert lcpa_engine.lcpa_result.dwithin(route_point, Config.RASTER_CELL_SIZE)
 
+    @pytest.mark.parametrize("search_method", ["compact", "astar", "bucket"])
+    def test_search_method_equals_cost_on_example_raster(self, search_method):
+        # Benchmark against route_through_array, the time and expanded nodes of each are logged by get_lcpa_route.
+        utility_route_sketch = shapely.LineString([(174753.97, 451038.03), (175775.00, 450411.52)])
+        lcpa_engine = LcpaUtilityRouteEngine()
+        lcpa_engine.get_lcpa_route(Config.PATH_EXAMPLE_RASTER, utility_route_sketch)
+        leg_results = lcpa_engine.leg_results
+
+        lcpa_engine.get_lcpa_route(Config.PATH_EXAMPLE_RASTER, utility_route_sketch, search_method=search_method)
+        for leg_result, leg_result_search_method in zip(leg_results, lcpa_engine.leg_results, strict=True):
+            assert leg_result_search_method.cost == pytest.approx(leg_result.cost, rel=1e-6)
+
     @pytest.mark.parametrize(
         "utility_route_sketch",
         [
@@ -61,6 +109,18 @@ class TestUtilityRoutes:
         for route_point in lcpa_engine.route_model.route_points.geometry.tolist():
             assert lcpa_engine.lcpa_result.dwithin(route_point, Config.RASTER_CELL_SIZE)
 
+    def test_get_utility_route_from_cost_surface_in_memory(self):
+        utility_route_sketch = shapely.LineString(
+            [(174998.02, 451155.50), (174815.78, 450568.64), (175775.00, 450411.52)]
+        )
+        lcpa_engine = LcpaUtilityRouteEngine()
+        route_from_file = lcpa_engine.get_lcpa_route(Config.PATH_EXAMPLE_RASTER, utility_route_sketch)
+        route_from_memory = lcpa_engine.get_lcpa_route(
+            read_cost_surface(Config.PATH_EXAMPLE_RASTER), utility_route_sketch
+        )
+
+        assert route_from_file.equals_exact(route_from_memory, tolerance=0)
+
     @pytest.mark.parametrize(
         "utility_route_sketch",
         [
@@ -108,14 +168,15 @@ class TestShortestPath:
             ],
         ],
     )
-    def test_get_easy_utility_route(self, valid_input):
+    @pytest.mark.parametrize("search_method", ["mcp", "compact", "astar", "bucket", "quadtree"])
+    def test_get_easy_utility_route(self, valid_input, search_method):
         lcpa_engine = LcpaUtilityRouteEngine()
         input_model = LcpaInputModel(
             shapely.LineString([[0, 0], [4, -4]]),  # Note the negative y due to rasters starting from top-left side.
             tuple([0, 1, 0, 0, 0, -1]),
         )
         array, expected_indices = valid_input
-        _, indices = lcpa_engine.calculate_least_cost_path(array, input_model)
+        _, indices = lcpa_engine.calculate_least_cost_path(array, input_model, search_method)
         assert indices == expected_indices
 
     @pytest.mark.parametrize(
@@ -142,7 +203,8 @@ class TestShortestPath:
             ),
         ],
     )
-    def test_get_utility_route_which_is_unsolvable_due_to_no_data(self, invalid_input):
+    @pytest.mark.parametrize("search_method", ["mcp", "compact", "astar", "bucket", "quadtree"])
+    def test_get_utility_route_which_is_unsolvable_due_to_no_data(self, invalid_input, search_method):
         lcpa_engine = LcpaUtilityRouteEngine()
 
         input_model = LcpaInputModel(
@@ -150,4 +212,333 @@ class TestShortestPath:
             tuple([0, 1, 0, 0, 0, -1]),
         )
         with pytest.raises(ValueError):
-            lcpa_engine.calculate_least_cost_path(invalid_input, input_model)
+            lcpa_engine.calculate_least_cost_path(invalid_input, input_model, search_method)
+
+    def test_compact_utility_route_with_stops_on_int8_array(self):
+        array = np.random.default_rng(0).integers(1, 127, (50, 50)).astype("int8")
+        array[10:40, 25] = -1
+        input_model = LcpaInputModel(shapely.LineString([[2, -2], [30, -20], [45, -45]]), tuple([0, 1, 0, 0, 0, -1]))
+
+        path, indices = LcpaUtilityRouteEngine.calculate_least_cost_path(array, input_model, "compact")
+        expected_path, expected_indices = LcpaUtilityRouteEngine.calculate_least_cost_path(array, input_model)
+
+        assert path.dtype == array.dtype
+        assert indices == expected_indices
+
+    @pytest.mark.parametrize("search_method", ["mcp", "compact", "astar", "bucket", "quadtree"])
+    def test_legs_in_parallel_equal_sequential_legs(self, search_method):
+        array = np.random.default_rng(2).integers(1, 127, (60, 60)).astype("int8")
+        input_model = LcpaInputModel(
+            shapely.LineString([[1, -1], [30, -40], [55, -10], [5, -58]]), tuple([0, 1, 0, 0, 0, -1])
+        )
+
+        path, indices = LcpaUtilityRouteEngine.calculate_least_cost_path(array, input_model, search_method)
+        path_parallel, indices_parallel = LcpaUtilityRouteEngine.calculate_least_cost_path(
+            array, input_model, search_method, run_in_parallel=True
+        )
+
+        assert indices_parallel == indices
+        assert np.array_equal(path_parallel, path)
+        # The stops are the junction cells of the legs, these are present only once.
+        for stop in input_model.idx_stops:
+            assert indices.count(stop) == 1
+
+    def test_stitch_leg_indices(self):
+        indices = LcpaUtilityRouteEngine.stitch_leg_indices([[(0, 0), (1, 1)], [(1, 1), (2, 2)], [(2, 2), (2, 3)]])
+        assert indices == [(0, 0), (1, 1), (2, 2), (2, 3)]
+
+    def test_one_to_many_legs_equal_cost_as_separate_legs(self):
+        array = np.random.default_rng(1).integers(1, 127, (60, 60)).astype("int8")
+        array[0, 0] = -1  # The start of a route may be no data, this leg cannot be reversed.
+        legs = [((0, 0), (30, 10)), ((30, 10), (50, 50)), ((50, 50), (5, 55)), ((5, 55), (59, 0))]
+
+        leg_results = LcpaUtilityRouteEngine.calculate_legs_using_reused_graph(array, legs)
+        leg_results_one_to_many = LcpaUtilityRouteEngine.calculate_legs_using_reused_graph(
+            array, legs, one_to_many=True
+        )
+
+        for (start, end), leg_result, leg_result_one_to_many in zip(legs, leg_results, leg_results_one_to_many):
+            assert leg_result.indices == route_through_array(array, start, end, geometric=True, fully_connected=True)[0]
+            assert (leg_result_one_to_many.indices[0], leg_result_one_to_many.indices[-1]) == (start, end)
+            assert leg_result_one_to_many.cost == pytest.approx(leg_result.cost)
+
+    def test_astar_legs_equal_cost_with_less_expanded_nodes(self):
+        # The heuristic is the lowest cost times the distance, which prunes most when the costs are close to it.
+        array = np.random.default_rng(3).integers(1, 4, (80, 80)).astype("int8")
+        array[20:60, 40] = -1
+        input_model = LcpaInputModel(shapely.LineString([[5, -40], [75, -42], [70, -75]]), tuple([0, 1, 0, 0, 0, -1]))
+
+        leg_results = LcpaUtilityRouteEngine.calculate_legs(array, input_model)
+        leg_results_astar = LcpaUtilityRouteEngine.calculate_legs(array, input_model, "astar")
+
+        for leg_result, leg_result_astar in zip(leg_results, leg_results_astar):
+            assert leg_result_astar.cost == pytest.approx(leg_result.cost)
+            assert leg_result_astar.expanded_nodes < leg_result.expanded_nodes
+
+    def test_unknown_search_method(self):
+        input_model = LcpaInputModel(shapely.LineString([[0, 0], [4, -4]]), tuple([0, 1, 0, 0, 0, -1]))
+        with pytest.raises(ValueError):
+            LcpaUtilityRouteEngine.calculate_legs(np.ones((5, 5)), input_model, "dijkstra")
+
+    @pytest.mark.parametrize("search_method", ["mcp", "compact", "astar", "bucket"])
+    def test_hierarchical_legs_equal_cost_as_full_resolution_legs(self, search_method):
+        array = np.full((160, 160), 80, dtype="int8")
+        array[60:72, :] = 2
+        array[:, 100:112] = 2
+        input_model = LcpaInputModel(
+            shapely.LineString([[5, -50], [150, -80], [120, -155]]), tuple([0, 1, 0, 0, 0, -1])
+        )
+
+        leg_results = LcpaUtilityRouteEngine.calculate_legs(array, input_model, search_method)
+        leg_results_hierarchical = LcpaUtilityRouteEngine.calculate_legs(
+            array, input_model, search_method, hierarchical=True, corridor_width=5
+        )
+
+        for leg_result, leg_result_hierarchical in zip(leg_results, leg_results_hierarchical):
+            assert leg_result_hierarchical.cost == pytest.approx(leg_result.cost, rel=1e-6)
+            assert leg_result_hierarchical.indices[0] == leg_result.indices[0]
+            assert leg_result_hierarchical.indices[-1] == leg_result.indices[-1]
+
+
+@pytest.mark.usefixtures("setup_clean_start")
+class TestBatchRoutes:
+    def test_batch_routes_equal_single_routes(self, cost_surface):
+        substation = (174090.2, 450950.2)
+        utility_route_sketches = gpd.GeoDataFrame(
+            {"connection_id": ["a", "b", "c", "d"]},
+            geometry=[
+                shapely.LineString([(174001.2, 450990.2), substation]),
+                shapely.LineString([(174010.2, 450905.2), substation]),
+                shapely.LineString([(174030.2, 450960.2), (174060.2, 450980.2), substation]),
+                shapely.LineString([substation, (174002.2, 450930.2)]),
+            ],
+            crs=Config.CRS,
+        )
+
+        lcpa_results = LcpaUtilityRouteEngine().get_lcpa_routes(cost_surface, utility_route_sketches, PROJECT_AREA)
+
+        assert lcpa_results.connection_id.tolist() == ["a", "b", "c", "d"]
+        for utility_route_sketch, lcpa_result in zip(utility_route_sketches.geometry, lcpa_results.itertuples()):
+            lcpa_engine = LcpaUtilityRouteEngine()
+            lcpa_engine.get_lcpa_route(cost_surface, utility_route_sketch, PROJECT_AREA)
+            assert lcpa_result.cost == pytest.approx(sum(leg_result.cost for leg_result in lcpa_engine.leg_results))
+            assert lcpa_result.geometry.coords[0] == lcpa_engine.lcpa_result.coords[0]
+            assert lcpa_result.geometry.coords[-1] == lcpa_engine.lcpa_result.coords[-1]
+
+    def test_batch_routes_with_unreachable_route(self, cost_surface):
+        cost_surface.array[100:110, 0:10] = Config.FINAL_RASTER_NO_DATA
+        cost_surface.array[104, 4] = 10
+        utility_route_sketches = gpd.GeoDataFrame(
+            geometry=[
+                shapely.LineString([(174050.2, 450990.2), (174002.2, 450947.7)]),
+                shapely.LineString([(174050.2, 450990.2), (174090.2, 450910.2)]),
+            ],
+            crs=Config.CRS,
+        )
+
+        lcpa_results = LcpaUtilityRouteEngine().get_lcpa_routes(cost_surface, utility_route_sketches, PROJECT_AREA)
+
+        assert lcpa_results.geometry.iloc[0] is None
+        assert lcpa_results.cost.iloc[0] == np.inf
+        assert np.isfinite(lcpa_results.cost.iloc[1])
+
+
+class TestCostDistanceRoutes:
+    def test_routes_from_cost_distance_equal_least_cost_paths(self, tmp_path):
+        # Larger than a single tile of the rasters, such that a path is read from multiple tiles.
+        array = np.random.default_rng(5).integers(1, 127, (600, 400)).astype("int8")
+        array[100:500, 200] = Config.FINAL_RASTER_NO_DATA
+        cost_surface = CostSurface(array, Affine(0.5, 0.0, 174000.0, 0.0, -0.5, 451000.0))
+        project_area = shapely.box(174000.0, 450700.0, 174200.0, 451000.0)
+        substation = shapely.Point(174100.2, 450850.2)
+
+        lcpa_engine = LcpaUtilityRouteEngine()
+        cost_distance_rasters = lcpa_engine.compute_cost_distance_rasters(
+            cost_surface, [substation], project_area, path_output=tmp_path
+        )
+        with rasterio.open(cost_distance_rasters.path_directions) as src:
+            assert src.transform == cost_surface.transform
+            assert src.dtypes[0] == "uint8"
+
+        for destination in [shapely.Point(174001.2, 450999.2), shapely.Point(174190.7, 450702.2)]:
+            route = lcpa_engine.get_lcpa_route_from_cost_distance(cost_distance_rasters, destination)
+            leg_result = lcpa_engine.leg_results[0]
+
+            expected_route = LcpaUtilityRouteEngine().get_lcpa_route(
+                cost_surface, shapely.LineString([substation, destination]), project_area
+            )
+            _, expected_cost = route_through_array(
+                np.where(array == Config.FINAL_RASTER_NO_DATA, -1, array),
+                leg_result.indices[0],
+                leg_result.indices[-1],
+                geometric=True,
+                fully_connected=True,
+            )
+            assert leg_result.cost == pytest.approx(expected_cost, rel=1e-6)
+            assert route.coords[0] == expected_route.coords[0]
+            assert route.coords[-1] == expected_route.coords[-1]
+
+    def test_route_from_cost_distance_unreachable(self, tmp_path):
+        array = np.ones((20, 20), dtype="int8")
+        array[:, 10] = Config.FINAL_RASTER_NO_DATA
+        cost_surface = CostSurface(array, Affine(0.5, 0.0, 174000.0, 0.0, -0.5, 451000.0))
+
+        lcpa_engine = LcpaUtilityRouteEngine()
+        cost_distance_rasters = lcpa_engine.compute_cost_distance_rasters(
+            cost_surface,
+            [shapely.Point(174001.2, 450999.2)],
+            shapely.box(174000.0, 450990.0, 174010.0, 451000.0),
+            "a_",
+            tmp_path,
+        )
+        with pytest.raises(ValueError):
+            lcpa_engine.get_lcpa_route_from_cost_distance(cost_distance_rasters, shapely.Point(174008.2, 450999.2))
+
+
+class TestCsrGraphRoutes:
+    def test_routes_from_csr_graph_equal_routes_from_raster(self, cost_surface, tmp_path):
+        lcpa_engine = LcpaUtilityRouteEngine()
+        path_graph = lcpa_engine.compute_csr_graph(cost_surface, PROJECT_AREA, tmp_path / "graph")
+        for utility_route_sketch in [
+            shapely.LineString([(174001.2, 450999.2), (174090.7, 450902.2)]),
+            UTILITY_ROUTE_SKETCH,
+        ]:
+            route = lcpa_engine.get_lcpa_route_from_csr_graph(path_graph, utility_route_sketch)
+            assert_route_equals_lcpa_route(lcpa_engine, route, cost_surface, utility_route_sketch)
+
+    def test_csr_graph_is_loaded_once_until_rewritten(self, cost_surface, tmp_path):
+        lcpa_engine = LcpaUtilityRouteEngine()
+        path_graph = lcpa_engine.compute_csr_graph(cost_surface, PROJECT_AREA, tmp_path / "graph")
+        lcpa_engine.get_lcpa_route_from_csr_graph(path_graph, UTILITY_ROUTE_SKETCH)
+        csr_graph = load_csr_graph(path_graph)
+
+        # A second route reuses the memory-mapped graph.
+        route = lcpa_engine.get_lcpa_route_from_csr_graph(path_graph, UTILITY_ROUTE_SKETCH)
+        assert load_csr_graph(path_graph) is csr_graph
+        assert_route_equals_lcpa_route(lcpa_engine, route, cost_surface)
+
+        # Closing the gap above the wall and rewriting the graph at the same path reloads it, such that the route
+        # follows the changed cost surface.
+        cost_surface.array[:50, 100] = Config.FINAL_RASTER_NO_DATA
+        lcpa_engine.compute_csr_graph(cost_surface, PROJECT_AREA, path_graph)
+        route = lcpa_engine.get_lcpa_route_from_csr_graph(path_graph, UTILITY_ROUTE_SKETCH)
+        assert load_csr_graph(path_graph) is not csr_graph
+        assert_route_equals_lcpa_route(lcpa_engine, route, cost_surface)
+
+
+class TestOverlayGraphRoutes:
+    def test_routes_from_overlay_graph_equal_routes_from_raster(self, cost_surface):
+        lcpa_engine = LcpaUtilityRouteEngine()
+        overlay_graph = lcpa_engine.compute_overlay_graph(cost_surface, PROJECT_AREA, run_in_parallel=False)
+        route = lcpa_engine.get_lcpa_route_from_overlay_graph(overlay_graph, UTILITY_ROUTE_SKETCH)
+        assert_route_equals_lcpa_route(lcpa_engine, route, cost_surface)
+
+    def test_overlay_graph_recomputes_only_the_changed_blocks(self, cost_surface):
+        lcpa_engine = LcpaUtilityRouteEngine()
+        previous_overlay_graph = lcpa_engine.compute_overlay_graph(cost_surface, PROJECT_AREA, run_in_parallel=False)
+
+        # A local change within the block in the upper left corner, away from the boundary cells of the block.
+        cost_surface.array[20:30, 20:30] = Config.FINAL_RASTER_NO_DATA
+        overlay_graph = lcpa_engine.compute_overlay_graph(
+            cost_surface, PROJECT_AREA, previous_overlay_graph=previous_overlay_graph, run_in_parallel=False
+        )
+
+        recomputed_blocks = [
+            block_id
+            for block_id, block_boundary_costs in overlay_graph.block_boundary_costs.items()
+            if block_boundary_costs is not previous_overlay_graph.block_boundary_costs.get(block_id)
+        ]
+        assert recomputed_blocks == [0]
+        assert overlay_graph.block_boundary_costs.keys() == previous_overlay_graph.block_boundary_costs.keys()
+        route = lcpa_engine.get_lcpa_route_from_overlay_graph(overlay_graph, UTILITY_ROUTE_SKETCH)
+        assert_route_equals_lcpa_route(lcpa_engine, route, cost_surface)
+
+
+@pytest.mark.usefixtures("setup_clean_start")
+class TestNearestTargetRoutes:
+    def test_route_to_nearest_existing_cable(self):
+        array = np.full((200, 200), 50, dtype="int8")
+        array[:, 120:124] = Config.FINAL_RASTER_NO_DATA
+        cost_surface = CostSurface(array, Affine(0.5, 0.0, 174000.0, 0.0, -0.5, 451000.0))
+        project_area = shapely.box(174000.0, 450900.0, 174100.0, 451000.0)
+        new_asset = shapely.Point(174040.2, 450950.2)
+        existing_cables = [
+            shapely.LineString([(174090.0, 450910.0), (174090.0, 450990.0)]),  # Closest, but behind the obstacle.
+            shapely.LineString([(174002.0, 450905.0), (174030.0, 450905.0)]),
+            shapely.LineString([(174005.0, 450995.0), (174010.0, 450995.0)]),
+        ]
+
+        lcpa_engine = LcpaUtilityRouteEngine()
+        route = lcpa_engine.get_lcpa_route_to_nearest_target(cost_surface, [new_asset], existing_cables, project_area)
+
+        assert lcpa_engine.reached_target == 1
+        assert route.coords[0] == pytest.approx((174040.25, 450950.25))
+        assert shapely.dwithin(shapely.Point(route.coords[-1]), existing_cables[1], Config.RASTER_CELL_SIZE)
+
+
+class TestLandmarkRoutes:
+    @pytest.mark.parametrize("dtype", ["float32", "uint16"])
+    def test_routes_from_landmarks_equal_routes_from_raster(self, cost_surface, tmp_path, dtype):
+        lcpa_engine = LcpaUtilityRouteEngine()
+        path_landmarks = lcpa_engine.compute_landmark_distances(
+            cost_surface, PROJECT_AREA, tmp_path / "landmarks", number_of_landmarks=4, dtype=dtype
+        )
+        route = lcpa_engine.get_lcpa_route_from_landmarks(path_landmarks, UTILITY_ROUTE_SKETCH)
+        assert_route_equals_lcpa_route(lcpa_engine, route, cost_surface)
+
+
+class TestOutOfCoreRoutes:
+    def test_routes_out_of_core_equal_routes_from_raster(self, cost_surface, tmp_path):
+        path_raster = tmp_path / "suitability_raster.tif"
+        with rasterio.open(
+            path_raster,
+            "w",
+            driver="GTiff",
+            height=cost_surface.array.shape[0],
+            width=cost_surface.array.shape[1],
+            count=1,
+            dtype="int8",
+            nodata=Config.FINAL_RASTER_NO_DATA,
+            transform=cost_surface.transform,
+        ) as dst:
+            dst.write(cost_surface.array, 1)
+
+        lcpa_engine = LcpaUtilityRouteEngine()
+        route = lcpa_engine.get_lcpa_route_out_of_core(
+            path_raster, UTILITY_ROUTE_SKETCH, PROJECT_AREA, block_size=32, max_blocks=16
+        )
+        assert_route_equals_lcpa_route(lcpa_engine, route, path_raster)
+        # The raster of 7x7 blocks is read on demand and does not fit in the cache of 16 blocks.
+        assert lcpa_engine.block_fetches > 16
+        assert lcpa_engine.block_evictions == lcpa_engine.block_fetches - 16
+
+
+class TestRouteCache:
+    def test_cached_route_equals_computed_route(self, cost_surface, tmp_path, monkeypatch):
+        route_cache = RouteCache(tmp_path / "route_cache.sqlite")
+
+        lcpa_engine = LcpaUtilityRouteEngine()
+        route = lcpa_engine.get_lcpa_route(cost_surface, UTILITY_ROUTE_SKETCH, PROJECT_AREA, route_cache=route_cache)
+        cached_engine = LcpaUtilityRouteEngine()
+        with monkeypatch.context() as patch:
+            # A cached route is returned without reading the suitability raster.
+            patch.setattr(
+                "utility_route_planner.models.lcpa.lcpa_engine.load_suitability_raster_data",
+                lambda *args: pytest.fail("The suitability raster is read on a cache hit."),
+            )
+            cached_route = cached_engine.get_lcpa_route(
+                cost_surface, UTILITY_ROUTE_SKETCH, PROJECT_AREA, route_cache=route_cache
+            )
+        assert (route_cache.hits, route_cache.misses) == (1, 1)
+        assert cached_route.equals(route)
+        assert cached_engine.expanded_nodes == 0
+        assert [leg_result.cost for leg_result in cached_engine.leg_results] == pytest.approx(
+            [leg_result.cost for leg_result in lcpa_engine.leg_results]
+        )
+
+        # A change of the cost surface within the project area computes the route again.
+        cost_surface.array[10, 10] = 100
+        LcpaUtilityRouteEngine().get_lcpa_route(
+            cost_surface, UTILITY_ROUTE_SKETCH, PROJECT_AREA, route_cache=route_cache
+        )
+        assert (route_cache.hits, route_cache.misses) == (1, 2)
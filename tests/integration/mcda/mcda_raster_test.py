@@ -136,6 +136,129 @@ class TestRasterPreprocessing:
         sources = bands.findall("ComplexSource")
         assert len(sources) == len(mcda_engine.project_area_grid)
 
+    def test_partitioned_vectors_result_in_same_raster(self):
+        mcda_engine = McdaCostSurfaceEngine(
+            Config.RASTER_PRESET_NAME_BENCHMARK,
+            Config.PYTEST_PATH_GEOPACKAGE_MCDA,
+            gpd.read_file(Config.PYTEST_PATH_GEOPACKAGE_MCDA, layer=Config.PYTEST_LAYER_NAME_PROJECT_AREA)
+            .iloc[0]
+            .geometry,
+        )
+        mcda_engine.preprocess_vectors()
+
+        rasters = []
+        for partition_vectors in [False, True]:
+            path_suitability_raster = mcda_engine.preprocess_rasters(
+                mcda_engine.processed_vectors,
+                cell_size=0.5,
+                max_block_size=512,
+                run_in_parallel=False,
+                partition_vectors=partition_vectors,
+            )
+            with rasterio.open(path_suitability_raster, "r") as src:
+                rasters.append(src.read(1))
+
+        # Each block only receives the features intersecting it, this should not change the resulting raster.
+        assert np.array_equal(rasters[0], rasters[1])
+
+        # A block only receives features which intersect it.
+        block_geometry = mcda_engine.project_area_grid.iloc[0].values[0]
+        prepared_criteria = mcda_engine.prepare_criteria(mcda_engine.processed_vectors)
+        block_criteria = mcda_engine.get_prepared_criteria_for_block(0, prepared_criteria)
+        for criterion, prepared_criterion in block_criteria.items():
+            assert shapely.intersects(prepared_criterion.geometries, block_geometry).all()
+            assert len(prepared_criterion.geometries) <= len(mcda_engine.processed_vectors[criterion])
+
+    def test_shared_memory_workers_result_in_same_raster(self):
+        mcda_engine = McdaCostSurfaceEngine(
+            Config.RASTER_PRESET_NAME_BENCHMARK,
+            Config.PYTEST_PATH_GEOPACKAGE_MCDA,
+            gpd.read_file(Config.PYTEST_PATH_GEOPACKAGE_MCDA, layer=Config.PYTEST_LAYER_NAME_PROJECT_AREA)
+            .iloc[0]
+            .geometry,
+        )
+        mcda_engine.preprocess_vectors()
+
+        rasters = []
+        for run_in_parallel, use_shared_memory in [(False, False), (True, True)]:
+            path_suitability_raster = mcda_engine.preprocess_rasters(
+                mcda_engine.processed_vectors,
+                cell_size=0.5,
+                max_block_size=512,
+                run_in_parallel=run_in_parallel,
+                use_shared_memory=use_shared_memory,
+            )
+            with rasterio.open(path_suitability_raster, "r") as src:
+                rasters.append(src.read(1))
+
+        assert np.array_equal(rasters[0], rasters[1])
+
+    def test_preprocess_and_rasterize_per_block_results_in_same_raster(self):
+        project_area = (
+            gpd.read_file(Config.PYTEST_PATH_GEOPACKAGE_MCDA, layer=Config.PYTEST_LAYER_NAME_PROJECT_AREA)
+            .iloc[0]
+            .geometry
+        )
+        mcda_engine = McdaCostSurfaceEngine(
+            Config.RASTER_PRESET_NAME_BENCHMARK, Config.PYTEST_PATH_GEOPACKAGE_MCDA, project_area
+        )
+        mcda_engine.preprocess_vectors()
+        path_suitability_raster = mcda_engine.preprocess_rasters(
+            mcda_engine.processed_vectors, cell_size=0.5, max_block_size=512, run_in_parallel=False
+        )
+        with rasterio.open(path_suitability_raster, "r") as src:
+            raster_two_stages = src.read(1)
+
+        mcda_engine_per_block = McdaCostSurfaceEngine(
+            Config.RASTER_PRESET_NAME_BENCHMARK, Config.PYTEST_PATH_GEOPACKAGE_MCDA, project_area, "per_block_"
+        )
+        path_suitability_raster = mcda_engine_per_block.preprocess_and_rasterize_per_block(
+            cell_size=0.5, max_block_size=512, run_in_parallel=True
+        )
+        with rasterio.open(path_suitability_raster, "r") as src:
+            raster_per_block = src.read(1)
+
+        assert np.array_equal(raster_two_stages, raster_per_block)
+        assert mcda_engine_per_block.processed_criteria_names == mcda_engine.processed_criteria_names
+        assert mcda_engine_per_block.unprocessed_criteria_names == mcda_engine.unprocessed_criteria_names
+
+    def test_cost_surface_in_memory_equals_vrt(self):
+        mcda_engine = McdaCostSurfaceEngine(
+            Config.RASTER_PRESET_NAME_BENCHMARK,
+            Config.PYTEST_PATH_GEOPACKAGE_MCDA,
+            gpd.read_file(Config.PYTEST_PATH_GEOPACKAGE_MCDA, layer=Config.PYTEST_LAYER_NAME_PROJECT_AREA)
+            .iloc[0]
+            .geometry,
+        )
+        mcda_engine.preprocess_vectors()
+        cost_surface = mcda_engine.preprocess_rasters(
+            mcda_engine.processed_vectors, cell_size=0.5, max_block_size=512, run_in_parallel=True, in_memory=True
+        )
+        with rasterio.open(cost_surface.path, "r") as src:
+            assert np.array_equal(src.read(1), cost_surface.array)
+            assert src.transform == cost_surface.transform
+            assert src.nodata == cost_surface.nodata
+
+        cost_surface_without_file = mcda_engine.preprocess_rasters(
+            mcda_engine.processed_vectors,
+            cell_size=0.5,
+            max_block_size=512,
+            run_in_parallel=False,
+            in_memory=True,
+            write_to_file=False,
+        )
+        assert cost_surface_without_file.path is None
+        assert np.array_equal(cost_surface.array, cost_surface_without_file.array)
+
+        with pytest.raises(InvalidSuitabilityRasterInput):
+            mcda_engine.preprocess_rasters(
+                mcda_engine.processed_vectors,
+                cell_size=0.5,
+                max_block_size=512,
+                run_in_parallel=False,
+                write_to_file=False,
+            )
+
 
 def test_rasterize_vector_data_cell_size_error():
     with pytest.raises(RasterCellSizeTooSmall):
@@ -63,6 +63,34 @@ class TestVectorPreprocessing:
         )
         mcda_engine.preprocess_vectors()
 
+    def test_process_all_vectors_in_parallel(self):
+        project_area = (
+            gpd.read_file(Config.PYTEST_PATH_GEOPACKAGE_MCDA, layer=Config.PYTEST_LAYER_NAME_PROJECT_AREA)
+            .iloc[0]
+            .geometry
+        )
+        mcda_engine_sequential = McdaCostSurfaceEngine(
+            Config.RASTER_PRESET_NAME_BENCHMARK, Config.PYTEST_PATH_GEOPACKAGE_MCDA, project_area
+        )
+        mcda_engine_sequential.preprocess_vectors()
+        reset_geopackage(Config.PATH_GEOPACKAGE_MCDA_OUTPUT, truncate=False)
+        mcda_engine_parallel = McdaCostSurfaceEngine(
+            Config.RASTER_PRESET_NAME_BENCHMARK, Config.PYTEST_PATH_GEOPACKAGE_MCDA, project_area
+        )
+        mcda_engine_parallel.preprocess_vectors(run_in_parallel=True, max_workers=4)
+
+        assert mcda_engine_parallel.processed_criteria_names == mcda_engine_sequential.processed_criteria_names
+        assert mcda_engine_parallel.unprocessed_criteria_names == mcda_engine_sequential.unprocessed_criteria_names
+        # The results are collected in the order of the preset.
+        assert list(mcda_engine_parallel.processed_vectors) == list(mcda_engine_sequential.processed_vectors)
+        for criterion, gdf in mcda_engine_sequential.processed_vectors.items():
+            assert gdf.equals(mcda_engine_parallel.processed_vectors[criterion])
+            # Debug output is written by the parent process only.
+            gpd.read_file(
+                Config.PATH_GEOPACKAGE_MCDA_OUTPUT,
+                layer=mcda_engine_parallel.raster_preset.general.prefix + criterion,
+            )
+
     def test_process_waterdeel(self):
         weight_values = {
             # Column "class"
@@ -121,6 +149,10 @@ class TestVectorPreprocessing:
             check_dtype=False,
         )
 
+        raster_space_gdf = Waterdeel._update_geometry_values(reclassified_gdf.copy(), {"zee": 20}, True)
+        assert raster_space_gdf.geometry.equals(reclassified_gdf.geometry)
+        assert raster_space_gdf["buffer_distance"].tolist() == [0] * 10 + [20]
+
         buffered_gdf = Waterdeel._update_geometry_values(reclassified_gdf, {"zee": 20})
         assert buffered_gdf.iloc[:10].area.round(1).unique().tolist() == [1.0]
         assert buffered_gdf.iloc[[10]].area.round(1).tolist() == [1335.6]
@@ -78,8 +78,9 @@ class TestMcdaLcpaChain:
         ),
     ],
 )
+@pytest.mark.parametrize("search_method", ["mcp", "bucket"])
 def test_mcda_lcpa_chain_all_benchmark_cases(
-    path_geopackage, layer_name_project_area, layer_name_utility_route_human_designed
+    path_geopackage, layer_name_project_area, layer_name_utility_route_human_designed, search_method
 ):
     human_designed_route = (
         gpd.read_file(path_geopackage, layer=layer_name_utility_route_human_designed).iloc[0].geometry
@@ -94,4 +95,5 @@ def test_mcda_lcpa_chain_all_benchmark_cases(
         human_designed_route,
         raster_name_prefix="",
         compute_rasters_in_parallel=False,
+        search_method=search_method,
     )
@@ -9,6 +9,7 @@ import geopandas as gpd
 
 from settings import Config
 from utility_route_planner.models.route_evaluation_metrics import RouteEvaluationMetrics
+from utility_route_planner.util.geo_utilities import read_cost_surface
 
 
 class TestRouteEvaluationMetrics:
@@ -97,6 +98,30 @@ class TestRouteEvaluationMetrics:
         assert nodes == 2182753
         assert edges == 17435116
 
+    def test_route_evaluation_metrics_of_cost_surface_in_memory(self):
+        cost_surface = read_cost_surface(Config.PATH_EXAMPLE_RASTER)
+        route_sota = shapely.LineString([[174877.07, 451050.52], [174978.55, 451105.11]])
+        route_human = shapely.LineString([[174967.92, 450902.59], [175283.58, 450783.57]])
+
+        metrics = []
+        for path_cost_surface in [Config.PATH_EXAMPLE_RASTER, cost_surface]:
+            route_evaluation_metrics = RouteEvaluationMetrics(
+                route_sota, path_cost_surface, route_human, project_area=route_sota.buffer(50)
+            )
+            route_evaluation_metrics.get_route_evaluation_metrics()
+            metrics.append(
+                (
+                    route_evaluation_metrics.route_relative_cost_sota,
+                    route_evaluation_metrics.route_relative_cost_human,
+                    route_evaluation_metrics.n_nodes,
+                    route_evaluation_metrics.n_edges,
+                )
+            )
+
+        assert metrics[0] == metrics[1]
+        with pytest.raises(ValueError):
+            RouteEvaluationMetrics(shapely.LineString([[0, 0], [1, 1]]), cost_surface).get_route_evaluation_metrics()
+
     def test_get_number_of_nodes_edges_small_array(self):
         pytest_array = np.array(
             [
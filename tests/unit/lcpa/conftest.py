@@ -0,0 +1,28 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def random_costs():
+    def create_random_costs(
+        seed: int,
+        shape: tuple[int, int],
+        nodata_fraction: float = 0.2,
+        max_cost: int = 127,
+        end_point_cost: int = 10,
+    ) -> np.ndarray:
+        """
+        Random int8 costs of which a fraction of the cells is no data (-1), the first and last cell are traversable
+        such that they can be used as start and end of a route.
+        """
+        rng = np.random.default_rng(seed)
+        costs = rng.integers(1, max_cost, shape).astype("int8")
+        costs[rng.random(costs.shape) < nodata_fraction] = -1
+        costs[0, 0], costs[-1, -1] = end_point_cost, end_point_cost
+        return costs
+
+    return create_random_costs
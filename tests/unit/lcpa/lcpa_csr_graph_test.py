@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+from skimage.graph import route_through_array
+
+from utility_route_planner.models.lcpa.lcpa_csr_graph import (
+    build_csr_graph,
+    find_csr_least_cost_path,
+    load_csr_graph,
+    write_csr_graph,
+)
+
+GEOTRANSFORM = (174000.0, 0.5, 0.0, 451000.0, 0.0, -0.5)
+
+
+@pytest.fixture
+def costs(random_costs):
+    return random_costs(7, (50, 40))
+
+
+def test_build_csr_graph(costs):
+    csr_graph = build_csr_graph(costs, GEOTRANSFORM)
+
+    assert csr_graph.graph.shape[0] == (costs >= 0).sum()
+    # The weight of a diagonal edge is the mean cost of both cells times the diagonal distance.
+    node, neighbour = csr_graph.node_ids[0, 0], csr_graph.node_ids[1, 1]
+    if node >= 0 and neighbour >= 0:
+        assert csr_graph.graph[node, neighbour] == pytest.approx(np.sqrt(2) / 2 * (int(costs[0, 0]) + int(costs[1, 1])))
+    assert (csr_graph.graph != csr_graph.graph.T).nnz == 0
+
+
+@pytest.mark.parametrize("start", [(0, 0), (20, 20)])
+def test_csr_least_cost_path_equals_route_through_array(costs, start, tmp_path):
+    costs[0, 0] = -1  # The start of a route may be no data.
+    costs[20, 20] = 15
+    csr_graph = load_csr_graph(write_csr_graph(build_csr_graph(costs, GEOTRANSFORM), tmp_path / "graph"))
+
+    leg_result = find_csr_least_cost_path(csr_graph, start, (-1, -1))
+    _, expected_cost = route_through_array(costs, start, (-1, -1), geometric=True, fully_connected=True)
+
+    # The graph is a view on the memory-mapped arrays.
+    assert not csr_graph.graph.data.flags.owndata
+    assert (leg_result.indices[0], leg_result.indices[-1]) == (start, (49, 39))
+    assert leg_result.cost == pytest.approx(expected_cost)
+
+
+def test_csr_graph_is_reloaded_when_rewritten(costs, tmp_path):
+    csr_graph = load_csr_graph(write_csr_graph(build_csr_graph(costs, GEOTRANSFORM), tmp_path))
+    assert load_csr_graph(tmp_path) is csr_graph
+
+    costs[:, 5] = -1
+    rewritten_csr_graph = load_csr_graph(write_csr_graph(build_csr_graph(costs, GEOTRANSFORM), tmp_path))
+    assert rewritten_csr_graph is not csr_graph
+    assert rewritten_csr_graph.graph.shape[0] < csr_graph.graph.shape[0]
+
+
+def test_csr_least_cost_path_unreachable():
+    costs = np.ones((10, 10), dtype="int8")
+    costs[:, 5] = -1
+    csr_graph = build_csr_graph(costs, GEOTRANSFORM)
+    with pytest.raises(ValueError):
+        find_csr_least_cost_path(csr_graph, (0, 0), (9, 9))
+    with pytest.raises(ValueError):
+        find_csr_least_cost_path(csr_graph, (0, 0), (0, 5))
@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+
+from utility_route_planner.models.lcpa.lcpa_hierarchical import (
+    downsample_cost_array,
+    find_hierarchical_least_cost_path,
+    touches_corridor_edge,
+)
+from utility_route_planner.models.lcpa.lcpa_search import find_astar_least_cost_path, find_skimage_least_cost_path
+
+
+def test_downsample_cost_array():
+    costs = np.array(
+        [
+            [1, 3, -1, -1, 5],
+            [1, 3, -1, -1, 5],
+            [-1, -1, 2, -1, -1],
+        ],
+        dtype="int8",
+    )
+    coarse_costs = downsample_cost_array(costs, 2)
+    assert coarse_costs.tolist() == [[2, -1, 5], [-1, 2, -1]]
+
+
+@pytest.mark.parametrize("find_path", [find_skimage_least_cost_path, find_astar_least_cost_path])
+def test_hierarchical_least_cost_path_equals_cost_of_full_resolution(find_path):
+    # Cheap roads wider than a coarse cell and an obstacle on an expensive background, similar to a suitability raster.
+    costs = np.random.default_rng(0).integers(60, 127, (400, 400)).astype("int8")
+    for road in (60, 220, 340):
+        costs[road : road + 12, :] = 5
+    for road in (40, 180, 300):
+        costs[:, road : road + 12] = 5
+    costs[150:250, 200:216] = -1
+
+    leg_result = find_hierarchical_least_cost_path(costs, (200, 10), (240, 390), find_path, 8, 10)
+    expected_leg_result = find_path(costs, (200, 10), (240, 390))
+
+    assert (leg_result.indices[0], leg_result.indices[-1]) == ((200, 10), (240, 390))
+    assert leg_result.cost == pytest.approx(expected_leg_result.cost)
+    assert leg_result.expanded_nodes < expected_leg_result.expanded_nodes
+
+
+def test_hierarchical_least_cost_path_widens_corridor():
+    # The wall is not present in the coarse cost array, at full resolution it can only be passed far from the corridor.
+    costs = np.ones((64, 64), dtype="int8")
+    costs[:60, 32] = -1
+
+    leg_result = find_hierarchical_least_cost_path(costs, (30, 10), (30, 54), find_skimage_least_cost_path, 8, 2)
+    expected_leg_result = find_skimage_least_cost_path(costs, (30, 10), (30, 54))
+
+    assert leg_result.cost == pytest.approx(expected_leg_result.cost)
+
+
+def test_touches_corridor_edge():
+    costs = np.ones((5, 5), dtype="int8")
+    corridor = np.zeros((5, 5), dtype=bool)
+    corridor[1:4, :] = True
+    assert not touches_corridor_edge(costs, corridor, [(2, 0), (2, 1), (2, 2)])
+    assert touches_corridor_edge(costs, corridor, [(2, 0), (1, 1), (1, 2)])
+
+    # Cells outside the corridor which are not traversable cannot improve the route.
+    costs[0, :] = -1
+    assert not touches_corridor_edge(costs, corridor, [(2, 0), (1, 1), (1, 2)])
@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+from skimage.graph import route_through_array
+
+from utility_route_planner.models.lcpa.lcpa_landmarks import (
+    compute_landmark_distances,
+    find_alt_least_cost_path,
+    load_landmark_distances,
+    write_landmark_distances,
+)
+from utility_route_planner.models.lcpa.lcpa_search import find_astar_least_cost_path
+
+GEOTRANSFORM = (174000.0, 0.5, 0.0, 451000.0, 0.0, -0.5)
+
+
+@pytest.fixture
+def costs(random_costs):
+    costs = random_costs(9, (60, 50))
+    # The start of a route may be no data.
+    costs[30, 20] = -1
+    return costs
+
+
+@pytest.mark.parametrize("dtype", ["float32", "uint16"])
+@pytest.mark.parametrize("start, end", [((0, 0), (-1, -1)), ((30, 20), (-1, -1)), ((-1, -1), (5, 40))])
+def test_alt_least_cost_path_equals_route_through_array(costs, dtype, start, end):
+    landmark_distances = compute_landmark_distances(costs, GEOTRANSFORM, number_of_landmarks=4, dtype=dtype)
+    leg_result = find_alt_least_cost_path(landmark_distances, start, end)
+    expected_indices, expected_cost = route_through_array(costs, start, end, geometric=True, fully_connected=True)
+
+    assert landmark_distances.distances.dtype == dtype
+    assert (leg_result.indices[0], leg_result.indices[-1]) == (expected_indices[0], expected_indices[-1])
+    assert leg_result.cost == pytest.approx(expected_cost)
+
+
+def test_alt_expands_fewer_nodes_than_astar():
+    # A cheap corridor around an expensive area, the octile distance times the lowest cost underestimates the route.
+    costs = np.full((80, 80), 100, dtype="int8")
+    costs[:, :3] = 1
+    costs[-3:, :] = 1
+    landmark_distances = compute_landmark_distances(costs, GEOTRANSFORM, number_of_landmarks=4)
+
+    leg_result = find_alt_least_cost_path(landmark_distances, (0, 1), (78, 79))
+    astar_leg_result = find_astar_least_cost_path(costs, (0, 1), (78, 79))
+    assert leg_result.cost == pytest.approx(astar_leg_result.cost)
+    assert leg_result.expanded_nodes < astar_leg_result.expanded_nodes
+
+
+def test_landmark_distances_are_memory_mapped(costs, tmp_path):
+    landmark_distances = compute_landmark_distances(costs, GEOTRANSFORM, number_of_landmarks=2, dtype="uint16")
+    loaded_landmark_distances = load_landmark_distances(write_landmark_distances(landmark_distances, tmp_path))
+
+    assert isinstance(loaded_landmark_distances.distances, np.memmap)
+    assert np.array_equal(loaded_landmark_distances.distances, landmark_distances.distances)
+    assert loaded_landmark_distances.scale == landmark_distances.scale
+    assert loaded_landmark_distances.geotransform == GEOTRANSFORM
+    assert load_landmark_distances(tmp_path) is loaded_landmark_distances
+
+
+def test_landmark_distances_are_reloaded_when_rewritten(costs, tmp_path):
+    landmark_distances = compute_landmark_distances(costs, GEOTRANSFORM, number_of_landmarks=2)
+    loaded_landmark_distances = load_landmark_distances(write_landmark_distances(landmark_distances, tmp_path))
+
+    landmark_distances = compute_landmark_distances(costs, GEOTRANSFORM, number_of_landmarks=3)
+    rewritten_landmark_distances = load_landmark_distances(write_landmark_distances(landmark_distances, tmp_path))
+    assert rewritten_landmark_distances is not loaded_landmark_distances
+    assert len(rewritten_landmark_distances.landmarks) == 3
+
+
+def test_alt_least_cost_path_unreachable():
+    costs = np.ones((20, 20), dtype="int8")
+    costs[:, 10] = -1
+    landmark_distances = compute_landmark_distances(costs, GEOTRANSFORM, number_of_landmarks=3)
+    with pytest.raises(ValueError):
+        find_alt_least_cost_path(landmark_distances, (0, 0), (19, 19))
+    with pytest.raises(ValueError):
+        find_alt_least_cost_path(landmark_distances, (0, 0), (0, 10))
+    with pytest.raises(ValueError):
+        compute_landmark_distances(costs, GEOTRANSFORM, dtype="float16")
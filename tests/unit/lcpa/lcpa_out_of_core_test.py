@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+import rasterio
+import shapely
+from affine import Affine
+from skimage.graph import route_through_array
+
+from utility_route_planner.models.lcpa.lcpa_out_of_core import RasterBlockCache, find_out_of_core_least_cost_path
+from utility_route_planner.util.geo_utilities import load_suitability_raster_data
+
+PROJECT_AREA = shapely.Polygon([(174002.3, 450996.1), (174048.2, 450998.0), (174047.1, 450961.5), (174005.6, 450955.2)])
+
+
+@pytest.fixture
+def path_raster(tmp_path, random_costs):
+    costs = random_costs(10, (100, 110), nodata_fraction=0)
+    # The nodata value of the suitability raster is 0, walls of no data cross multiple blocks.
+    costs[30:, 50] = 0
+    costs[:60, 80] = 0
+    path_raster = tmp_path / "suitability_raster.tif"
+    with rasterio.open(
+        path_raster,
+        "w",
+        driver="GTiff",
+        height=costs.shape[0],
+        width=costs.shape[1],
+        count=1,
+        dtype="int8",
+        nodata=0,
+        transform=Affine(0.5, 0.0, 174000.0, 0.0, -0.5, 451000.0),
+    ) as dst:
+        dst.write(costs, 1)
+    return path_raster
+
+
+def test_raster_blocks_equal_suitability_raster_data(path_raster):
+    costs, geotransform = load_suitability_raster_data(path_raster, PROJECT_AREA)
+    with RasterBlockCache(path_raster, PROJECT_AREA, block_size=16, max_blocks=9) as block_cache:
+        number_of_block_rows, number_of_block_columns = block_cache.number_of_blocks
+        blocks = np.block(
+            [
+                [block_cache.get_block(block_row, block_column) for block_column in range(number_of_block_columns)]
+                for block_row in range(number_of_block_rows)
+            ]
+        )
+        assert block_cache.geotransform == geotransform
+        assert np.array_equal(blocks[: costs.shape[0], : costs.shape[1]], costs)
+        assert np.all(blocks[costs.shape[0] :] == -1)
+        assert block_cache.block_fetches == number_of_block_rows * number_of_block_columns
+        assert block_cache.block_evictions == block_cache.block_fetches - 9
+
+
+# The start of a route may be no data, such as (40, 2) on the edge of the project area and (40, 46) on a wall.
+@pytest.mark.parametrize("start, end", [((10, 10), (30, 70)), ((40, 2), (5, 60)), ((40, 46), (70, 10))])
+def test_out_of_core_least_cost_path_equals_route_through_array(path_raster, start, end):
+    costs, _ = load_suitability_raster_data(path_raster, PROJECT_AREA)
+    expected_indices, expected_cost = route_through_array(costs, start, end, geometric=True, fully_connected=True)
+    with RasterBlockCache(path_raster, PROJECT_AREA, block_size=16, max_blocks=9) as block_cache:
+        leg_result = find_out_of_core_least_cost_path(block_cache, start, end)
+
+    assert leg_result.cost == pytest.approx(expected_cost)
+    assert (leg_result.indices[0], leg_result.indices[-1]) == (expected_indices[0], expected_indices[-1])
+    indices = np.array(leg_result.indices)
+    steps = np.abs(np.diff(indices, axis=0))
+    assert np.all(steps.max(axis=1) == 1)
+    assert block_cache.block_evictions > 0
+
+
+def test_out_of_core_least_cost_path_unreachable(path_raster):
+    with RasterBlockCache(path_raster, PROJECT_AREA, block_size=16, max_blocks=9) as block_cache:
+        with pytest.raises(ValueError):
+            # The bottom right corner is outside of the project area.
+            find_out_of_core_least_cost_path(block_cache, (10, 10), (-1, -1))
+    with pytest.raises(ValueError):
+        RasterBlockCache(path_raster, PROJECT_AREA, max_blocks=4)
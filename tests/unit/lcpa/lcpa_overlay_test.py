@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+from skimage.graph import route_through_array
+
+from utility_route_planner.models.lcpa.lcpa_overlay import (
+    build_overlay_graph,
+    compute_block_boundary_costs,
+    find_overlay_least_cost_path,
+)
+
+
+@pytest.fixture
+def costs(random_costs):
+    costs = random_costs(4, (45, 50), max_cost=10, end_point_cost=3)
+    # The start of a route may be no data on the boundary of a block.
+    costs[15, 17] = -1
+    return costs
+
+
+@pytest.mark.parametrize(
+    "start, end", [((0, 0), (-1, -1)), ((15, 17), (-1, -1)), ((15, 17), (20, 30)), ((2, 3), (5, 9))]
+)
+def test_overlay_least_cost_path_equals_route_through_array(costs, start, end):
+    overlay_graph = build_overlay_graph(costs, (), block_size=8)
+    leg_result = find_overlay_least_cost_path(overlay_graph, start, end)
+    expected_indices, expected_cost = route_through_array(costs, start, end, geometric=True, fully_connected=True)
+
+    assert overlay_graph.node_cells.size < np.count_nonzero(costs >= 0)
+    assert (leg_result.indices[0], leg_result.indices[-1]) == (expected_indices[0], expected_indices[-1])
+    assert leg_result.cost == pytest.approx(expected_cost)
+    indices = np.array(leg_result.indices)
+    steps = np.abs(np.diff(indices, axis=0))
+    assert np.all(steps.max(axis=1) == 1)
+    path_costs = costs[tuple(indices.T)].astype("float64")
+    step_lengths = np.where(steps.sum(axis=1) == 2, np.sqrt(2), 1)
+    assert np.sum(step_lengths * (path_costs[1:] + path_costs[:-1]) / 2) == pytest.approx(leg_result.cost)
+
+
+def test_overlay_least_cost_path_unreachable():
+    costs = np.ones((20, 20), dtype="int8")
+    costs[:, 10] = -1
+    overlay_graph = build_overlay_graph(costs, (), block_size=8)
+    with pytest.raises(ValueError):
+        find_overlay_least_cost_path(overlay_graph, (0, 0), (19, 19))
+    with pytest.raises(ValueError):
+        find_overlay_least_cost_path(overlay_graph, (0, 0), (0, 10))
+
+
+def test_block_boundary_costs_leave_out_pairs_through_other_boundary_cells():
+    # On uniform costs the least cost path between cells on the same side of the block follows that side.
+    boundary_cells = np.array([0, 1, 2, 3])
+    source_indices, target_indices, costs = compute_block_boundary_costs(np.ones((4, 4)), boundary_cells)
+    assert sorted(zip(source_indices.tolist(), target_indices.tolist())) == [
+        (0, 1),
+        (1, 0),
+        (1, 2),
+        (2, 1),
+        (2, 3),
+        (3, 2),
+    ]
+    assert np.all(costs == 1)
+
+
+def test_overlay_graph_recomputes_changed_blocks(costs):
+    overlay_graph = build_overlay_graph(costs, (), block_size=8)
+    changed_costs = costs.copy()
+    changed_costs[20:22, 20:22] = -1
+    changed_overlay_graph = build_overlay_graph(changed_costs, (), block_size=8, previous_overlay_graph=overlay_graph)
+
+    # Only the block of the change is recomputed, the boundary costs of the other blocks are reused.
+    recomputed_blocks = [
+        block_id
+        for block_id, block_boundary_costs in changed_overlay_graph.block_boundary_costs.items()
+        if block_boundary_costs is not overlay_graph.block_boundary_costs.get(block_id)
+    ]
+    assert recomputed_blocks == [2 * 7 + 2]
+    leg_result = find_overlay_least_cost_path(changed_overlay_graph, (0, 0), (-1, -1))
+    _, expected_cost = route_through_array(changed_costs, (0, 0), (-1, -1), geometric=True, fully_connected=True)
+    assert leg_result.cost == pytest.approx(expected_cost)
@@ -0,0 +1,96 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+from skimage.graph import route_through_array
+
+from utility_route_planner.models.lcpa.lcpa_quadtree import (
+    build_quadtree_graph,
+    find_quadtree_graph_least_cost_path,
+    find_quadtree_leaves,
+)
+
+
+@pytest.fixture
+def costs():
+    # Piecewise constant costs with obstacles, similar to a suitability raster of rasterized polygons.
+    rng = np.random.default_rng(3)
+    blocks = rng.integers(-1, 8, (10, 12))
+    blocks[blocks == 0] = 1
+    costs = np.repeat(np.repeat(blocks, 8, axis=0), 8, axis=1).astype("int8")
+    costs[30:40, 3:70] = 2
+    costs[0, 0], costs[-1, -1] = 4, 4
+    return costs
+
+
+def test_find_quadtree_leaves():
+    costs = np.array(
+        [
+            [1, 1, 2, 3, 5],
+            [1, 1, 2, 2, 5],
+            [-1, -1, 4, 4, 5],
+            [-1, -1, 4, 4, 5],
+        ],
+        dtype="int8",
+    )
+    leaf_ids, leaf_rows, leaf_columns, leaf_sizes, leaf_costs = find_quadtree_leaves(costs, 4)
+
+    assert leaf_ids[2:, :2].tolist() == [[-1, -1], [-1, -1]]
+    # Blocks of 2 by 2 cells of equal cost are merged, the other cells are leaves of a single cell.
+    assert sorted(leaf_sizes.tolist()) == [1, 1, 1, 1, 1, 1, 1, 1, 2, 2]
+    assert np.all(leaf_costs[leaf_ids[leaf_ids >= 0]] == costs[leaf_ids >= 0])
+    assert leaf_ids[0, 0] == leaf_ids[1, 1]
+    assert (leaf_rows[leaf_ids[3, 3]], leaf_columns[leaf_ids[3, 3]]) == (2, 2)
+
+
+@pytest.mark.parametrize("start", [(0, 0), (33, 20), (5, 45)])
+def test_quadtree_least_cost_path_equals_route_through_array(costs, start):
+    quadtree_graph = build_quadtree_graph(costs, portal_spacing=1, max_leaf_size=8)
+    leg_result = find_quadtree_graph_least_cost_path(quadtree_graph, start, (-1, -1))
+    _, expected_cost = route_through_array(costs, start, (-1, -1), geometric=True, fully_connected=True)
+
+    assert quadtree_graph.node_cells.size < np.count_nonzero(costs >= 0) / 2
+    assert (leg_result.indices[0], leg_result.indices[-1]) == (start, (79, 95))
+    assert leg_result.cost == pytest.approx(expected_cost)
+    # The path through the leaves is a connected path of cells of which the cost equals the cost of the route.
+    indices = np.array(leg_result.indices)
+    steps = np.abs(np.diff(indices, axis=0))
+    assert np.all(steps.max(axis=1) == 1)
+    path_costs = costs[tuple(indices.T)].astype("float64")
+    step_lengths = np.where(steps.sum(axis=1) == 2, np.sqrt(2), 1)
+    assert np.sum(step_lengths * (path_costs[1:] + path_costs[:-1]) / 2) == pytest.approx(leg_result.cost)
+
+
+def test_quadtree_portal_spacing_within_tolerance(costs):
+    exact_graph = build_quadtree_graph(costs, portal_spacing=1, max_leaf_size=8)
+    quadtree_graph = build_quadtree_graph(costs, portal_spacing=4, max_leaf_size=8)
+    leg_result = find_quadtree_graph_least_cost_path(quadtree_graph, (0, 0), (-1, -1))
+    expected_leg_result = find_quadtree_graph_least_cost_path(exact_graph, (0, 0), (-1, -1))
+
+    assert quadtree_graph.node_cells.size < exact_graph.node_cells.size
+    assert quadtree_graph.graph.nnz < exact_graph.graph.nnz
+    assert expected_leg_result.cost <= leg_result.cost <= 1.05 * expected_leg_result.cost
+
+
+def test_quadtree_least_cost_path_from_no_data_start():
+    costs = np.full((16, 16), 3, dtype="int8")
+    costs[:, 8:] = 1
+    costs[0, 0] = -1
+    quadtree_graph = build_quadtree_graph(costs, portal_spacing=1, max_leaf_size=8)
+
+    leg_result = find_quadtree_graph_least_cost_path(quadtree_graph, (0, 0), (15, 15))
+    _, expected_cost = route_through_array(costs, (0, 0), (15, 15), geometric=True, fully_connected=True)
+    assert leg_result.cost == pytest.approx(expected_cost)
+
+    costs[:, 7] = -1
+    with pytest.raises(ValueError):
+        find_quadtree_graph_least_cost_path(build_quadtree_graph(costs), (0, 0), (15, 15))
+
+
+def test_quadtree_invalid_parameters(costs):
+    with pytest.raises(ValueError):
+        build_quadtree_graph(costs, portal_spacing=0)
+    with pytest.raises(ValueError):
+        build_quadtree_graph(costs, max_leaf_size=12)
@@ -0,0 +1,112 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+import numpy as np
+import rasterio
+import shapely
+from affine import Affine
+
+from utility_route_planner.models.lcpa.lcpa_datastructures import CachedRoute, LcpaLegResult
+from utility_route_planner.models.lcpa.lcpa_route_cache import (
+    RouteCache,
+    compute_cost_surface_fingerprint,
+    compute_raster_source_fingerprint,
+    get_route_cache_key,
+)
+from utility_route_planner.models.mcda.mcda_datastructures import CostSurface
+from utility_route_planner.util.geo_utilities import load_suitability_raster_data
+
+GEOTRANSFORM = (174000.0, 0.5, 0.0, 451000.0, 0.0, -0.5)
+
+
+def get_cached_route(number_of_cells: int) -> CachedRoute:
+    indices = [(row, row) for row in range(number_of_cells)]
+    route = shapely.LineString([(174000.0 + row, 451000.0 - row) for row in range(number_of_cells)])
+    return CachedRoute(route, [LcpaLegResult(indices, float(number_of_cells), 10)])
+
+
+def test_route_cache_key():
+    costs = np.ones((10, 10), dtype="int8")
+    fingerprint = compute_cost_surface_fingerprint(costs, GEOTRANSFORM)
+    key = get_route_cache_key(fingerprint, [((0, 0), (9, 9))], search_method="mcp")
+
+    assert get_route_cache_key(fingerprint, [((0, 0), (9, 9))], search_method="mcp") == key
+    assert get_route_cache_key(fingerprint, [((0, 0), (9, 8))], search_method="mcp") != key
+    assert get_route_cache_key(fingerprint, [((0, 0), (9, 9))], search_method="astar") != key
+    changed_costs = costs.copy()
+    changed_costs[5, 5] = 2
+    assert compute_cost_surface_fingerprint(changed_costs, GEOTRANSFORM) != fingerprint
+    assert compute_cost_surface_fingerprint(costs, (174000.5, *GEOTRANSFORM[1:])) != fingerprint
+
+
+def write_raster(costs: np.ndarray, path_raster):
+    with rasterio.open(
+        path_raster,
+        "w",
+        driver="GTiff",
+        height=costs.shape[0],
+        width=costs.shape[1],
+        count=1,
+        dtype="int8",
+        nodata=-1,
+        transform=Affine.from_gdal(*GEOTRANSFORM),
+    ) as dst:
+        dst.write(costs, 1)
+
+
+def test_raster_source_fingerprint(tmp_path):
+    costs = np.ones((20, 20), dtype="int8")
+    path_raster = tmp_path / "suitability_raster.tif"
+    write_raster(costs, path_raster)
+    cost_surface = CostSurface(costs, Affine.from_gdal(*GEOTRANSFORM), nodata=-1)
+    project_area = shapely.box(174001.2, 450992.3, 174004.6, 450998.1)
+
+    for raster in (cost_surface, path_raster):
+        fingerprint, geotransform = compute_raster_source_fingerprint(raster, project_area)
+        # The geotransform of the route points equals the one of the raster as read on a cache miss.
+        assert geotransform == load_suitability_raster_data(raster, project_area)[1]
+        assert compute_raster_source_fingerprint(raster, project_area) == (fingerprint, geotransform)
+        assert compute_raster_source_fingerprint(raster, project_area.buffer(1))[0] != fingerprint
+
+    # Rewriting the raster file or changing the cost surface in memory changes the fingerprint.
+    fingerprint, _ = compute_raster_source_fingerprint(path_raster, project_area)
+    costs[5, 5] = 2
+    write_raster(costs, path_raster)
+    modification_time = path_raster.stat().st_mtime_ns + 1_000_000
+    os.utime(path_raster, ns=(modification_time, modification_time))
+    assert compute_raster_source_fingerprint(path_raster, project_area)[0] != fingerprint
+    fingerprint, _ = compute_raster_source_fingerprint(cost_surface, project_area)
+    costs[6, 6] = 2
+    assert compute_raster_source_fingerprint(cost_surface, project_area)[0] != fingerprint
+
+
+def test_route_cache_round_trip(tmp_path):
+    route_cache = RouteCache(tmp_path / "route_cache.sqlite")
+    cached_route = get_cached_route(5)
+
+    assert route_cache.get("route") is None
+    route_cache.put("route", cached_route)
+    loaded_route = RouteCache(tmp_path / "route_cache.sqlite").get("route")
+    assert loaded_route.route.equals(cached_route.route)
+    assert loaded_route.leg_results[0].indices == cached_route.leg_results[0].indices
+    assert loaded_route.leg_results[0].cost == cached_route.leg_results[0].cost
+    # The route was not searched again.
+    assert loaded_route.leg_results[0].expanded_nodes == 0
+    assert (route_cache.hits, route_cache.misses) == (0, 1)
+
+
+def test_route_cache_evicts_least_recently_used(tmp_path):
+    route_cache = RouteCache(tmp_path / "route_cache.sqlite", max_bytes=2000)
+    for key in ("first", "second", "third"):
+        route_cache.put(key, get_cached_route(20))
+    # Each route takes about 540 bytes, using the first route makes the second the least recently used.
+    assert route_cache.get("first") is not None
+    route_cache.put("fourth", get_cached_route(20))
+
+    assert route_cache.get("second") is None
+    assert all(route_cache.get(key) is not None for key in ("first", "third", "fourth"))
+    assert route_cache.evictions == 1
+    assert (route_cache.hits, route_cache.misses) == (4, 1)
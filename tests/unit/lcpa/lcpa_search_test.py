@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import pytest
+from skimage.graph import route_through_array
+
+from utility_route_planner.models.lcpa.lcpa_search import (
+    find_astar_least_cost_path,
+    find_bucket_least_cost_path,
+    find_compact_least_cost_path,
+    find_least_cost_path_to_nearest_target,
+)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_compact_least_cost_path_equals_route_through_array(random_costs, seed):
+    costs = random_costs(seed, (80, 60))
+
+    leg_result = find_compact_least_cost_path(costs, (0, 0), (-1, -1))
+    expected_path, expected_cost = route_through_array(costs, (0, 0), (-1, -1), geometric=True, fully_connected=True)
+
+    assert leg_result.indices == expected_path
+    assert leg_result.cost == pytest.approx(expected_cost, rel=1e-6)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_astar_least_cost_path_equals_cost_of_route_through_array(random_costs, seed):
+    costs = random_costs(seed, (80, 60))
+
+    leg_result = find_astar_least_cost_path(costs, (0, 0), (-1, -1))
+    _, expected_cost = route_through_array(costs, (0, 0), (-1, -1), geometric=True, fully_connected=True)
+
+    assert (leg_result.indices[0], leg_result.indices[-1]) == ((0, 0), (79, 59))
+    assert leg_result.cost == pytest.approx(expected_cost)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_bucket_least_cost_path_equals_cost_of_route_through_array(random_costs, seed):
+    costs = random_costs(seed, (80, 60))
+    costs[0, 0] = -1  # The start of a route may be no data.
+
+    leg_result = find_bucket_least_cost_path(costs, (0, 0), (-1, -1))
+    _, expected_cost = route_through_array(costs, (0, 0), (-1, -1), geometric=True, fully_connected=True)
+
+    assert (leg_result.indices[0], leg_result.indices[-1]) == ((0, 0), (79, 59))
+    assert leg_result.cost == pytest.approx(expected_cost)
+    # Every cell is expanded at most once.
+    assert leg_result.expanded_nodes <= (costs >= 0).sum() + 1
+
+
+def test_astar_expands_less_nodes_on_uniform_costs():
+    costs = np.full((100, 100), 5, dtype="int8")
+    leg_result = find_astar_least_cost_path(costs, (50, 0), (50, 99), bucket_width=1)
+    leg_result_dijkstra = find_compact_least_cost_path(costs, (50, 0), (50, 99), bucket_width=1)
+
+    assert leg_result.cost == pytest.approx(leg_result_dijkstra.cost)
+    assert leg_result.expanded_nodes < leg_result_dijkstra.expanded_nodes / 10
+
+
+def test_compact_least_cost_path_start_is_end():
+    leg_result = find_compact_least_cost_path(np.ones((3, 3), dtype="int8"), (1, 1), (1, 1))
+    assert leg_result.indices == [(1, 1)]
+    assert leg_result.cost == 0
+
+
+@pytest.mark.parametrize("start, end", [((0, 0), (5, 5)), ((0, 0), (0, -6)), ((-6, 0), (0, 0))])
+def test_compact_least_cost_path_outside_costs(start, end):
+    with pytest.raises(ValueError):
+        find_compact_least_cost_path(np.ones((5, 5), dtype="int8"), start, end)
+
+
+def test_least_cost_path_to_nearest_target_equals_cheapest_pair(random_costs):
+    costs = random_costs(6, (40, 40), nodata_fraction=0)
+    costs[10:30, 20] = -1
+    sources = [(0, 0), (35, 5), (20, 10)]
+    targets = [(39, 39), (5, 35), (0, 25), (20, 30)]
+
+    leg_result, nearest_target = find_least_cost_path_to_nearest_target(costs, sources, targets)
+
+    pair_costs = {
+        (source, target): route_through_array(costs, source, target, geometric=True, fully_connected=True)[1]
+        for source in sources
+        for target in targets
+    }
+    source, target = min(pair_costs, key=pair_costs.get)
+    assert targets[nearest_target] == target
+    assert (leg_result.indices[0], leg_result.indices[-1]) == (source, target)
+    assert leg_result.cost == pytest.approx(pair_costs[source, target])
+
+
+def test_least_cost_path_to_nearest_target_unreachable():
+    costs = np.ones((10, 10), dtype="int8")
+    costs[:, 5] = -1
+    with pytest.raises(ValueError):
+        find_least_cost_path_to_nearest_target(costs, [(0, 0), (9, 0)], [(0, 9), (9, 9)])
@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from rasterio.features import rasterize
+
+from settings import Config
+from utility_route_planner.models.mcda.exceptions import InvalidGroupValue, InvalidSuitabilityRasterInput
+from utility_route_planner.models.mcda.mcda_datastructures import RasterizedCriterion
+from utility_route_planner.models.mcda.vector_preprocessing.base import VectorPreprocessorBase
+from utility_route_planner.models.mcda.mcda_rasterizing import (
+    CriteriaRasterMerger,
+    dilate_vector_data_in_window,
+    get_buffer_distances,
+    get_raster_settings,
+    prepare_criterion,
+    rasterize_vector_data,
+    rasterize_vector_data_in_window,
+    select_block_features,
+)
+
+NO_DATA = Config.INTERMEDIATE_RASTER_NO_DATA
+
+
+class TestCriteriaRasterMerger:
+    def test_merge_groups(self):
+        criteria_raster_merger = CriteriaRasterMerger(1, 6)
+        for group, raster in [
+            ("a", [10, 20, NO_DATA, NO_DATA, 30, -5]),
+            ("a", [15, NO_DATA, NO_DATA, NO_DATA, 40, -10]),
+            ("b", [5, NO_DATA, 7, NO_DATA, 32000, 0]),
+            # The sum of group b exceeds the int16 range before it is clipped.
+            ("b", [-3, NO_DATA, NO_DATA, NO_DATA, 32000, NO_DATA]),
+            ("c", [NO_DATA, 1, NO_DATA, NO_DATA, NO_DATA, NO_DATA]),
+        ]:
+            criteria_raster_merger.add(RasterizedCriterion(group, np.array([raster], dtype="int16"), group))
+        merged_raster = criteria_raster_merger.merge()
+
+        assert merged_raster.mask.tolist() == [[False, True, False, True, False, False]]
+        assert merged_raster.compressed().tolist() == [17, 7, Config.FINAL_RASTER_VALUE_LIMIT_UPPER, 1]
+
+    def test_merge_window(self):
+        raster_settings = get_raster_settings(shapely.box(0, 0, 40, 30), cell_size=1)
+        dense_merger = CriteriaRasterMerger(raster_settings.height, raster_settings.width)
+        window_merger = CriteriaRasterMerger(raster_settings.height, raster_settings.width)
+        for group, geometries, suitability_values in [
+            ("a", [shapely.box(-5, -5, 45, 35)], [20]),
+            ("a", [shapely.box(3, 3, 7, 9), shapely.box(11, 2, 19, 4)], [30, 25]),
+            ("b", [shapely.box(9, 10, 30, 21), shapely.Point(35, 25).buffer(4)], [-5, 10]),
+            ("c", [shapely.box(2.6, 20.2, 13.4, 27.7)], [1]),
+            ("c", [], []),
+        ]:
+            gdf = gpd.GeoDataFrame({"suitability_value": suitability_values}, geometry=geometries, crs=Config.CRS)
+            window, raster = rasterize_vector_data_in_window(group, gdf, raster_settings)
+            assert raster.shape == (window.height, window.width)
+            window_merger.add(RasterizedCriterion(group, raster, group, window))
+            dense_merger.add(RasterizedCriterion(group, rasterize_vector_data(group, gdf, raster_settings), group))
+
+        dense_raster, window_raster = dense_merger.merge(), window_merger.merge()
+        assert np.array_equal(window_raster.mask, dense_raster.mask)
+        assert np.array_equal(window_raster.filled(0), dense_raster.filled(0))
+
+    def test_merge_without_group_a_and_b(self):
+        criteria_raster_merger = CriteriaRasterMerger(2, 2)
+        criteria_raster_merger.add(RasterizedCriterion("c", np.full((2, 2), 1, dtype="int16"), "c"))
+        with pytest.raises(InvalidSuitabilityRasterInput):
+            criteria_raster_merger.merge()
+        with pytest.raises(InvalidGroupValue):
+            criteria_raster_merger.add(RasterizedCriterion("d", np.full((2, 2), 1, dtype="int16"), "d"))
+
+
+class TestPreparedCriterion:
+    @pytest.fixture
+    def gdf(self):
+        return gpd.GeoDataFrame(
+            {"suitability_value": [40, NO_DATA, 99999, 10, 40]},
+            geometry=[
+                shapely.box(0, 0, 10, 10),
+                shapely.box(5, 5, 15, 15),
+                shapely.box(12, 0, 20, 8),
+                shapely.box(2, 2, 18, 18),
+                shapely.box(30, 30, 40, 40),
+            ],
+            crs=Config.CRS,
+        )
+
+    def test_prepare_criterion_sorts_and_clips_once(self, gdf):
+        prepared_criterion = prepare_criterion("test", "a", gdf.geometry.to_numpy(), gdf.suitability_value.to_numpy())
+
+        assert prepared_criterion.suitability_values.dtype == "int16"
+        assert prepared_criterion.suitability_values.tolist() == [NO_DATA + 1, 10, 40, 40, np.iinfo("int16").max]
+        # Equal values keep their original order.
+        assert prepared_criterion.geometries[2].equals(gdf.geometry.iloc[0])
+
+        block_criterion = select_block_features(prepared_criterion, shapely.box(0, 0, 20, 20))
+        assert block_criterion.tree is None
+        assert block_criterion.suitability_values.tolist() == [NO_DATA + 1, 10, 40, np.iinfo("int16").max]
+
+    def test_rasterize_prepared_criterion_equals_geodataframe(self, gdf):
+        raster_settings = get_raster_settings(shapely.box(0, 0, 40, 40), cell_size=1)
+        prepared_criterion = prepare_criterion("test", "a", gdf.geometry.to_numpy(), gdf.suitability_value.to_numpy())
+
+        assert np.array_equal(
+            rasterize_vector_data("test", prepared_criterion, raster_settings),
+            rasterize_vector_data("test", gdf, raster_settings),
+        )
+
+
+class TestBufferInRasterSpace:
+    @pytest.fixture
+    def gdf(self):
+        rng = np.random.default_rng(7)
+        points = shapely.points(rng.uniform(-10, 70, (40, 2)))
+        lines = shapely.linestrings(rng.uniform(-10, 70, (10, 2, 2)))
+        return gpd.GeoDataFrame(
+            {
+                "suitability_value": rng.choice([3, 10, 51], 50),
+                "buffer_value": np.repeat([5, 2.3, 0.7, 5, 1.5], 10),
+            },
+            geometry=np.concatenate([points, lines]),
+            crs=Config.CRS,
+        )
+
+    def buffer_geometries(self, gdf: gpd.GeoDataFrame, buffer_in_raster_space: bool) -> gpd.GeoDataFrame:
+        gdf = gdf.copy()
+        for buffer_value in gdf["buffer_value"].unique():
+            gdf = VectorPreprocessorBase.buffer_geometries(
+                gdf, buffer_value, gdf["buffer_value"].eq(buffer_value).to_numpy(), buffer_in_raster_space
+            )
+        return gdf
+
+    def test_dilation_equals_vector_buffer_within_a_cell(self, gdf):
+        raster_settings = get_raster_settings(shapely.box(0, 0, 60, 60), cell_size=1)
+        vector_gdf = self.buffer_geometries(gdf, buffer_in_raster_space=False)
+        raster_gdf = self.buffer_geometries(gdf, buffer_in_raster_space=True)
+        assert raster_gdf.geometry.equals(gdf.geometry)
+
+        vector_raster = rasterize_vector_data("test", vector_gdf, raster_settings)
+        raster_raster = rasterize_vector_data("test", raster_gdf, raster_settings)
+
+        # Only cells at the boundary of the buffered geometries can differ.
+        rows, cols = np.nonzero(vector_raster != raster_raster)
+        cell_centres = shapely.points(cols + 0.5, 60 - rows - 0.5)
+        buffered_boundaries = shapely.union_all(vector_gdf.boundary.to_numpy())
+        assert shapely.distance(cell_centres, buffered_boundaries).max() <= 1
+
+    def test_select_block_features_within_buffer_distance(self, gdf):
+        raster_gdf = self.buffer_geometries(gdf, buffer_in_raster_space=True)
+        prepared_criterion = prepare_criterion(
+            "test",
+            "a",
+            raster_gdf.geometry.to_numpy(),
+            raster_gdf.suitability_value.to_numpy(),
+            get_buffer_distances(raster_gdf),
+        )
+        block_geometry = shapely.box(20, 10, 45, 30)
+        raster_settings = get_raster_settings(block_geometry, cell_size=0.5)
+        block_criterion = select_block_features(prepared_criterion, block_geometry, cell_size=0.5)
+
+        assert len(block_criterion.geometries) < len(prepared_criterion.geometries)
+        assert np.array_equal(
+            rasterize_vector_data("test", block_criterion, raster_settings),
+            rasterize_vector_data("test", raster_gdf, raster_settings),
+        )
+
+
+class TestBurnPoints:
+    @pytest.mark.parametrize("cell_size", [0.5, 2.5])
+    def test_burn_points_equals_gdal(self, cell_size):
+        rng = np.random.default_rng(11)
+        # Coordinates on the edges of the cells as well, these must be assigned to the same cell as GDAL does.
+        coordinates = np.round(rng.uniform(-5, 55, (200, 2)) * 2) / 2 + [1000, 2000]
+        coordinates[::2] += rng.uniform(0, 0.5, (100, 2))
+        geometries = [
+            *shapely.points(coordinates[3:]),
+            shapely.multipoints(coordinates[:3]),
+            shapely.box(1010, 2010, 1020, 2015),
+        ]
+        gdf = gpd.GeoDataFrame(
+            {"suitability_value": rng.integers(-50, 50, len(geometries))}, geometry=geometries, crs=Config.CRS
+        )
+        raster_settings = get_raster_settings(shapely.box(1000, 2000, 1050, 2032), cell_size=cell_size)
+
+        prepared_criterion = prepare_criterion("test", "a", gdf.geometry.to_numpy(), gdf.suitability_value.to_numpy())
+        expected_raster = rasterize(
+            zip(prepared_criterion.geometries, prepared_criterion.suitability_values.tolist()),
+            out=np.full((raster_settings.height, raster_settings.width), NO_DATA, dtype="int16"),
+            transform=raster_settings.transform,
+        )
+        assert np.array_equal(rasterize_vector_data("test", gdf, raster_settings), expected_raster)
+
+    def test_stamp_points_equals_dilation(self):
+        rng = np.random.default_rng(12)
+        points = shapely.points(rng.uniform(-10, 60, (100, 2)))
+        raster_settings = get_raster_settings(shapely.box(0, 0, 50, 50), cell_size=0.5)
+
+        window, raster = dilate_vector_data_in_window(points, 10, 3.2, raster_settings)
+        # A line outside the raster dilates the points using the distance transform instead.
+        line = shapely.LineString([(-100, -100), (-100, -90)])
+        expected_window, expected_raster = dilate_vector_data_in_window(
+            np.append(points, line), 10, 3.2, raster_settings
+        )
+
+        stamped_raster = np.full((raster_settings.height, raster_settings.width), NO_DATA, dtype="int16")
+        stamped_raster[window.toslices()] = raster
+        dilated_raster = np.full((raster_settings.height, raster_settings.width), NO_DATA, dtype="int16")
+        dilated_raster[expected_window.toslices()] = expected_raster
+        assert np.array_equal(stamped_raster, dilated_raster)
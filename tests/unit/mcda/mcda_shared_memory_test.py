@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from settings import Config
+from utility_route_planner.models.mcda.mcda_shared_memory import (
+    SharedCriteria,
+    clip_suitability_values,
+    read_shared_criteria,
+)
+
+
+class TestSharedCriteria:
+    def test_clip_suitability_values(self):
+        values = np.array(
+            [
+                Config.INTERMEDIATE_RASTER_NO_DATA,
+                Config.INTERMEDIATE_RASTER_VALUE_LIMIT_LOWER - 1000,
+                Config.INTERMEDIATE_RASTER_VALUE_LIMIT_UPPER + 1000,
+                5,
+            ]
+        )
+        clipped = clip_suitability_values(values)
+
+        assert clipped.dtype == np.int16
+        assert clipped.tolist() == [
+            Config.INTERMEDIATE_RASTER_NO_DATA + 1,
+            Config.INTERMEDIATE_RASTER_VALUE_LIMIT_LOWER,
+            Config.INTERMEDIATE_RASTER_VALUE_LIMIT_UPPER,
+            5,
+        ]
+
+    def test_shared_criteria_round_trip(self):
+        criterion_a = gpd.GeoDataFrame(
+            data=[[10, shapely.box(0, 0, 10, 10)], [-5, shapely.Point(3, 3)]],
+            columns=["suitability_value", "geometry"],
+            geometry="geometry",
+            crs=Config.CRS,
+        )
+        criterion_b = gpd.GeoDataFrame(
+            data=[[126, shapely.LineString([(0, 0), (5, 5)])]],
+            columns=["suitability_value", "geometry"],
+            geometry="geometry",
+            crs=Config.CRS,
+        )
+        empty_criterion = gpd.GeoDataFrame(columns=["suitability_value", "geometry"], geometry="geometry")
+        vectors = {"criterion_a": criterion_a, "criterion_b": criterion_b, "empty_criterion": empty_criterion}
+        groups = {"criterion_a": "a", "criterion_b": "b", "empty_criterion": "c"}
+
+        with SharedCriteria(vectors, groups) as shared_criteria:
+            criteria = read_shared_criteria(shared_criteria.description)
+
+        assert list(criteria.keys()) == list(vectors.keys())
+        for criterion, (group, geometries, suitability_values, buffer_distances) in criteria.items():
+            assert group == groups[criterion]
+            assert buffer_distances is None
+            assert suitability_values.dtype == np.int16
+            assert suitability_values.tolist() == vectors[criterion].suitability_value.tolist()
+            assert all(shapely.equals(geometries, vectors[criterion].geometry.values))
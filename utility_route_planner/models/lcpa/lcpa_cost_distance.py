@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+import rasterio
+import structlog
+from affine import Affine
+from rasterio.windows import Window
+from skimage.graph import MCP_Geometric
+
+from utility_route_planner.models.lcpa.lcpa_datastructures import CostDistanceRasters, LcpaLegResult
+from utility_route_planner.models.lcpa.lcpa_search import NEIGHBOUR_OFFSETS, NO_PREDECESSOR
+from utility_route_planner.models.mcda.mcda_datastructures import McdaRasterSettings
+
+logger = structlog.get_logger(__name__)
+
+# Cells which cannot be reached from the sources.
+COST_DISTANCE_NO_DATA = -1
+
+
+def compute_cost_distance(costs: np.ndarray, sources: list[tuple[int, int]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Accumulated cost from the nearest source to every cell of the raster and the direction towards the previous cell
+    on its least cost path. The direction is the index in NEIGHBOUR_OFFSETS, equal to the order of skimage.
+
+    :param costs: 2d array with the cost of each cell, negative cells are not traversable.
+    :param sources: row and column indices of the source cells.
+    :return: float32 accumulated costs and uint8 directions, NO_PREDECESSOR for sources and unreachable cells.
+    """
+    mcp = MCP_Geometric(costs, fully_connected=True)
+    cumulative_costs, traceback = mcp.find_costs(sources)
+    directions = np.where(traceback >= 0, traceback, NO_PREDECESSOR).astype("uint8")
+    cumulative_costs = np.where(np.isfinite(cumulative_costs), cumulative_costs, COST_DISTANCE_NO_DATA)
+    return cumulative_costs.astype("float32"), directions
+
+
+def write_cost_distance_rasters(
+    cumulative_costs: np.ndarray, directions: np.ndarray, transform: Affine, path_prefix: Path
+) -> CostDistanceRasters:
+    """Write the accumulated costs and directions as tiled GeoTIFFs, aligned with the suitability raster."""
+    height, width = cumulative_costs.shape
+    rasters = CostDistanceRasters(f"{path_prefix}cost_distance.tif", f"{path_prefix}cost_distance_directions.tif")
+    for path, array, nodata in [
+        (rasters.path_cumulative_costs, cumulative_costs, COST_DISTANCE_NO_DATA),
+        (rasters.path_directions, directions, NO_PREDECESSOR),
+    ]:
+        raster_settings = McdaRasterSettings(width, height, nodata, transform, dtype=array.dtype.name)
+        with rasterio.open(path, "w", **asdict(raster_settings)) as dest:
+            dest.write(array, 1)
+    logger.info(f"Written cost distance rasters to {rasters.path_cumulative_costs} and {rasters.path_directions}.")
+    return rasters
+
+
+def trace_path_from_cost_distance_rasters(rasters: CostDistanceRasters, destination: tuple[int, int]) -> LcpaLegResult:
+    """
+    Least cost path from the nearest source to the destination, following the directions back from the destination.
+    Only the tiles of the direction raster which the path passes are read, such that the time of a query depends on the
+    length of the path instead of the size of the raster.
+
+    :param rasters: accumulated cost and direction rasters of the sources.
+    :param destination: row and column index of the destination cell.
+    :return: row and column indices of the least cost path from the source to the destination and its cost.
+    """
+    row, column = destination
+    with rasterio.open(rasters.path_cumulative_costs) as src:
+        if not (0 <= row < src.height and 0 <= column < src.width):
+            raise ValueError("Destination must be within the cost distance raster.")
+        cost = float(src.read(1, window=Window(column, row, 1, 1))[0, 0])
+    if cost == COST_DISTANCE_NO_DATA:
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    path = [(row, column)]
+    with rasterio.open(rasters.path_directions) as src:
+        tile_height, tile_width = src.block_shapes[0]
+        tiles: dict[tuple[int, int], np.ndarray] = {}
+        while True:
+            tile_index = row // tile_height, column // tile_width
+            if tile_index not in tiles:
+                window = Window(tile_index[1] * tile_width, tile_index[0] * tile_height, tile_width, tile_height)
+                tiles[tile_index] = src.read(1, window=window, boundless=True, fill_value=NO_PREDECESSOR)
+            direction = tiles[tile_index][row % tile_height, column % tile_width]
+            if direction == NO_PREDECESSOR:
+                break
+            row, column = row - NEIGHBOUR_OFFSETS[direction][0], column - NEIGHBOUR_OFFSETS[direction][1]
+            path.append((int(row), int(column)))
+
+    logger.info(f"Traced a path of {len(path)} cells reading {len(tiles)} tiles of the direction raster.")
+    path.reverse()
+    return LcpaLegResult(path, cost, 0)
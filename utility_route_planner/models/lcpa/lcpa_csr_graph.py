@@ -0,0 +1,167 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import functools
+from pathlib import Path
+
+import numpy as np
+import structlog
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from utility_route_planner.models.lcpa.lcpa_datastructures import CsrGraph, LcpaLegResult
+from utility_route_planner.models.lcpa.lcpa_search import NEIGHBOUR_HALF_LENGTHS, NEIGHBOUR_OFFSETS
+
+logger = structlog.get_logger(__name__)
+
+# Arrays of a persisted graph, stored as .npy files in the graph directory such that they can be memory-mapped.
+CSR_GRAPH_ARRAYS = ("indptr", "indices", "data", "node_ids", "node_cells", "costs", "geotransform")
+
+
+def build_csr_graph(costs: np.ndarray, geotransform: tuple) -> CsrGraph:
+    """
+    Convert the suitability raster to a graph of which the nodes are the traversable cells, connected to their 8
+    neighbours. The weight of an edge is the mean cost of both cells times the distance, equal to route_through_array
+    with geometric=True and fully_connected=True.
+
+    :param costs: 2d array with the cost of each cell, negative cells are not traversable.
+    :param geotransform: metadata of the raster from gdal.
+    :return: the graph as sparse matrix, the node of each cell and the cell of each node.
+    """
+    height, width = costs.shape
+    is_node = costs >= 0
+    node_ids = np.full(costs.shape, -1, dtype="int32")
+    node_ids[is_node] = np.arange(np.count_nonzero(is_node), dtype="int32")
+
+    sources, targets, weights = [], [], []
+    for (row_offset, column_offset), half_length in zip(NEIGHBOUR_OFFSETS, NEIGHBOUR_HALF_LENGTHS):
+        # Slices of the cells and their neighbour in this direction, which are both within the raster.
+        cells = (
+            slice(max(-row_offset, 0), height - max(row_offset, 0)),
+            slice(max(-column_offset, 0), width - max(column_offset, 0)),
+        )
+        neighbours = (
+            slice(max(row_offset, 0), height + min(row_offset, 0)),
+            slice(max(column_offset, 0), width + min(column_offset, 0)),
+        )
+        is_edge = is_node[cells] & is_node[neighbours]
+        sources.append(node_ids[cells][is_edge])
+        targets.append(node_ids[neighbours][is_edge])
+        weights.append(
+            half_length * (costs[cells][is_edge].astype("float64") + costs[neighbours][is_edge].astype("float64"))
+        )
+
+    number_of_nodes = int(np.count_nonzero(is_node))
+    graph = csr_matrix(
+        (np.concatenate(weights), (np.concatenate(sources), np.concatenate(targets))),
+        shape=(number_of_nodes, number_of_nodes),
+    )
+    logger.info(f"Built a graph of {number_of_nodes} nodes and {graph.nnz} edges.")
+    return CsrGraph(graph, node_ids, np.flatnonzero(is_node), costs, geotransform)
+
+
+def write_csr_graph(csr_graph: CsrGraph, path_graph: Path) -> Path:
+    """Write the arrays of the graph as .npy files to the graph directory."""
+    path_graph.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        "indptr": csr_graph.graph.indptr,
+        "indices": csr_graph.graph.indices,
+        "data": csr_graph.graph.data,
+        "node_ids": csr_graph.node_ids,
+        "node_cells": csr_graph.node_cells,
+        "costs": csr_graph.costs,
+        "geotransform": np.array(csr_graph.geotransform, dtype="float64"),
+    }
+    for name in CSR_GRAPH_ARRAYS:
+        np.save(path_graph / f"{name}.npy", arrays[name])
+    logger.info(f"Written graph to {path_graph}.")
+    return path_graph
+
+
+def load_csr_graph(path_graph: Path) -> CsrGraph:
+    """
+    Load a graph written by write_csr_graph. The arrays are memory-mapped, such that only the parts of the graph which
+    are visited by a search are read from disk. The graph is cached per path and modification time of its files, such
+    that it is loaded only once and reloaded when the graph is rewritten.
+    """
+    return _load_csr_graph(path_graph, get_file_stamps(path_graph, CSR_GRAPH_ARRAYS))
+
+
+def get_file_stamps(path_directory: Path, array_names: tuple[str, ...]) -> tuple[tuple[int, int], ...]:
+    """Modification time in nanoseconds and size of the .npy file of each array, which change when it is rewritten."""
+    file_stats = [(path_directory / f"{name}.npy").stat() for name in array_names]
+    return tuple((file_stat.st_mtime_ns, file_stat.st_size) for file_stat in file_stats)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_csr_graph(path_graph: Path, file_stamps: tuple[tuple[int, int], ...]) -> CsrGraph:
+    arrays = {name: np.load(path_graph / f"{name}.npy", mmap_mode="r") for name in CSR_GRAPH_ARRAYS}
+    number_of_nodes = len(arrays["indptr"]) - 1
+    graph = csr_matrix(
+        (arrays["data"], arrays["indices"], arrays["indptr"]), shape=(number_of_nodes, number_of_nodes), copy=False
+    )
+    logger.info(f"Loaded graph of {number_of_nodes} nodes from {path_graph}.")
+    return CsrGraph(
+        graph, arrays["node_ids"], arrays["node_cells"], arrays["costs"], tuple(arrays["geotransform"].tolist())
+    )
+
+
+def find_csr_least_cost_path(csr_graph: CsrGraph, start: tuple[int, int], end: tuple[int, int]) -> LcpaLegResult:
+    """
+    Least cost path using scipy.sparse.csgraph.dijkstra on the graph, equal to route_through_array with geometric=True
+    and fully_connected=True. The search starts at the end of the leg, which is allowed as the edges are symmetrical,
+    such that a start on a cell without data is connected through its cheapest traversable neighbour.
+
+    :param csr_graph: graph of the suitability raster.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :return: row and column indices of the least cost path from start to end, its cost and the expanded nodes.
+    """
+    height, width = csr_graph.node_ids.shape
+    for row, column in (start, end):
+        if not (-height <= row < height and -width <= column < width):
+            raise ValueError("End points must all be within the costs array.")
+    start = start[0] % height, start[1] % width
+    end = end[0] % height, end[1] % width
+    end_node = int(csr_graph.node_ids[end])
+    if end_node < 0:
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    # The graph contains the edges in both directions, as directed graph the memory-mapped arrays are used as is.
+    distances, predecessors = dijkstra(csr_graph.graph, directed=True, indices=end_node, return_predecessors=True)
+    expanded_nodes = int(np.isfinite(distances).sum())
+
+    node = int(csr_graph.node_ids[start])
+    if node >= 0:
+        path, cost = [], float(distances[node])
+    else:
+        path = [start]
+        node, cost = find_cheapest_neighbour_node(csr_graph, start, distances)
+    if not np.isfinite(cost):
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    # Follow the predecessors towards the end of the leg, which is the source of the search.
+    while True:
+        path.append(divmod(int(csr_graph.node_cells[node]), width))
+        if node == end_node:
+            break
+        node = int(predecessors[node])
+    return LcpaLegResult(path, cost, expanded_nodes)
+
+
+def find_cheapest_neighbour_node(
+    csr_graph: CsrGraph, cell: tuple[int, int], distances: np.ndarray
+) -> tuple[int, float]:
+    """Neighbour node of a cell which is not a node, through which the cell is reached at the lowest cost."""
+    height, width = csr_graph.node_ids.shape
+    cheapest_node, cheapest_cost = -1, np.inf
+    for (row_offset, column_offset), half_length in zip(NEIGHBOUR_OFFSETS, NEIGHBOUR_HALF_LENGTHS):
+        row, column = cell[0] + row_offset, cell[1] + column_offset
+        if not (0 <= row < height and 0 <= column < width) or csr_graph.node_ids[row, column] < 0:
+            continue
+        node = int(csr_graph.node_ids[row, column])
+        step_cost = half_length * (float(csr_graph.costs[cell]) + float(csr_graph.costs[row, column]))
+        if distances[node] + step_cost < cheapest_cost:
+            cheapest_node, cheapest_cost = node, float(distances[node] + step_cost)
+    return cheapest_node, cheapest_cost
@@ -5,10 +5,12 @@
 from dataclasses import dataclass
 
 import geopandas as gpd
+import numpy as np
 import shapely
+from scipy.sparse import csr_matrix
 
 from settings import Config
-from utility_route_planner.util.geo_utilities import coordinates_to_array_index
+from utility_route_planner.util.geo_utilities import coordinates_to_array_index, geometries_to_array_indices
 
 
 @dataclass
@@ -26,12 +28,100 @@ class Geotransform:
         self.upper_left_x, self.x_size, self.x_rotation, self.upper_left_y, self.y_rotation, self.y_size = geotransform
 
 
+@dataclass
+class LcpaLegResult:
+    indices: list[tuple[int, int]]
+    cost: float
+    # Number of cells of which the neighbours were evaluated, a measure of the amount of work done by the search.
+    expanded_nodes: int
+
+
+@dataclass
+class CostDistanceRasters:
+    # Accumulated cost from the nearest source to each cell, float32.
+    path_cumulative_costs: str
+    # Direction towards the previous cell on the least cost path to the nearest source, uint8.
+    path_directions: str
+
+
+@dataclass
+class CsrGraph:
+    # Symmetrical graph of the traversable cells, weighted by the cost of a step between two cells.
+    graph: csr_matrix
+    # Node of each cell of the raster, -1 for cells which are not traversable.
+    node_ids: np.ndarray
+    # Flat index of the cell of each node.
+    node_cells: np.ndarray
+    costs: np.ndarray
+    geotransform: tuple
+
+
+@dataclass
+class QuadtreeGraph:
+    # Symmetrical graph of the portals on the boundaries of the leaves, weighted by the cost of the path between them.
+    graph: csr_matrix
+    # Leaf of each cell of the raster, -1 for cells which are not traversable.
+    leaf_ids: np.ndarray
+    # Cost of the cells of each leaf.
+    leaf_costs: np.ndarray
+    # The portals of leaf i are the nodes leaf_indptr[i] up to leaf_indptr[i + 1].
+    leaf_indptr: np.ndarray
+    # Flat index of the cell of each node.
+    node_cells: np.ndarray
+    costs: np.ndarray
+
+
+@dataclass
+class BlockBoundaryCosts:
+    # Flat index of the traversable cells of the block which neighbour a cell of another block.
+    boundary_cells: np.ndarray
+    # Least cost between two boundary cells within the block, as flat index of both cells and the cost.
+    source_cells: np.ndarray
+    target_cells: np.ndarray
+    costs: np.ndarray
+
+
+@dataclass
+class OverlayGraph:
+    # Graph of the boundary cells of all blocks, weighted by the least cost within a block or of a step between blocks.
+    graph: csr_matrix
+    # Flat index of the cell of each node, the boundary cells of block i are the nodes block_indptr[i] up to
+    # block_indptr[i + 1].
+    node_cells: np.ndarray
+    block_indptr: np.ndarray
+    # Boundary costs per block id, reused for blocks which did not change when the overlay graph is rebuilt.
+    block_boundary_costs: dict[int, BlockBoundaryCosts]
+    block_size: int
+    costs: np.ndarray
+    geotransform: tuple
+
+
+@dataclass
+class LandmarkDistances:
+    # Row and column index of each landmark cell.
+    landmarks: np.ndarray
+    # Cost distance from each landmark to every cell, float32 with inf for unreachable cells, or uint16 quantized in
+    # steps of scale with LANDMARK_UNREACHABLE for unreachable cells.
+    distances: np.ndarray
+    scale: float
+    costs: np.ndarray
+    geotransform: tuple
+
+
+@dataclass
+class CachedRoute:
+    # Least cost path as aligned linestring, as returned by get_lcpa_route.
+    route: shapely.LineString
+    # Row and column indices and cost of each leg of the route.
+    leg_results: list[LcpaLegResult]
+
+
 @dataclass
 class LcpaInputModel:
     input_linestring: shapely.LineString
-    idx_start = tuple
-    idx_end = tuple
-    idx_stops = list[tuple]
+    idx_start: tuple
+    idx_end: tuple
+    idx_stops: list[tuple]
     route_points = gpd.GeoDataFrame
 
     def __init__(self, input_linestring, geotransform):
@@ -52,6 +142,12 @@ class LcpaInputModel:
         # Create GeoDataFrame with points and their respective raster indices for easier debugging.
         self._get_route_points(input_linestring, point_raster_indices)
 
+    @property
+    def legs(self) -> list[tuple[tuple, tuple]]:
+        """Start and end index of each leg of the route, from the start via the stops to the end."""
+        route_indices = [self.idx_start, *self.idx_stops, self.idx_end]
+        return list(zip(route_indices[:-1], route_indices[1:]))
+
     def _get_idx_start(self, route_coordinates):
         self.idx_start = coordinates_to_array_index(
             route_coordinates[0][0],
@@ -96,3 +192,29 @@ class LcpaInputModel:
         )
         self.route_points.reset_index(names="point_visiting_order_asc", inplace=True)
         self.route_points.raster_index = self.route_points.raster_index.astype(str)
+
+
+@dataclass
+class LcpaMultiInputModel:
+    """
+    Sets of source and target cells between which the least cost path is computed, for example from a new asset to the
+    nearest point of the existing network.
+    """
+
+    idx_sources: list[tuple[int, int]]
+    idx_targets: list[tuple[int, int]]
+    # Index of the target geometry of each target cell.
+    target_ids: list[int]
+
+    def __init__(
+        self,
+        sources: list[shapely.Geometry],
+        targets: list[shapely.Geometry],
+        geotransform: tuple,
+        shape: tuple[int, int],
+    ):
+        self.geotransform = Geotransform(geotransform)
+        self.idx_sources, _ = geometries_to_array_indices(sources, geotransform, shape)
+        self.idx_targets, self.target_ids = geometries_to_array_indices(targets, geotransform, shape)
+        if len(self.idx_sources) == 0 or len(self.idx_targets) == 0:
+            raise ValueError("The sources and targets must both intersect the suitability raster.")
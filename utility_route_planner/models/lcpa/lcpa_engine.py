@@ -2,45 +2,176 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+from concurrent.futures.process import ProcessPoolExecutor
+from pathlib import Path
+
+import geopandas as gpd
+import rasterio
+from affine import Affine
 import structlog
 import numpy as np
 import shapely
-from skimage.graph import route_through_array
+from skimage.graph import MCP_Geometric
 
 from settings import Config
-from utility_route_planner.models.lcpa.lcpa_datastructures import LcpaInputModel
+from utility_route_planner.models.lcpa.lcpa_cost_distance import (
+    compute_cost_distance,
+    trace_path_from_cost_distance_rasters,
+    write_cost_distance_rasters,
+)
+from utility_route_planner.models.lcpa.lcpa_csr_graph import (
+    build_csr_graph,
+    find_csr_least_cost_path,
+    load_csr_graph,
+    write_csr_graph,
+)
+from utility_route_planner.models.lcpa.lcpa_datastructures import (
+    CachedRoute,
+    CostDistanceRasters,
+    LcpaInputModel,
+    LcpaLegResult,
+    LcpaMultiInputModel,
+    OverlayGraph,
+)
+from utility_route_planner.models.lcpa.lcpa_hierarchical import SearchFunction, find_hierarchical_least_cost_path
+from utility_route_planner.models.lcpa.lcpa_landmarks import (
+    compute_landmark_distances,
+    find_alt_least_cost_path,
+    load_landmark_distances,
+    write_landmark_distances,
+)
+from utility_route_planner.models.lcpa.lcpa_out_of_core import RasterBlockCache, find_out_of_core_least_cost_path
+from utility_route_planner.models.lcpa.lcpa_overlay import build_overlay_graph, find_overlay_least_cost_path
+from utility_route_planner.models.lcpa.lcpa_quadtree import (
+    build_quadtree_graph,
+    find_quadtree_graph_least_cost_path,
+    find_quadtree_least_cost_path,
+)
+from utility_route_planner.models.lcpa.lcpa_route_cache import (
+    RouteCache,
+    compute_cost_surface_fingerprint,
+    compute_raster_source_fingerprint,
+    get_route_cache_key,
+)
+from utility_route_planner.models.lcpa.lcpa_search import (
+    find_astar_least_cost_path,
+    find_bucket_least_cost_path,
+    find_compact_least_cost_path,
+    find_least_cost_path_to_nearest_target,
+    find_mcp_least_cost_path,
+    find_skimage_least_cost_path,
+)
+from utility_route_planner.models.lcpa.lcpa_shared_memory import SharedCostArray, init_worker, compute_leg_in_worker
+from utility_route_planner.models.mcda.mcda_datastructures import CostSurface
 from utility_route_planner.util.geo_utilities import (
     array_indices_to_linestring,
     align_linestring,
+    coordinates_to_array_index,
     load_suitability_raster_data,
 )
+from utility_route_planner.util.memory import trace_peak_memory
 from utility_route_planner.util.timer import time_function
 from utility_route_planner.util.write import write_results_to_geopackage
 
 logger = structlog.get_logger(__name__)
 
+SEARCH_METHODS = ("mcp", "compact", "astar", "bucket", "quadtree")
+
 
 class LcpaUtilityRouteEngine:
     route_model: LcpaInputModel
+    multi_route_model: LcpaMultiInputModel
+    reached_target: int
     lcpa_result: shapely.LineString
+    peak_memory_bytes: int
+    leg_results: list[LcpaLegResult]
+    expanded_nodes: int
+    block_fetches: int
+    block_evictions: int
 
     @time_function
     def get_lcpa_route(
         self,
-        path_raster: str,
+        path_raster: str | CostSurface,
         utility_route_sketch: shapely.LineString,
         project_area: shapely.Polygon = shapely.Polygon(),
+        search_method: str = "mcp",
+        one_to_many: bool = False,
+        run_in_parallel: bool = False,
+        hierarchical: bool = False,
+        corridor_width: float = Config.LCPA_CORRIDOR_WIDTH,
+        route_cache: RouteCache | None = None,
     ) -> shapely.LineString:
+        """
+        Compute the least cost path through the suitability raster along the points of the utility route sketch.
+
+        :param path_raster: path to the suitability raster, or the cost surface in memory.
+        :param utility_route_sketch: start, optional intermediate stops and end point of the route.
+        :param project_area: area of the suitability raster to use, defaults to a buffer around the sketch.
+        :param search_method: least cost path search per leg, see calculate_legs.
+        :param one_to_many: search from every other route point to both neighbouring points at once.
+        :param run_in_parallel: solve the legs between the start, stops and end concurrently.
+        :param hierarchical: route on a downsampled raster first and refine in a corridor around the coarse route.
+        :param corridor_width: initial width in meters of the corridor around the coarse route.
+        :param route_cache: cache of routes computed before, a route is reused when the cost surface within the project
+            area, the route points and the search options are the same.
+        :return: the least cost path as linestring.
+        """
         # Set a default project area if not provided, this is a bad idea most of the time.
         if shapely.is_empty(project_area):
             project_area = utility_route_sketch.buffer(utility_route_sketch.length / 2)
 
-        # Creates a numpy array from cost surface raster and saves the metadata for further usage.
-        raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
-        # Preprocess input linestring geometry to a structured datamodel.
-        self.preprocess_input_linestring(raster_geotransform, utility_route_sketch)
+        raster_array = None
+        if route_cache is not None:
+            # The raster is only decoded on a cache miss, unless its files cannot be fingerprinted before reading it.
+            source_fingerprint = compute_raster_source_fingerprint(path_raster, project_area)
+            if source_fingerprint is None:
+                raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+                fingerprint = compute_cost_surface_fingerprint(raster_array, raster_geotransform)
+            else:
+                fingerprint, raster_geotransform = source_fingerprint
+            self.preprocess_input_linestring(raster_geotransform, utility_route_sketch)
+            route_cache_key = get_route_cache_key(
+                fingerprint,
+                self.route_model.legs,
+                search_method=search_method,
+                one_to_many=one_to_many,
+                hierarchical=hierarchical,
+                corridor_width=corridor_width,
+            )
+            cached_route = route_cache.get(route_cache_key)
+            if cached_route is not None:
+                self.leg_results = cached_route.leg_results
+                self.peak_memory_bytes = 0
+                self.expanded_nodes = 0
+                self.lcpa_result = cached_route.route
+                write_results_to_geopackage(
+                    Config.PATH_GEOPACKAGE_LCPA_OUTPUT, self.lcpa_result, "utility_route_result"
+                )
+                return self.lcpa_result
+
+        if raster_array is None:
+            # Creates a numpy array from cost surface raster (from disk or memory) and saves the metadata for further
+            # usage.
+            raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+            # Preprocess input linestring geometry to a structured datamodel.
+            self.preprocess_input_linestring(raster_geotransform, utility_route_sketch)
+
         # Creates path array and the respective sequence as numpy array indices.
-        cost_path, cost_path_indices = self.calculate_least_cost_path(raster_array, self.route_model)
+        with trace_peak_memory("least cost path analysis", Config.LCPA_TRACE_PEAK_MEMORY) as peak_memory:
+            self.leg_results = self.calculate_legs(
+                raster_array,
+                self.route_model,
+                search_method,
+                one_to_many,
+                run_in_parallel,
+                hierarchical=hierarchical,
+                corridor_width=corridor_width,
+            )
+        self.peak_memory_bytes = peak_memory.peak_bytes
+        self.expanded_nodes = sum(leg_result.expanded_nodes for leg_result in self.leg_results)
+        logger.info(f"The {search_method} search expanded {self.expanded_nodes} nodes.")
+        cost_path, cost_path_indices = self.leg_results_to_path(raster_array, self.leg_results)
         # Converts path array to raster and linestring.
         linestring = array_indices_to_linestring(raster_geotransform, cost_path_indices)
         # The linestring is the result of a vectorized raster, which results in a jagged shape. Smooth this.
@@ -48,7 +179,334 @@ class LcpaUtilityRouteEngine:
 
         self.lcpa_result = linestring_aligned
         write_results_to_geopackage(Config.PATH_GEOPACKAGE_LCPA_OUTPUT, self.lcpa_result, "utility_route_result")
+        if route_cache is not None:
+            route_cache.put(route_cache_key, CachedRoute(self.lcpa_result, self.leg_results))
+
+        return self.lcpa_result
+
+    @time_function
+    def get_lcpa_route_to_nearest_target(
+        self,
+        path_raster: str | CostSurface,
+        sources: list[shapely.Geometry],
+        targets: list[shapely.Geometry],
+        project_area: shapely.Polygon,
+    ) -> shapely.LineString:
+        """
+        Compute the least cost path from any of the sources to the nearest target in a single search, for example from
+        a new asset to the nearest point of the existing cables in the existing_utilities layers. The geometries are
+        rasterized to all cells they touch. The index of the reached target geometry is stored as reached_target.
+
+        :param path_raster: path to the suitability raster, or the cost surface in memory.
+        :param sources: geometries from which the route may start.
+        :param targets: geometries at which the route may end.
+        :param project_area: area of the suitability raster to use.
+        :return: the least cost path as linestring.
+        """
+        raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+        self.multi_route_model = LcpaMultiInputModel(sources, targets, raster_geotransform, raster_array.shape)
+        logger.info(
+            f"Searching from {len(self.multi_route_model.idx_sources)} source cells to the nearest of "
+            f"{len(self.multi_route_model.idx_targets)} target cells."
+        )
+        with trace_peak_memory("least cost path analysis", Config.LCPA_TRACE_PEAK_MEMORY) as peak_memory:
+            leg_result, target_cell = find_least_cost_path_to_nearest_target(
+                raster_array, self.multi_route_model.idx_sources, self.multi_route_model.idx_targets
+            )
+        self.peak_memory_bytes = peak_memory.peak_bytes
+        self.leg_results = [leg_result]
+        self.expanded_nodes = leg_result.expanded_nodes
+        self.reached_target = self.multi_route_model.target_ids[target_cell]
+        logger.info(f"Reached target {self.reached_target} at cell {self.multi_route_model.idx_targets[target_cell]}.")
 
+        linestring = array_indices_to_linestring(raster_geotransform, leg_result.indices)
+        self.lcpa_result = align_linestring(linestring, Config.RASTER_CELL_SIZE)
+        write_results_to_geopackage(Config.PATH_GEOPACKAGE_LCPA_OUTPUT, self.lcpa_result, "utility_route_result")
+        return self.lcpa_result
+
+    @time_function
+    def get_lcpa_routes(
+        self,
+        path_raster: str | CostSurface,
+        utility_route_sketches: gpd.GeoDataFrame,
+        project_area: shapely.Polygon = shapely.Polygon(),
+    ) -> gpd.GeoDataFrame:
+        """
+        Compute the least cost paths of many route sketches over the same suitability raster, for example from many
+        customer connection points to one substation. The raster is loaded once for all sketches and the legs of all
+        sketches which share a route point are solved by one one-to-many search, see calculate_legs_grouped_by_source.
+        A route which cannot be computed has no geometry and an infinite cost, instead of failing the complete batch.
+
+        :param path_raster: path to the suitability raster, or the cost surface in memory.
+        :param utility_route_sketches: start, optional intermediate stops and end point of each route as linestring.
+        :param project_area: area of the suitability raster to use, defaults to a buffer around each sketch.
+        :return: the attributes of the route sketches with the least cost path as geometry and its cost.
+        """
+        if shapely.is_empty(project_area):
+            project_area = shapely.union_all(
+                [sketch.buffer(sketch.length / 2) for sketch in utility_route_sketches.geometry]
+            )
+
+        raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+        route_models = [LcpaInputModel(sketch, raster_geotransform) for sketch in utility_route_sketches.geometry]
+        legs = [leg for route_model in route_models for leg in route_model.legs]
+        logger.info(f"Computing {len(route_models)} routes consisting of {len(set(legs))} unique legs.")
+        with trace_peak_memory("least cost path analysis", Config.LCPA_TRACE_PEAK_MEMORY) as peak_memory:
+            leg_results = self.calculate_legs_grouped_by_source(raster_array, legs)
+        self.peak_memory_bytes = peak_memory.peak_bytes
+        self.expanded_nodes = sum(leg_result.expanded_nodes for leg_result in leg_results.values() if leg_result)
+
+        routes: list[shapely.LineString | None] = []
+        costs: list[float] = []
+        for route_model in route_models:
+            route_leg_results = [leg_results[leg] for leg in route_model.legs]
+            found_leg_results = [leg_result for leg_result in route_leg_results if leg_result is not None]
+            if len(found_leg_results) < len(route_leg_results):
+                routes.append(None)
+                costs.append(np.inf)
+                continue
+            indices = self.stitch_leg_indices([leg_result.indices for leg_result in found_leg_results])
+            linestring = array_indices_to_linestring(raster_geotransform, indices)
+            routes.append(align_linestring(linestring, Config.RASTER_CELL_SIZE))
+            costs.append(sum(leg_result.cost for leg_result in found_leg_results))
+
+        lcpa_results = gpd.GeoDataFrame(
+            utility_route_sketches.drop(columns=utility_route_sketches.geometry.name),
+            geometry=gpd.GeoSeries(routes, index=utility_route_sketches.index, crs=Config.CRS),
+        )
+        lcpa_results["cost"] = costs
+        write_results_to_geopackage(Config.PATH_GEOPACKAGE_LCPA_OUTPUT, lcpa_results, "utility_route_results")
+        return lcpa_results
+
+    @time_function
+    def compute_cost_distance_rasters(
+        self,
+        path_raster: str | CostSurface,
+        sources: list[shapely.Point],
+        project_area: shapely.Polygon,
+        raster_name_prefix: str = "",
+        path_output: Path = Config.PATH_RESULTS,
+    ) -> CostDistanceRasters:
+        """
+        Compute the accumulated cost from the sources, for example a substation, to every cell of the project area and
+        write it with the direction towards the source as rasters. Every route from these sources is then a traceback
+        through these rasters, see get_lcpa_route_from_cost_distance, instead of a new search.
+
+        :param path_raster: path to the suitability raster, or the cost surface in memory.
+        :param sources: points from which the accumulated cost is computed, a route starts at the nearest source.
+        :param project_area: area of the suitability raster to use.
+        :param raster_name_prefix: prefix of the names of the written rasters.
+        :param path_output: directory to write the rasters to.
+        :return: paths of the accumulated cost and direction rasters.
+        """
+        raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+        upper_left_x, x_size, _, upper_left_y, _, y_size = raster_geotransform
+        source_indices = [
+            coordinates_to_array_index(source.x, source.y, upper_left_x, upper_left_y, x_size, y_size)
+            for source in sources
+        ]
+        with trace_peak_memory("cost distance analysis", Config.LCPA_TRACE_PEAK_MEMORY) as peak_memory:
+            cumulative_costs, directions = compute_cost_distance(raster_array, source_indices)
+        self.peak_memory_bytes = peak_memory.peak_bytes
+
+        # The rasters share the transform of the window of the suitability raster, such that they align with it.
+        return write_cost_distance_rasters(
+            cumulative_costs, directions, Affine.from_gdal(*raster_geotransform), path_output / raster_name_prefix
+        )
+
+    def get_lcpa_route_from_cost_distance(
+        self, cost_distance_rasters: CostDistanceRasters, destination: shapely.Point
+    ) -> shapely.LineString:
+        """
+        Least cost path from the nearest source of the cost distance rasters to the destination. Only the part of the
+        rasters along the path is read and no search is done.
+
+        :param cost_distance_rasters: rasters written by compute_cost_distance_rasters.
+        :param destination: end point of the route.
+        :return: the least cost path as linestring.
+        """
+        with rasterio.open(cost_distance_rasters.path_directions) as src:
+            raster_geotransform = src.transform.to_gdal()
+        upper_left_x, x_size, _, upper_left_y, _, y_size = raster_geotransform
+        destination_index = coordinates_to_array_index(
+            destination.x, destination.y, upper_left_x, upper_left_y, x_size, y_size
+        )
+
+        leg_result = trace_path_from_cost_distance_rasters(cost_distance_rasters, destination_index)
+        self.leg_results = [leg_result]
+        self.expanded_nodes = 0
+        linestring = array_indices_to_linestring(raster_geotransform, leg_result.indices)
+        self.lcpa_result = align_linestring(linestring, Config.RASTER_CELL_SIZE)
+        return self.lcpa_result
+
+    @staticmethod
+    @time_function
+    def compute_csr_graph(path_raster: str | CostSurface, project_area: shapely.Polygon, path_graph: Path) -> Path:
+        """
+        Convert the suitability raster within the project area to a graph and persist it, such that repeated queries on
+        the same area skip decoding the raster and building the graph, see get_lcpa_route_from_csr_graph.
+
+        :param path_raster: path to the suitability raster, or the cost surface in memory.
+        :param project_area: area of the suitability raster to use.
+        :param path_graph: directory to write the arrays of the graph to.
+        :return: directory of the graph.
+        """
+        raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+        return write_csr_graph(build_csr_graph(raster_array, raster_geotransform), path_graph)
+
+    def get_lcpa_route_from_csr_graph(
+        self, path_graph: Path, utility_route_sketch: shapely.LineString
+    ) -> shapely.LineString:
+        """
+        Compute the least cost path along the points of the utility route sketch on a graph written by
+        compute_csr_graph. The graph is memory-mapped when first used and kept for the next queries.
+
+        :param path_graph: directory of the graph.
+        :param utility_route_sketch: start, optional intermediate stops and end point of the route.
+        :return: the least cost path as linestring.
+        """
+        csr_graph = load_csr_graph(path_graph)
+        self.route_model = LcpaInputModel(utility_route_sketch, csr_graph.geotransform)
+        self.leg_results = [find_csr_least_cost_path(csr_graph, start, end) for start, end in self.route_model.legs]
+        self.expanded_nodes = sum(leg_result.expanded_nodes for leg_result in self.leg_results)
+
+        indices = self.stitch_leg_indices([leg_result.indices for leg_result in self.leg_results])
+        linestring = array_indices_to_linestring(csr_graph.geotransform, indices)
+        self.lcpa_result = align_linestring(linestring, Config.RASTER_CELL_SIZE)
+        return self.lcpa_result
+
+    @staticmethod
+    @time_function
+    def compute_overlay_graph(
+        path_raster: str | CostSurface,
+        project_area: shapely.Polygon,
+        previous_overlay_graph: OverlayGraph | None = None,
+        run_in_parallel: bool = True,
+    ) -> OverlayGraph:
+        """
+        Precompute the overlay graph of the suitability raster within the project area, see build_overlay_graph. When
+        the overlay graph of a previous version of the suitability raster is given, only the blocks which changed are
+        recomputed.
+
+        :param path_raster: path to the suitability raster, or the cost surface in memory.
+        :param project_area: area of the suitability raster to use.
+        :param previous_overlay_graph: overlay graph of a previous version of the suitability raster.
+        :param run_in_parallel: compute the blocks concurrently in a process pool.
+        :return: the overlay graph.
+        """
+        raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+        return build_overlay_graph(
+            raster_array,
+            raster_geotransform,
+            previous_overlay_graph=previous_overlay_graph,
+            run_in_parallel=run_in_parallel,
+        )
+
+    def get_lcpa_route_from_overlay_graph(
+        self, overlay_graph: OverlayGraph, utility_route_sketch: shapely.LineString
+    ) -> shapely.LineString:
+        """
+        Compute the least cost path along the points of the utility route sketch on an overlay graph computed by
+        compute_overlay_graph. Only the blocks of the route points are searched at full resolution.
+
+        :param overlay_graph: overlay graph of the suitability raster.
+        :param utility_route_sketch: start, optional intermediate stops and end point of the route.
+        :return: the least cost path as linestring.
+        """
+        self.route_model = LcpaInputModel(utility_route_sketch, overlay_graph.geotransform)
+        self.leg_results = [
+            find_overlay_least_cost_path(overlay_graph, start, end) for start, end in self.route_model.legs
+        ]
+        self.expanded_nodes = sum(leg_result.expanded_nodes for leg_result in self.leg_results)
+
+        indices = self.stitch_leg_indices([leg_result.indices for leg_result in self.leg_results])
+        linestring = array_indices_to_linestring(overlay_graph.geotransform, indices)
+        self.lcpa_result = align_linestring(linestring, Config.RASTER_CELL_SIZE)
+        return self.lcpa_result
+
+    @staticmethod
+    @time_function
+    def compute_landmark_distances(
+        path_raster: str | CostSurface,
+        project_area: shapely.Polygon,
+        path_landmarks: Path,
+        number_of_landmarks: int = Config.LCPA_NUMBER_OF_LANDMARKS,
+        dtype: str = "float32",
+    ) -> Path:
+        """
+        Precompute the cost distances of landmarks on the suitability raster within the project area and persist them,
+        such that repeated queries on the same area use them as lower bound, see get_lcpa_route_from_landmarks.
+
+        :param path_raster: path to the suitability raster, or the cost surface in memory.
+        :param project_area: area of the suitability raster to use.
+        :param path_landmarks: directory to write the landmark distances to.
+        :param number_of_landmarks: number of landmark cells.
+        :param dtype: float32, or uint16 to quantize the distances.
+        :return: directory of the landmark distances.
+        """
+        raster_array, raster_geotransform = load_suitability_raster_data(path_raster, project_area)
+        landmark_distances = compute_landmark_distances(raster_array, raster_geotransform, number_of_landmarks, dtype)
+        return write_landmark_distances(landmark_distances, path_landmarks)
+
+    def get_lcpa_route_from_landmarks(
+        self, path_landmarks: Path, utility_route_sketch: shapely.LineString
+    ) -> shapely.LineString:
+        """
+        Compute the least cost path along the points of the utility route sketch with an A* search bounded by the
+        landmark distances written by compute_landmark_distances. The distances are memory-mapped when first used and
+        kept for the next queries.
+
+        :param path_landmarks: directory of the landmark distances.
+        :param utility_route_sketch: start, optional intermediate stops and end point of the route.
+        :return: the least cost path as linestring.
+        """
+        landmark_distances = load_landmark_distances(path_landmarks)
+        self.route_model = LcpaInputModel(utility_route_sketch, landmark_distances.geotransform)
+        self.leg_results = [
+            find_alt_least_cost_path(landmark_distances, start, end) for start, end in self.route_model.legs
+        ]
+        self.expanded_nodes = sum(leg_result.expanded_nodes for leg_result in self.leg_results)
+
+        indices = self.stitch_leg_indices([leg_result.indices for leg_result in self.leg_results])
+        linestring = array_indices_to_linestring(landmark_distances.geotransform, indices)
+        self.lcpa_result = align_linestring(linestring, Config.RASTER_CELL_SIZE)
+        return self.lcpa_result
+
+    def get_lcpa_route_out_of_core(
+        self,
+        path_raster: Path | str,
+        utility_route_sketch: shapely.LineString,
+        project_area: shapely.Polygon,
+        block_size: int = Config.LCPA_OUT_OF_CORE_BLOCK_SIZE,
+        max_blocks: int = Config.LCPA_OUT_OF_CORE_MAX_BLOCKS,
+    ) -> shapely.LineString:
+        """
+        Compute the least cost path along the points of the utility route sketch without loading the project area in
+        memory, for project areas of which the suitability raster does not fit in memory. Blocks of the raster are read
+        on demand and at most max_blocks decoded blocks are kept, see find_out_of_core_least_cost_path.
+
+        :param path_raster: path to the suitability raster.
+        :param utility_route_sketch: start, optional intermediate stops and end point of the route.
+        :param project_area: area of the suitability raster to use.
+        :param block_size: size in cells of the square blocks which are read from the raster.
+        :param max_blocks: number of decoded blocks kept in memory.
+        :return: the least cost path as linestring.
+        """
+        with RasterBlockCache(path_raster, project_area, block_size, max_blocks) as block_cache:
+            self.route_model = LcpaInputModel(utility_route_sketch, block_cache.geotransform)
+            self.leg_results = [
+                find_out_of_core_least_cost_path(block_cache, start, end) for start, end in self.route_model.legs
+            ]
+            self.block_fetches, self.block_evictions = block_cache.block_fetches, block_cache.block_evictions
+        self.expanded_nodes = sum(leg_result.expanded_nodes for leg_result in self.leg_results)
+        logger.info(
+            f"The out-of-core search expanded {self.expanded_nodes} nodes, fetched {self.block_fetches} blocks and "
+            f"evicted {self.block_evictions} blocks."
+        )
+
+        indices = self.stitch_leg_indices([leg_result.indices for leg_result in self.leg_results])
+        linestring = array_indices_to_linestring(block_cache.geotransform, indices)
+        self.lcpa_result = align_linestring(linestring, Config.RASTER_CELL_SIZE)
         return self.lcpa_result
 
     def preprocess_input_linestring(self, geotransform: tuple, utility_route_sketch: shapely.LineString):
@@ -68,63 +526,266 @@ class LcpaUtilityRouteEngine:
         write_results_to_geopackage(Config.PATH_GEOPACKAGE_LCPA_OUTPUT, self.route_model.route_points, "route_points")
 
     @staticmethod
-    def calculate_least_cost_path(suit_raster_array: np.ndarray, utility_route_model) -> tuple:
+    def calculate_least_cost_path(
+        suit_raster_array: np.ndarray,
+        utility_route_model,
+        search_method: str = "mcp",
+        one_to_many: bool = False,
+        run_in_parallel: bool = False,
+        max_workers: int | None = None,
+        hierarchical: bool = False,
+        corridor_width: float = Config.LCPA_CORRIDOR_WIDTH,
+    ) -> tuple:
         """
         Calculates the least cost path in the given suitability raster. Handle one or multiple stops if present.
 
         :param suit_raster_array: numpy array containing the values of the suitability raster.
         :param utility_route_model: input as lcpa data structure.
+        :param search_method: least cost path search per leg, see calculate_legs.
+        :param one_to_many: search from every other route point to both neighbouring points at once.
+        :param run_in_parallel: solve the legs between the start, stops and end concurrently in a process pool.
+        :param max_workers: maximum number of worker processes, defaults to the number of legs.
+        :param hierarchical: route on a downsampled raster first and refine in a corridor around the coarse route.
+        :param corridor_width: initial width in meters of the corridor around the coarse route.
         :return: numpy array containing the least cost path.
         """
+        leg_results = LcpaUtilityRouteEngine.calculate_legs(
+            suit_raster_array,
+            utility_route_model,
+            search_method,
+            one_to_many,
+            run_in_parallel,
+            max_workers,
+            hierarchical,
+            corridor_width,
+        )
+        return LcpaUtilityRouteEngine.leg_results_to_path(suit_raster_array, leg_results)
+
+    @staticmethod
+    def calculate_legs(
+        suit_raster_array: np.ndarray,
+        utility_route_model,
+        search_method: str = "mcp",
+        one_to_many: bool = False,
+        run_in_parallel: bool = False,
+        max_workers: int | None = None,
+        hierarchical: bool = False,
+        corridor_width: float = Config.LCPA_CORRIDOR_WIDTH,
+    ) -> list[LcpaLegResult]:
+        """
+        Calculates the least cost path of each leg between the start, intermediate stops and end of the route.
 
+        The search_method is one of:
+        - mcp: Dijkstra of skimage, equal to route_through_array.
+        - compact: memory-compact search using the native dtype of the costs and float32 cumulative costs.
+        - astar: A* search directed towards the end of the leg, returning routes of the same cost as mcp.
+        - bucket: bucket queue search exploiting the lower bound of the costs, returning routes of the same cost as mcp.
+        - quadtree: Dijkstra on a graph merging regions of equal cost, see build_quadtree_graph. The route cost equals
+          mcp with the default Config.LCPA_QUADTREE_PORTAL_SPACING of 1, a larger spacing makes the search approximate.
+
+        :param suit_raster_array: numpy array containing the values of the suitability raster.
+        :param utility_route_model: input as lcpa data structure.
+        :param search_method: least cost path search per leg, mcp, compact, astar, bucket or quadtree.
+        :param one_to_many: search from every other route point to both neighbouring points at once, see
+            calculate_legs_using_reused_graph. Only used by the mcp search when not running in parallel.
+        :param run_in_parallel: solve the legs between the start, stops and end concurrently in a process pool.
+        :param max_workers: maximum number of worker processes, defaults to the number of legs.
+        :param hierarchical: route each leg on a raster downsampled by Config.LCPA_DOWNSAMPLE_FACTOR first and refine
+            it at full resolution in a corridor around the coarse route, see find_hierarchical_least_cost_path. The
+            legs are then solved sequentially.
+        :param corridor_width: initial width in meters of the corridor around the coarse route.
+        :return: indices, cost and expanded nodes of the least cost path of each leg.
+        """
+        if search_method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search method {search_method}, choose from {SEARCH_METHODS}.")
+
+        legs = utility_route_model.legs
         # Check if we have to account for intermediate stops in the path calculations.
         if len(utility_route_model.idx_stops) == 0:
             logger.info("There are no intermediate stops to account for in determining the cable route.")
-            indices, weight = route_through_array(
-                suit_raster_array,
-                utility_route_model.idx_start,
-                utility_route_model.idx_end,
-                geometric=True,
-                fully_connected=True,
-            )
         else:
-            # Call the route finding function multiple times.
             logger.info(f"There are {len(utility_route_model.idx_stops)} intermediate stop(s) in the utility route.")
-            indices = []
-            weight = []
-            for idx, item in enumerate(utility_route_model.idx_stops):
-                # For the first call, we take the start point and the first stop.
-                if idx == 0:
-                    tmp_indices, tmp_weight = route_through_array(
-                        suit_raster_array, utility_route_model.idx_start, item, geometric=True, fully_connected=True
-                    )
-                # Check if there are more stops to account for. Take the current stop and the previous one.
-                else:
-                    tmp_indices, tmp_weight = route_through_array(
-                        suit_raster_array,
-                        utility_route_model.idx_stops[idx - 1],
-                        item,
-                        geometric=True,
-                        fully_connected=True,
-                    )
-                # Add route part to the complete cable route.
-                indices += tmp_indices
-                weight += tmp_weight
-
-            # Finally, add the ending route segment. Use the last stop point in combination with the end point.
-            tmp_indices, tmp_weight = route_through_array(
-                suit_raster_array,
-                utility_route_model.idx_stops[-1],
-                utility_route_model.idx_end,
-                geometric=True,
-                fully_connected=True,
+
+        if hierarchical:
+            logger.info(f"Using hierarchical routing with a corridor of {corridor_width} meters.")
+            find_path = LcpaUtilityRouteEngine.get_search_function(search_method)
+            corridor_width_in_cells = round(corridor_width / Config.RASTER_CELL_SIZE)
+            return [
+                find_hierarchical_least_cost_path(
+                    suit_raster_array, start, end, find_path, Config.LCPA_DOWNSAMPLE_FACTOR, corridor_width_in_cells
+                )
+                for start, end in legs
+            ]
+
+        if run_in_parallel and len(legs) > 1:
+            return LcpaUtilityRouteEngine.calculate_legs_in_parallel(
+                suit_raster_array, legs, search_method, max_workers
             )
-            indices += tmp_indices
-            weight += tmp_weight
 
-        # Gather all indices and paths, merge them. Create a new array where 1 = cable route, 0 = not cable route.
+        match search_method:
+            case "compact":
+                logger.info("Using the memory-compact least cost path search.")
+                return [find_compact_least_cost_path(suit_raster_array, start, end) for start, end in legs]
+            case "astar":
+                logger.info("Using the A* least cost path search.")
+                return [find_astar_least_cost_path(suit_raster_array, start, end) for start, end in legs]
+            case "bucket":
+                logger.info("Using the bucket queue least cost path search.")
+                return [find_bucket_least_cost_path(suit_raster_array, start, end) for start, end in legs]
+            case "quadtree":
+                logger.info("Using the least cost path search on the quadtree graph.")
+                quadtree_graph = build_quadtree_graph(suit_raster_array)
+                return [find_quadtree_graph_least_cost_path(quadtree_graph, start, end) for start, end in legs]
+            case _:
+                return LcpaUtilityRouteEngine.calculate_legs_using_reused_graph(suit_raster_array, legs, one_to_many)
+
+    @staticmethod
+    def get_search_function(search_method: str) -> SearchFunction:
+        """Least cost path search of a single leg for the given search method."""
+        match search_method:
+            case "compact":
+                return find_compact_least_cost_path
+            case "astar":
+                return find_astar_least_cost_path
+            case "bucket":
+                return find_bucket_least_cost_path
+            case "quadtree":
+                return find_quadtree_least_cost_path
+            case _:
+                return find_skimage_least_cost_path
+
+    @staticmethod
+    def leg_results_to_path(suit_raster_array: np.ndarray, leg_results: list[LcpaLegResult]) -> tuple:
+        """Stitch the legs to the complete route, as path array (1 = cable route, 0 = not cable route) and indices."""
+        indices = LcpaUtilityRouteEngine.stitch_leg_indices([leg_result.indices for leg_result in leg_results])
+
         indices_np = np.array(indices).T
         path = np.zeros_like(suit_raster_array)
         path[indices_np[0], indices_np[1]] = 1
 
         return path, indices
+
+    @staticmethod
+    def stitch_leg_indices(leg_indices: list[list[tuple[int, int]]]) -> list[tuple[int, int]]:
+        """Concatenate the indices of the legs in order, the junction cell of two consecutive legs is added once."""
+        indices: list[tuple[int, int]] = []
+        for indices_of_leg in leg_indices:
+            if indices and indices[-1] == tuple(indices_of_leg[0]):
+                indices_of_leg = indices_of_leg[1:]
+            indices += [(int(index[0]), int(index[1])) for index in indices_of_leg]
+        return indices
+
+    @staticmethod
+    def calculate_legs_in_parallel(
+        suit_raster_array: np.ndarray,
+        legs: list[tuple[tuple, tuple]],
+        search_method: str = "mcp",
+        max_workers: int | None = None,
+    ) -> list[LcpaLegResult]:
+        """
+        Solve the legs of the route concurrently, the latency is then close to that of the slowest leg. The suitability
+        raster is copied once to shared memory to which the workers attach, instead of being pickled for every leg.
+        """
+        logger.info(f"Solving {len(legs)} legs in parallel.")
+        starts, ends = zip(*legs)
+        with SharedCostArray(suit_raster_array) as shared_cost_array:
+            with ProcessPoolExecutor(
+                max_workers=max_workers or len(legs),
+                initializer=init_worker,
+                initargs=(shared_cost_array.description, search_method),
+            ) as executor:
+                leg_results = list(executor.map(compute_leg_in_worker, starts, ends))
+        return leg_results
+
+    @staticmethod
+    def calculate_legs_using_reused_graph(
+        suit_raster_array: np.ndarray, legs: list[tuple[tuple, tuple]], one_to_many: bool = False
+    ) -> list[LcpaLegResult]:
+        """
+        Calculate the least cost path of each leg using a single MCP_Geometric object. This is equal to calling
+        route_through_array per leg, but the graph is only constructed once per raster instead of once per leg.
+
+        With one_to_many, a single search from the end of every other leg reaches both neighbouring route points.
+        The leg towards the previous route point is reversed, which is allowed as the costs of a step are symmetrical.
+        This halves the number of searches, although a different path of equal cost may be found for reversed legs.
+
+        :param suit_raster_array: numpy array containing the values of the suitability raster.
+        :param legs: start and end index of each leg in the order of the route.
+        :param one_to_many: search from one route point to both its neighbouring route points at once.
+        :return: indices, cost and expanded nodes of the least cost path of each leg.
+        """
+        mcp = MCP_Geometric(suit_raster_array, fully_connected=True)
+        leg_results: list = [None] * len(legs)
+        for idx, (start, end) in enumerate(legs):
+            if leg_results[idx] is not None:
+                continue
+            # Search from the end of this leg when its start can be reached, the start of a route may be no data.
+            is_reversible = one_to_many and LcpaUtilityRouteEngine.is_traversable(suit_raster_array, start)
+            if not is_reversible:
+                leg_results[idx] = find_mcp_least_cost_path(mcp, start, end)
+                continue
+
+            ends = [start] if idx == len(legs) - 1 else [start, legs[idx + 1][1]]
+            cumulative_costs, _ = mcp.find_costs([end], ends, find_all_ends=True)
+            # The nodes are expanded once for both legs, count them for the first.
+            expanded_nodes = int(np.isfinite(cumulative_costs).sum())
+            leg_results[idx] = LcpaLegResult(mcp.traceback(start)[::-1], float(cumulative_costs[start]), expanded_nodes)
+            if len(ends) > 1:
+                next_end = legs[idx + 1][1]
+                leg_results[idx + 1] = LcpaLegResult(mcp.traceback(next_end), float(cumulative_costs[next_end]), 0)
+
+        return leg_results
+
+    @staticmethod
+    def calculate_legs_grouped_by_source(
+        suit_raster_array: np.ndarray, legs: list[tuple[tuple, tuple]]
+    ) -> dict[tuple[tuple, tuple], LcpaLegResult | None]:
+        """
+        Calculate the least cost path of many legs with a single MCP_Geometric object and one search per source. The
+        legs are grouped by the route point they share most, such that legs towards one destination are also solved by
+        a single search from that destination. These legs are reversed, which is allowed as the costs of a step are
+        symmetrical, but only when their start can be reached as the start of a route may be no data.
+
+        :param suit_raster_array: numpy array containing the values of the suitability raster.
+        :param legs: start and end index of each leg, duplicated legs are solved once.
+        :return: indices, cost and expanded nodes of the least cost path of each leg, None if it cannot be reached.
+        """
+        point_count: dict[tuple, int] = {}
+        for leg in set(legs):
+            for point in leg:
+                point_count[point] = point_count.get(point, 0) + 1
+
+        # The targets of each source as the leg they belong to and whether the path has to be reversed.
+        targets_per_source: dict[tuple, list[tuple[tuple, tuple[tuple, tuple], bool]]] = {}
+        for start, end in set(legs):
+            is_reversed = point_count[end] > point_count[start] and LcpaUtilityRouteEngine.is_traversable(
+                suit_raster_array, start
+            )
+            source, target = (end, start) if is_reversed else (start, end)
+            targets_per_source.setdefault(source, []).append((target, (start, end), is_reversed))
+
+        logger.info(f"Solving {len(set(legs))} legs using {len(targets_per_source)} one-to-many searches.")
+        mcp = MCP_Geometric(suit_raster_array, fully_connected=True)
+        leg_results: dict[tuple[tuple, tuple], LcpaLegResult | None] = {}
+        for source, targets in targets_per_source.items():
+            cumulative_costs, _ = mcp.find_costs([source], [target for target, _, _ in targets], find_all_ends=True)
+            # The nodes are expanded once for all targets, count them for the first.
+            expanded_nodes = int(np.isfinite(cumulative_costs).sum())
+            for target, leg, is_reversed in targets:
+                if not np.isfinite(cumulative_costs[target]):
+                    logger.warning(f"No least cost path found from {leg[0]} to {leg[1]}.")
+                    leg_results[leg] = None
+                    continue
+                indices = mcp.traceback(target)
+                leg_results[leg] = LcpaLegResult(
+                    indices[::-1] if is_reversed else indices, float(cumulative_costs[target]), expanded_nodes
+                )
+                expanded_nodes = 0
+        return leg_results
+
+    @staticmethod
+    def is_traversable(suit_raster_array: np.ndarray, index: tuple) -> bool:
+        try:
+            return bool(suit_raster_array[index] >= 0)
+        except IndexError:
+            return False
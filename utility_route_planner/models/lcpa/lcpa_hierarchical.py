@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Callable
+
+import numpy as np
+import structlog
+from scipy.ndimage import binary_dilation
+
+from utility_route_planner.models.lcpa.lcpa_datastructures import LcpaLegResult
+from utility_route_planner.models.lcpa.lcpa_search import to_flat_index
+
+logger = structlog.get_logger(__name__)
+
+# Signature of the searches in lcpa_search: costs, start and end index to the least cost path of the leg.
+SearchFunction = Callable[[np.ndarray, tuple, tuple], LcpaLegResult]
+
+
+def find_hierarchical_least_cost_path(
+    costs: np.ndarray,
+    start: tuple[int, int],
+    end: tuple[int, int],
+    find_path: SearchFunction,
+    downsample_factor: int,
+    corridor_width: int,
+) -> LcpaLegResult:
+    """
+    Coarse-to-fine least cost path. The route is first computed on a downsampled cost array, after which it is refined
+    at full resolution only within a corridor around the coarse route. When the refined route touches the edge of the
+    corridor, or no route exists within the corridor, a better route may exist outside of it and the refinement is
+    repeated with a corridor of twice the width. Once the corridor covers the complete array this is equal to find_path
+    on the complete array. Otherwise the route is not guaranteed to be the least cost path: features narrower than a
+    coarse cell, such as a narrow path or obstacle, are averaged away in the coarse array and can lead the coarse route
+    away from the least cost path.
+
+    :param costs: 2d array with the cost of each cell, negative cells are not traversable.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :param find_path: least cost path search used on both the coarse and the refined cost array.
+    :param downsample_factor: number of cells in each direction which are combined to one coarse cell.
+    :param corridor_width: initial distance in cells around the coarse route in which the route is refined.
+    :return: row and column indices of the least cost path, its cost and the nodes expanded over all searches.
+    """
+    height, width = costs.shape
+    start = divmod(to_flat_index(start, height, width), width)
+    end = divmod(to_flat_index(end, height, width), width)
+
+    coarse_costs = downsample_cost_array(costs, downsample_factor)
+    coarse_start = (start[0] // downsample_factor, start[1] // downsample_factor)
+    coarse_end = (end[0] // downsample_factor, end[1] // downsample_factor)
+    try:
+        coarse_result = find_path(coarse_costs, coarse_start, coarse_end)
+    except ValueError:
+        logger.warning("No coarse route was found, falling back to the full resolution cost array.")
+        return find_path(costs, start, end)
+    expanded_nodes = coarse_result.expanded_nodes
+
+    coarse_route = np.zeros(coarse_costs.shape, dtype=bool)
+    coarse_route[tuple(np.array(coarse_result.indices).T)] = True
+    # The corridor is dilated on the coarse grid, which is a factor downsample_factor**2 less work.
+    coarse_corridor_width = -(-corridor_width // downsample_factor)
+    while True:
+        coarse_corridor = binary_dilation(
+            coarse_route, structure=np.ones((3, 3), dtype=bool), iterations=coarse_corridor_width
+        )
+        if coarse_corridor.all():
+            logger.info("The corridor covers the complete cost array, searching at full resolution.")
+            leg_result = find_path(costs, start, end)
+            leg_result.expanded_nodes += expanded_nodes
+            return leg_result
+
+        corridor = upsample_mask(coarse_corridor, downsample_factor, costs.shape)
+        refined_result: LcpaLegResult | None
+        try:
+            refined_result = find_path_in_corridor(costs, start, end, corridor, find_path)
+        except ValueError:
+            refined_result = None
+        if refined_result is not None:
+            expanded_nodes += refined_result.expanded_nodes
+            if not touches_corridor_edge(costs, corridor, refined_result.indices):
+                refined_result.expanded_nodes = expanded_nodes
+                return refined_result
+
+        coarse_corridor_width *= 2
+        logger.info(f"Refined route is limited by the corridor, widening it to {coarse_corridor_width} coarse cells.")
+
+
+def downsample_cost_array(costs: np.ndarray, downsample_factor: int) -> np.ndarray:
+    """
+    Combine blocks of downsample_factor by downsample_factor cells to their mean traversable cost. A coarse cell is
+    only not traversable when none of its cells is, such that narrow passages remain present in the coarse array.
+    """
+    height, width = costs.shape
+    coarse_height, coarse_width = -(-height // downsample_factor), -(-width // downsample_factor)
+    padded_costs = np.full((coarse_height * downsample_factor, coarse_width * downsample_factor), -1, dtype="float32")
+    padded_costs[:height, :width] = costs
+    blocks = padded_costs.reshape(coarse_height, downsample_factor, coarse_width, downsample_factor)
+
+    is_traversable = blocks >= 0
+    traversable_count = is_traversable.sum(axis=(1, 3))
+    cost_sum = np.where(is_traversable, blocks, 0).sum(axis=(1, 3))
+    coarse_costs = np.full((coarse_height, coarse_width), -1, dtype="float32")
+    np.divide(cost_sum, traversable_count, out=coarse_costs, where=traversable_count > 0)
+    return coarse_costs
+
+
+def upsample_mask(coarse_mask: np.ndarray, downsample_factor: int, shape: tuple[int, int]) -> np.ndarray:
+    """Repeat each coarse cell of the mask to the cells it covers in the full resolution array."""
+    mask = np.repeat(np.repeat(coarse_mask, downsample_factor, axis=0), downsample_factor, axis=1)
+    return mask[: shape[0], : shape[1]]
+
+
+def find_path_in_corridor(
+    costs: np.ndarray, start: tuple[int, int], end: tuple[int, int], corridor: np.ndarray, find_path: SearchFunction
+) -> LcpaLegResult:
+    """Least cost path within the corridor, searching only the bounding box of the corridor."""
+    rows, columns = np.nonzero(corridor.any(axis=1))[0], np.nonzero(corridor.any(axis=0))[0]
+    window = slice(rows[0], rows[-1] + 1), slice(columns[0], columns[-1] + 1)
+    corridor_costs = np.where(corridor[window], costs[window], -1).astype(costs.dtype)
+    # The start of a route may be no data, keep its cost as is.
+    corridor_costs[start[0] - rows[0], start[1] - columns[0]] = costs[start]
+
+    leg_result = find_path(
+        corridor_costs, (start[0] - rows[0], start[1] - columns[0]), (end[0] - rows[0], end[1] - columns[0])
+    )
+    leg_result.indices = [(int(row + rows[0]), int(column + columns[0])) for row, column in leg_result.indices]
+    return leg_result
+
+
+def touches_corridor_edge(costs: np.ndarray, corridor: np.ndarray, indices: list[tuple[int, int]]) -> bool:
+    """Check if a cell of the route neighbours a traversable cell outside the corridor, through which it may improve."""
+    outside_corridor = ~corridor & (costs >= 0)
+    route_rows, route_columns = np.array(indices).T
+    for row_offset in (-1, 0, 1):
+        for column_offset in (-1, 0, 1):
+            rows, columns = route_rows + row_offset, route_columns + column_offset
+            is_inside = (rows >= 0) & (rows < costs.shape[0]) & (columns >= 0) & (columns < costs.shape[1])
+            if outside_corridor[rows[is_inside], columns[is_inside]].any():
+                return True
+    return False
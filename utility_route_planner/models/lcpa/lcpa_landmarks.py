@@ -0,0 +1,179 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import functools
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import structlog
+from skimage.graph import MCP_Geometric
+
+from settings import Config
+from utility_route_planner.models.lcpa.lcpa_csr_graph import get_file_stamps
+from utility_route_planner.models.lcpa.lcpa_datastructures import LandmarkDistances, LcpaLegResult
+from utility_route_planner.models.lcpa.lcpa_search import find_least_cost_path, to_flat_index
+
+logger = structlog.get_logger(__name__)
+
+# Quantized distance of cells which cannot be reached from a landmark.
+LANDMARK_UNREACHABLE = np.iinfo("uint16").max
+# Arrays of persisted landmark distances, stored as .npy files in the landmark directory such that they can be
+# memory-mapped.
+LANDMARK_ARRAYS = ("landmarks", "distances", "scale", "costs", "geotransform")
+
+
+def compute_landmark_distances(
+    costs: np.ndarray,
+    geotransform: tuple,
+    number_of_landmarks: int = Config.LCPA_NUMBER_OF_LANDMARKS,
+    dtype: str = "float32",
+) -> LandmarkDistances:
+    """
+    Select landmark cells and compute the cost distance from each landmark to every cell. The landmarks are selected
+    one by one as the traversable cell farthest from the landmarks selected so far, such that they lie at the edges of
+    the raster behind the expensive areas, where the lower bounds of find_alt_least_cost_path are tightest.
+
+    :param costs: 2d array with the cost of each cell, negative cells are not traversable.
+    :param geotransform: metadata of the raster from gdal.
+    :param number_of_landmarks: number of landmark cells.
+    :param dtype: float32, or uint16 to quantize the distances which halves the size at the cost of looser bounds.
+    :return: the landmarks and their cost distances.
+    """
+    if dtype not in ("float32", "uint16"):
+        raise ValueError("The landmark distances are stored as float32 or uint16.")
+    traversable_cells = np.argwhere(costs >= 0)
+    if traversable_cells.size == 0:
+        raise ValueError("There are no traversable cells to select landmarks from.")
+
+    mcp = MCP_Geometric(costs, fully_connected=True)
+    # The first landmark is the cell farthest from an arbitrary traversable cell.
+    distances_to_landmarks, _ = mcp.find_costs([tuple(traversable_cells[len(traversable_cells) // 2])])
+    landmarks: list[tuple] = []
+    distances_per_landmark: list[np.ndarray] = []
+    for landmark_number in range(number_of_landmarks):
+        candidate_distances = np.where(np.isfinite(distances_to_landmarks), distances_to_landmarks, -1)
+        landmark = np.unravel_index(int(np.argmax(candidate_distances)), costs.shape)
+        landmark_distances, _ = mcp.find_costs([landmark])
+        landmarks.append(landmark)
+        distances_per_landmark.append(landmark_distances.astype("float32"))
+        distances_to_landmarks = (
+            landmark_distances if landmark_number == 0 else np.minimum(distances_to_landmarks, landmark_distances)
+        )
+    distances: np.ndarray = np.stack(distances_per_landmark)
+
+    scale: float = 1.0
+    if dtype == "uint16":
+        is_reachable = np.isfinite(distances)
+        scale = max(float(distances[is_reachable].max(initial=0)) / (LANDMARK_UNREACHABLE - 1), 1e-9)
+        quantized_distances = np.round(np.where(is_reachable, distances, 0) / scale)
+        distances = np.where(is_reachable, quantized_distances, LANDMARK_UNREACHABLE).astype("uint16")
+    logger.info(f"Computed the cost distances of {number_of_landmarks} landmarks as {dtype}.")
+    return LandmarkDistances(np.array(landmarks), distances, scale, costs, geotransform)
+
+
+def write_landmark_distances(landmark_distances: LandmarkDistances, path_landmarks: Path) -> Path:
+    """Write the landmarks and their cost distances as .npy files to the landmark directory."""
+    path_landmarks.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        "landmarks": landmark_distances.landmarks,
+        "distances": landmark_distances.distances,
+        "scale": np.array(landmark_distances.scale, dtype="float64"),
+        "costs": landmark_distances.costs,
+        "geotransform": np.array(landmark_distances.geotransform, dtype="float64"),
+    }
+    for name in LANDMARK_ARRAYS:
+        np.save(path_landmarks / f"{name}.npy", arrays[name])
+    logger.info(f"Written landmark distances to {path_landmarks}.")
+    return path_landmarks
+
+
+def load_landmark_distances(path_landmarks: Path) -> LandmarkDistances:
+    """
+    Load the landmark distances written by write_landmark_distances. The distances are memory-mapped, such that a search
+    only reads the distances of the cells it visits. The result is cached per path and modification time of its files,
+    such that it is loaded only once and reloaded when the landmark distances are rewritten.
+    """
+    return _load_landmark_distances(path_landmarks, get_file_stamps(path_landmarks, LANDMARK_ARRAYS))
+
+
+@functools.lru_cache(maxsize=8)
+def _load_landmark_distances(path_landmarks: Path, file_stamps: tuple[tuple[int, int], ...]) -> LandmarkDistances:
+    arrays = {name: np.load(path_landmarks / f"{name}.npy", mmap_mode="r") for name in LANDMARK_ARRAYS}
+    logger.info(f"Loaded the distances of {len(arrays['landmarks'])} landmarks from {path_landmarks}.")
+    return LandmarkDistances(
+        np.asarray(arrays["landmarks"]),
+        arrays["distances"],
+        float(arrays["scale"]),
+        arrays["costs"],
+        tuple(arrays["geotransform"].tolist()),
+    )
+
+
+def get_landmark_lower_bound(
+    landmark_distances: LandmarkDistances, end: tuple[int, int]
+) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Lower bound of the remaining cost from cells to the end using the triangle inequality. As the cost of a step is
+    equal in both directions, the cost from a cell to the end is at least the difference of the cost distances of the
+    cell and the end from any landmark. A traversable cell which cannot be reached from a landmark which does reach
+    the end cannot reach the end either.
+    """
+    number_of_landmarks, height, width = landmark_distances.distances.shape
+    distances = landmark_distances.distances.reshape(number_of_landmarks, -1)
+    flat_costs = landmark_distances.costs.reshape(-1)
+    is_quantized = distances.dtype == np.uint16
+    unreachable = LANDMARK_UNREACHABLE if is_quantized else np.inf
+
+    end_distances = distances[:, to_flat_index(end, height, width)].astype("float64")
+    # Landmarks which do not reach the end do not bound the remaining cost.
+    end_distances = end_distances[end_distances != unreachable]
+    landmark_indices = np.flatnonzero(distances[:, to_flat_index(end, height, width)] != unreachable)
+
+    def lower_bound(cells: np.ndarray) -> np.ndarray:
+        cell_distances = distances[landmark_indices[:, None], cells[None, :]]
+        is_unreachable = (cell_distances == unreachable).any(axis=0) & (flat_costs[cells] >= 0)
+        differences = np.abs(np.where(cell_distances == unreachable, 0, cell_distances) - end_distances[:, None])
+        if is_quantized:
+            # Each distance is rounded to the nearest step of scale, together at most one step.
+            bounds = np.maximum(differences.max(axis=0, initial=0) - 1, 0) * landmark_distances.scale
+        else:
+            bounds = differences.max(axis=0, initial=0) * (1 - 1e-6)
+        bounds = np.where(flat_costs[cells] >= 0, bounds, 0)
+        return np.where(is_unreachable, np.inf, bounds)
+
+    return lower_bound
+
+
+def find_alt_least_cost_path(
+    landmark_distances: LandmarkDistances, start: tuple[int, int], end: tuple[int, int]
+) -> LcpaLegResult:
+    """
+    A* search using landmarks and the triangle inequality (ALT), returning a route of the same cost as
+    route_through_array with geometric=True and fully_connected=True. The landmark bounds follow the actual costs
+    of the raster, also where the cheap cells are far from the straight line between start and end, such that they
+    are tighter than the octile distance times the lowest cost used by find_astar_least_cost_path. The highest of
+    both bounds is used.
+
+    :param landmark_distances: landmarks and their cost distances, including the costs of the raster.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :return: row and column indices of the least cost path from start to end, its cost and the expanded nodes.
+    """
+    costs = landmark_distances.costs
+    height, width = costs.shape
+    for row, column in (start, end):
+        if not (-height <= row < height and -width <= column < width):
+            raise ValueError("End points must all be within the costs array.")
+    if costs[end] < 0:
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+    traversable_costs = costs[costs >= 0]
+    return find_least_cost_path(
+        costs,
+        start,
+        end,
+        bucket_width=Config.LCPA_LANDMARK_BUCKET_WIDTH,
+        heuristic_cost=float(traversable_costs.min()),
+        lower_bound=get_landmark_lower_bound(landmark_distances, end),
+    )
@@ -0,0 +1,320 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import heapq
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import rasterio
+import shapely
+import structlog
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.windows import Window
+
+from settings import Config
+from utility_route_planner.models.lcpa.lcpa_datastructures import LcpaLegResult
+from utility_route_planner.models.lcpa.lcpa_search import (
+    NEIGHBOUR_HALF_LENGTHS,
+    NEIGHBOUR_OFFSETS,
+    NO_PREDECESSOR,
+    relax_neighbours,
+    to_flat_index,
+)
+
+logger = structlog.get_logger(__name__)
+
+
+class RasterBlockCache:
+    """
+    Least recently used cache of decoded square blocks of the suitability raster within the project area, such that a
+    search only keeps max_blocks blocks in memory instead of the whole project area. The blocks are masked the same as
+    load_suitability_raster_data: cells outside the project area or without data are -1. Blocks on the edge of the
+    project area are padded with -1 to the full block size.
+    """
+
+    def __init__(
+        self,
+        path_raster: Path | str,
+        project_area: shapely.Polygon,
+        block_size: int = Config.LCPA_OUT_OF_CORE_BLOCK_SIZE,
+        max_blocks: int = Config.LCPA_OUT_OF_CORE_MAX_BLOCKS,
+    ):
+        # A block is searched together with the edges of its 8 neighbouring blocks.
+        if max_blocks < 9:
+            raise ValueError("The block cache must fit a block and its 8 neighbouring blocks.")
+        self.dataset = rasterio.open(path_raster)
+        self.project_area = project_area
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.window = geometry_window(self.dataset, [project_area])
+        self.shape = int(self.window.height), int(self.window.width)
+        self.geotransform = self.dataset.window_transform(self.window).to_gdal()
+        self.number_of_blocks = -(-self.shape[0] // block_size), -(-self.shape[1] // block_size)
+        self.blocks: OrderedDict[tuple[int, int], np.ndarray] = OrderedDict()
+        self.block_fetches = 0
+        self.block_evictions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.dataset.close()
+
+    def get_block(self, block_row: int, block_column: int) -> np.ndarray:
+        """Return the costs of the block, decoding it from the raster when it is not cached."""
+        key = block_row, block_column
+        if key in self.blocks:
+            self.blocks.move_to_end(key)
+            return self.blocks[key]
+
+        row_offset, column_offset = block_row * self.block_size, block_column * self.block_size
+        height = min(self.block_size, self.shape[0] - row_offset)
+        width = min(self.block_size, self.shape[1] - column_offset)
+        window = Window(self.window.col_off + column_offset, self.window.row_off + row_offset, width, height)
+        image = self.dataset.read(1, window=window)
+        is_outside = geometry_mask(
+            [self.project_area],
+            out_shape=image.shape,
+            transform=self.dataset.window_transform(window),
+            all_touched=True,  # Include a pixel in the mask if it touches any of the shapes.
+        )
+        # Replace with a negative value which is ignored in LCPA.
+        image[is_outside | (image == self.dataset.nodata)] = -1
+        block = np.full((self.block_size, self.block_size), -1, dtype=image.dtype)
+        block[:height, :width] = image
+
+        self.block_fetches += 1
+        self.blocks[key] = block
+        if len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+            self.block_evictions += 1
+        return block
+
+
+def find_out_of_core_least_cost_path(
+    block_cache: RasterBlockCache,
+    start: tuple[int, int],
+    end: tuple[int, int],
+    working_directory: Path | None = None,
+) -> LcpaLegResult:
+    """
+    Least cost path on a raster which does not need to fit in memory, returning a route of the same cost as
+    route_through_array with geometric=True and fully_connected=True on the whole project area.
+
+    The cumulative costs, predecessor directions and pending cells are memory-mapped arrays chunked per block, such that
+    the cells of a block are contiguous on disk. The files are sparse, a block is only written once the search reaches
+    it. The search is label-correcting per block: the block with the lowest pending cumulative cost is searched
+    together with a border of one cell of its neighbouring blocks. Improved cells on that border are pending in their
+    own block, which is searched again later. The search stops as soon as no pending cell can improve the end cell.
+
+    :param block_cache: blocks of the suitability raster within the project area.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :param working_directory: directory of the temporary memory-mapped arrays, defaults to the temporary directory.
+    :return: row and column indices of the least cost path from start to end, its cost and the expanded nodes.
+    """
+    height, width = block_cache.shape
+    block_size = block_cache.block_size
+    start_cell: tuple[int, int] = divmod(to_flat_index(start, height, width), width)
+    end_cell: tuple[int, int] = divmod(to_flat_index(end, height, width), width)
+    (end_block_row, end_row), (end_block_column, end_column) = (
+        divmod(end_cell[0], block_size),
+        divmod(end_cell[1], block_size),
+    )
+    if block_cache.get_block(end_block_row, end_block_column)[end_row, end_column] < 0:
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    with tempfile.TemporaryDirectory(dir=working_directory) as directory:
+        block_search = OutOfCoreSearch(block_cache, Path(directory))
+        block_search.set_start(start_cell)
+        while block_search.queue:
+            priority, block_row, block_column = heapq.heappop(block_search.queue)
+            if priority != block_search.block_priorities[block_row, block_column]:
+                # The block was searched or improved after it was queued with this priority.
+                continue
+            end_cost = block_search.get_cumulative_cost(end_cell)
+            if priority >= end_cost:
+                break
+            block_search.search_block(block_row, block_column, end_cost)
+
+        end_cost = block_search.get_cumulative_cost(end_cell)
+        if not np.isfinite(end_cost):
+            raise ValueError("No minimum-cost path was found to the specified end point.")
+        path = block_search.trace_back_path(start_cell, end_cell)
+        expanded_nodes = block_search.expanded_nodes
+        # Release the memory-mapped files before the temporary directory is removed.
+        del block_search
+
+    logger.info(
+        f"Out-of-core search expanded {expanded_nodes} nodes, {block_cache.block_fetches} block fetches and "
+        f"{block_cache.block_evictions} block evictions so far."
+    )
+    return LcpaLegResult(path, end_cost, expanded_nodes)
+
+
+class OutOfCoreSearch:
+    """
+    State of find_out_of_core_least_cost_path: memory-mapped arrays of shape (block rows, block columns, block size,
+    block size) and per block the lowest pending cumulative cost, which is the priority of the block in the queue.
+    """
+
+    def __init__(self, block_cache: RasterBlockCache, directory: Path):
+        self.block_cache = block_cache
+        self.block_size = block_cache.block_size
+        shape = *block_cache.number_of_blocks, self.block_size, self.block_size
+        self.cumulative_costs = np.memmap(directory / "cumulative_costs.dat", dtype="float64", mode="w+", shape=shape)
+        self.predecessors = np.memmap(directory / "predecessors.dat", dtype="uint8", mode="w+", shape=shape)
+        self.is_pending = np.memmap(directory / "is_pending.dat", dtype=bool, mode="w+", shape=shape)
+        self.is_block_reached = np.zeros(block_cache.number_of_blocks, dtype=bool)
+        self.block_priorities = np.full(block_cache.number_of_blocks, np.inf)
+        self.queue: list[tuple[float, int, int]] = []
+        self.expanded_nodes = 0
+
+        padded_size = self.block_size + 2
+        self.flat_offsets = NEIGHBOUR_OFFSETS[:, 0] * padded_size + NEIGHBOUR_OFFSETS[:, 1]
+        is_interior = np.zeros((padded_size, padded_size), dtype=bool)
+        is_interior[1:-1, 1:-1] = True
+        self.is_interior = is_interior.reshape(-1)
+
+    def reach_block(self, block_row: int, block_column: int):
+        """Initialize the cumulative costs of a block when the search reaches it for the first time."""
+        if not self.is_block_reached[block_row, block_column]:
+            self.cumulative_costs[block_row, block_column] = np.inf
+            self.predecessors[block_row, block_column] = NO_PREDECESSOR
+            self.is_block_reached[block_row, block_column] = True
+
+    def set_start(self, start: tuple[int, int]):
+        (block_row, row), (block_column, column) = divmod(start[0], self.block_size), divmod(start[1], self.block_size)
+        self.reach_block(block_row, block_column)
+        self.cumulative_costs[block_row, block_column, row, column] = 0
+        self.is_pending[block_row, block_column, row, column] = True
+        self.set_block_priority(block_row, block_column, 0.0)
+
+    def set_block_priority(self, block_row: int, block_column: int, priority: float):
+        self.block_priorities[block_row, block_column] = priority
+        if np.isfinite(priority):
+            heapq.heappush(self.queue, (priority, block_row, block_column))
+
+    def get_cumulative_cost(self, index: tuple[int, int]) -> float:
+        (block_row, row), (block_column, column) = divmod(index[0], self.block_size), divmod(index[1], self.block_size)
+        if not self.is_block_reached[block_row, block_column]:
+            return np.inf
+        return float(self.cumulative_costs[block_row, block_column, row, column])
+
+    def get_padded_block(self, block_row: int, block_column: int) -> tuple[np.ndarray, np.ndarray]:
+        """Costs and cumulative costs of the block with a border of one cell of the neighbouring blocks."""
+        size = self.block_size
+        number_of_block_rows, number_of_block_columns = self.block_cache.number_of_blocks
+        costs = np.full((size + 2, size + 2), -1, dtype=self.block_cache.get_block(block_row, block_column).dtype)
+        cumulative_costs = np.full((size + 2, size + 2), np.inf)
+        for row_step in (-1, 0, 1):
+            for column_step in (-1, 0, 1):
+                neighbour_row, neighbour_column = block_row + row_step, block_column + column_step
+                if not (0 <= neighbour_row < number_of_block_rows and 0 <= neighbour_column < number_of_block_columns):
+                    continue
+                # Slices of the neighbouring block and of the padded block covering the same cells.
+                source_rows, target_rows = self.get_border_slices(row_step)
+                source_columns, target_columns = self.get_border_slices(column_step)
+                neighbour_costs = self.block_cache.get_block(neighbour_row, neighbour_column)
+                costs[target_rows, target_columns] = neighbour_costs[source_rows, source_columns]
+                if self.is_block_reached[neighbour_row, neighbour_column]:
+                    neighbour_cumulative_costs = self.cumulative_costs[neighbour_row, neighbour_column]
+                    cumulative_costs[target_rows, target_columns] = neighbour_cumulative_costs[
+                        source_rows, source_columns
+                    ]
+        return costs, cumulative_costs
+
+    def get_border_slices(self, step: int) -> tuple[slice, slice]:
+        match step:
+            case -1:
+                return slice(self.block_size - 1, None), slice(0, 1)
+            case 1:
+                return slice(0, 1), slice(self.block_size + 1, None)
+            case _:
+                return slice(None), slice(1, self.block_size + 1)
+
+    def search_block(self, block_row: int, block_column: int, end_cost: float):
+        """
+        Expand the pending cells of the block until none of them can improve the end cell, passing improved cells on
+        the border to their own block.
+        """
+        size, padded_size = self.block_size, self.block_size + 2
+        costs, cumulative_costs = self.get_padded_block(block_row, block_column)
+        flat_costs, cumulative_costs = costs.reshape(-1), cumulative_costs.reshape(-1)
+        predecessors = np.full(padded_size * padded_size, NO_PREDECESSOR, dtype="uint8")
+        predecessors.reshape(padded_size, padded_size)[1:-1, 1:-1] = self.predecessors[block_row, block_column]
+        padded_is_pending = np.zeros((padded_size, padded_size), dtype=bool)
+        padded_is_pending[1:-1, 1:-1] = self.is_pending[block_row, block_column]
+        is_pending = padded_is_pending.reshape(-1)
+        pending = np.flatnonzero(is_pending)
+        bucket_width = max(float(flat_costs.max()), 1.0)
+        improved_border_cells = [np.empty(0, dtype="int64")]
+
+        while pending.size > 0:
+            pending_costs = cumulative_costs[pending]
+            lowest_cost = pending_costs.min()
+            if lowest_cost >= end_cost:
+                break
+            is_active = pending_costs < lowest_cost + bucket_width
+            active, pending = pending[is_active], pending[~is_active]
+            is_pending[active] = False
+            self.expanded_nodes += active.size
+
+            neighbours = relax_neighbours(
+                active,
+                flat_costs,
+                cumulative_costs,
+                predecessors,
+                self.flat_offsets,
+                NEIGHBOUR_HALF_LENGTHS,
+                padded_size,
+            )
+            # Cells on the border are expanded when their own block is searched.
+            improved_border_cells.append(neighbours[~self.is_interior[neighbours]])
+            neighbours = neighbours[self.is_interior[neighbours]]
+            neighbours = np.unique(neighbours[~is_pending[neighbours]])
+            is_pending[neighbours] = True
+            pending = np.concatenate((pending, neighbours))
+
+        self.cumulative_costs[block_row, block_column] = cumulative_costs.reshape(padded_size, -1)[1:-1, 1:-1]
+        self.predecessors[block_row, block_column] = predecessors.reshape(padded_size, -1)[1:-1, 1:-1]
+        self.is_pending[block_row, block_column] = is_pending.reshape(padded_size, -1)[1:-1, 1:-1]
+        self.set_block_priority(block_row, block_column, float(cumulative_costs[pending].min(initial=np.inf)))
+
+        border_cells = np.unique(np.concatenate(improved_border_cells).astype("int64"))
+        rows = block_row * size + border_cells // padded_size - 1
+        columns = block_column * size + border_cells % padded_size - 1
+        neighbour_block_rows, neighbour_block_columns = rows // size, columns // size
+        for neighbour_row, neighbour_column in set(
+            zip(neighbour_block_rows.tolist(), neighbour_block_columns.tolist())
+        ):
+            is_neighbour = (neighbour_block_rows == neighbour_row) & (neighbour_block_columns == neighbour_column)
+            cells = border_cells[is_neighbour]
+            local_indices = rows[is_neighbour] % size, columns[is_neighbour] % size
+            self.reach_block(neighbour_row, neighbour_column)
+            self.cumulative_costs[neighbour_row, neighbour_column][local_indices] = cumulative_costs[cells]
+            self.predecessors[neighbour_row, neighbour_column][local_indices] = predecessors[cells]
+            self.is_pending[neighbour_row, neighbour_column][local_indices] = True
+            priority = min(self.block_priorities[neighbour_row, neighbour_column], float(cumulative_costs[cells].min()))
+            self.set_block_priority(neighbour_row, neighbour_column, priority)
+
+    def trace_back_path(self, start: tuple[int, int], end: tuple[int, int]) -> list[tuple[int, int]]:
+        """Follow the predecessor directions from the end back to the start, returning the path from start to end."""
+        path = []
+        row, column = end
+        while (row, column) != start:
+            path.append((row, column))
+            (block_row, local_row), (block_column, local_column) = (
+                divmod(row, self.block_size),
+                divmod(column, self.block_size),
+            )
+            row_offset, column_offset = NEIGHBOUR_OFFSETS[
+                self.predecessors[block_row, block_column, local_row, local_column]
+            ]
+            row, column = row - int(row_offset), column - int(column_offset)
+        path.append(start)
+        path.reverse()
+        return path
@@ -0,0 +1,339 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from concurrent.futures.process import ProcessPoolExecutor
+
+import numpy as np
+import structlog
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from skimage.graph import MCP_Geometric
+
+from settings import Config
+from utility_route_planner.models.lcpa.lcpa_csr_graph import build_csr_graph
+from utility_route_planner.models.lcpa.lcpa_datastructures import BlockBoundaryCosts, LcpaLegResult, OverlayGraph
+from utility_route_planner.models.lcpa.lcpa_search import NEIGHBOUR_HALF_LENGTHS, NEIGHBOUR_OFFSETS
+from utility_route_planner.models.lcpa.lcpa_quadtree import (
+    DIAGONAL_DIRECTIONS,
+    STRAIGHT_DIRECTIONS,
+    find_leaf_crossings,
+)
+
+logger = structlog.get_logger(__name__)
+
+
+def build_overlay_graph(
+    costs: np.ndarray,
+    geotransform: tuple,
+    block_size: int = Config.LCPA_OVERLAY_BLOCK_SIZE,
+    previous_overlay_graph: OverlayGraph | None = None,
+    run_in_parallel: bool = False,
+) -> OverlayGraph:
+    """
+    Partition the suitability raster into square blocks and precompute the least cost between every pair of boundary
+    cells within each block. The boundary cells of all blocks form the nodes of a small overlay graph, connected by
+    these costs and by the steps between neighbouring cells of different blocks. A route between two boundary cells on
+    the overlay graph has the same cost as on the complete raster.
+
+    When the previous overlay graph is given, the costs of a block are only recomputed when the costs or the boundary
+    cells of the block changed, such that a local change of the suitability raster only requires the preprocessing of
+    the changed blocks.
+
+    :param costs: 2d array with the cost of each cell, negative cells are not traversable.
+    :param geotransform: metadata of the raster from gdal.
+    :param block_size: size of the blocks in cells.
+    :param previous_overlay_graph: overlay graph of a previous version of the costs, of which unchanged blocks are
+        reused.
+    :param run_in_parallel: compute the boundary costs of the blocks concurrently in a process pool.
+    :return: the overlay graph and the boundary costs of each block.
+    """
+    height, width = costs.shape
+    number_of_block_columns = -(-width // block_size)
+    rows, columns = np.indices(costs.shape, dtype="int32")
+    block_ids = np.where(costs >= 0, rows // block_size * number_of_block_columns + columns // block_size, -1)
+    del rows, columns
+
+    # Steps between neighbouring traversable cells of different blocks, of which the cells are the boundary cells.
+    cells_per_direction: list[np.ndarray] = []
+    neighbours_per_direction: list[np.ndarray] = []
+    costs_per_direction: list[np.ndarray] = []
+    flat_costs = costs.ravel().astype("float64")
+    for (row_offset, column_offset), half_length in zip(
+        STRAIGHT_DIRECTIONS + DIAGONAL_DIRECTIONS, (0.5, 0.5, 2**0.5 / 2, 2**0.5 / 2)
+    ):
+        cells, neighbours = find_leaf_crossings(block_ids, row_offset, column_offset)
+        cells_per_direction.append(cells)
+        neighbours_per_direction.append(neighbours)
+        costs_per_direction.append(half_length * (flat_costs[cells] + flat_costs[neighbours]))
+    cut_cells = np.concatenate(cells_per_direction)
+    cut_neighbours = np.concatenate(neighbours_per_direction)
+    cut_costs = np.concatenate(costs_per_direction)
+
+    # The boundary cells are numbered by block, such that the boundary cells of a block are a consecutive range.
+    flat_block_ids = block_ids.ravel()
+    node_cells = np.unique(np.concatenate([cut_cells, cut_neighbours]))
+    node_cells = node_cells[np.argsort(flat_block_ids[node_cells], kind="stable")]
+    number_of_blocks = -(-height // block_size) * number_of_block_columns
+    block_indptr = np.zeros(number_of_blocks + 1, dtype="int64")
+    block_indptr[1:] = np.cumsum(np.bincount(flat_block_ids[node_cells], minlength=number_of_blocks))
+
+    block_boundary_costs: dict[int, BlockBoundaryCosts] = {}
+    changed_blocks: list[int] = []
+    for block_id in range(number_of_blocks):
+        boundary_cells = node_cells[block_indptr[block_id] : block_indptr[block_id + 1]]
+        if boundary_cells.size == 0:
+            continue
+        if previous_overlay_graph is not None and is_block_unchanged(
+            previous_overlay_graph, block_id, costs, block_size, boundary_cells
+        ):
+            block_boundary_costs[block_id] = previous_overlay_graph.block_boundary_costs[block_id]
+        else:
+            changed_blocks.append(block_id)
+    logger.info(f"Computing the boundary costs of {len(changed_blocks)} of {number_of_blocks} blocks.")
+
+    def get_block_input(block_id: int) -> tuple[np.ndarray, np.ndarray]:
+        window = get_block_window(block_id, costs.shape, block_size)
+        boundary_cells = node_cells[block_indptr[block_id] : block_indptr[block_id + 1]]
+        boundary_rows, boundary_columns = np.divmod(boundary_cells, width)
+        local_cells = (boundary_rows - window[0].start) * (window[1].stop - window[1].start) + (
+            boundary_columns - window[1].start
+        )
+        return costs[window], local_cells
+
+    if run_in_parallel and len(changed_blocks) > 1:
+        with ProcessPoolExecutor() as executor:
+            futures = {
+                block_id: executor.submit(compute_block_boundary_costs, *get_block_input(block_id))
+                for block_id in changed_blocks
+            }
+            local_results = {block_id: future.result() for block_id, future in futures.items()}
+    else:
+        local_results = {
+            block_id: compute_block_boundary_costs(*get_block_input(block_id)) for block_id in changed_blocks
+        }
+    for block_id, (source_indices, target_indices, boundary_costs) in local_results.items():
+        boundary_cells = node_cells[block_indptr[block_id] : block_indptr[block_id + 1]]
+        block_boundary_costs[block_id] = BlockBoundaryCosts(
+            boundary_cells, boundary_cells[source_indices], boundary_cells[target_indices], boundary_costs
+        )
+
+    # Map the cells to their node, of which the order is the order of node_cells.
+    cell_order = np.argsort(node_cells)
+
+    def to_node(cells: np.ndarray) -> np.ndarray:
+        return cell_order[np.searchsorted(node_cells[cell_order], cells)]
+
+    block_costs = list(block_boundary_costs.values())
+    sources = np.concatenate([cut_cells, cut_neighbours] + [block.source_cells for block in block_costs])
+    targets = np.concatenate([cut_neighbours, cut_cells] + [block.target_cells for block in block_costs])
+    weights = np.concatenate([cut_costs, cut_costs] + [block.costs for block in block_costs])
+    graph = csr_matrix((weights, (to_node(sources), to_node(targets))), shape=(node_cells.size, node_cells.size))
+    logger.info(
+        f"Built an overlay graph of {node_cells.size} boundary cells and {graph.nnz} edges, "
+        f"for {np.count_nonzero(flat_block_ids >= 0)} traversable cells."
+    )
+    return OverlayGraph(graph, node_cells, block_indptr, block_boundary_costs, block_size, costs, geotransform)
+
+
+def get_block_window(block_id: int, shape: tuple[int, int], block_size: int) -> tuple[slice, slice]:
+    """Rows and columns of the raster covered by the block."""
+    block_row, block_column = divmod(block_id, -(-shape[1] // block_size))
+    return (
+        slice(block_row * block_size, min((block_row + 1) * block_size, shape[0])),
+        slice(block_column * block_size, min((block_column + 1) * block_size, shape[1])),
+    )
+
+
+def is_block_unchanged(
+    previous_overlay_graph: OverlayGraph | None,
+    block_id: int,
+    costs: np.ndarray,
+    block_size: int,
+    boundary_cells: np.ndarray,
+) -> bool:
+    """Check if the boundary costs of the block in the previous overlay graph are still valid."""
+    if (
+        previous_overlay_graph is None
+        or previous_overlay_graph.block_size != block_size
+        or previous_overlay_graph.costs.shape != costs.shape
+        or block_id not in previous_overlay_graph.block_boundary_costs
+    ):
+        return False
+    window = get_block_window(block_id, costs.shape, block_size)
+    return np.array_equal(
+        previous_overlay_graph.block_boundary_costs[block_id].boundary_cells, boundary_cells
+    ) and np.array_equal(previous_overlay_graph.costs[window], costs[window])
+
+
+def compute_block_boundary_costs(
+    block_costs: np.ndarray, boundary_cells: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Least cost between the pairs of boundary cells of a block, as route_through_array within the block. A pair is
+    left out when its least cost path passes another boundary cell, as the overlay graph then contains the same route
+    through that boundary cell, which keeps the overlay graph small.
+
+    :param block_costs: costs of the cells of the block.
+    :param boundary_cells: flat index within the block of its boundary cells.
+    :return: position in boundary_cells of the source and target of each pair, and their least cost.
+    """
+    csr_graph = build_csr_graph(block_costs, ())
+    boundary_nodes = csr_graph.node_ids.ravel()[boundary_cells]
+    distances = dijkstra(csr_graph.graph, directed=True, indices=boundary_nodes)[:, boundary_nodes]
+
+    # Least cost from u to v through another boundary cell w, only through w which are strictly cheaper to reach and
+    # leave, such that every left out pair is replaced by pairs of a lower cost which are kept or replaced in turn.
+    positive_distances = np.where(distances > 0, distances, np.inf)
+    costs_through_boundary = np.empty_like(distances)
+    rows_per_chunk = max(1, 2**22 // max(distances.size, 1))
+    for first_row in range(0, distances.shape[0], rows_per_chunk):
+        chunk = slice(first_row, first_row + rows_per_chunk)
+        costs_through_boundary[chunk] = (positive_distances[chunk, :, None] + positive_distances[None, :, :]).min(
+            axis=1
+        )
+    is_pair = np.isfinite(distances) & (costs_through_boundary > distances * (1 + 1e-9))
+    np.fill_diagonal(is_pair, False)
+    source_indices, target_indices = np.nonzero(is_pair)
+    return source_indices, target_indices, distances[source_indices, target_indices]
+
+
+def find_overlay_least_cost_path(
+    overlay_graph: OverlayGraph, start: tuple[int, int], end: tuple[int, int]
+) -> LcpaLegResult:
+    """
+    Least cost path on the overlay graph. Only the blocks of the start and the end are searched at full resolution, to
+    the boundary cells of their block, after which the route between both blocks is found on the overlay graph. The
+    parts of the route within the other blocks are recomputed within the block from the boundary cell it enters the
+    block to the boundary cell it leaves the block. The route cost equals route_through_array on the complete raster.
+
+    :param overlay_graph: overlay graph of the suitability raster.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :return: row and column indices of the least cost path from start to end, its cost and the expanded nodes.
+    """
+    costs = overlay_graph.costs
+    height, width = costs.shape
+    for row, column in (start, end):
+        if not (-height <= row < height and -width <= column < width):
+            raise ValueError("End points must all be within the costs array.")
+    start = start[0] % height, start[1] % width
+    end = end[0] % height, end[1] % width
+    if costs[end] < 0:
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    # Searches from the start with the cost and the cells before the cell of the search. A start which is not
+    # traversable continues through its traversable neighbours, which may be in another block.
+    start_searches: list[tuple[BlockSearch, float, list[tuple[int, int]]]]
+    if costs[start] >= 0:
+        start_searches = [(BlockSearch(overlay_graph, start), 0.0, [])]
+    else:
+        start_searches = []
+        for (row_offset, column_offset), half_length in zip(NEIGHBOUR_OFFSETS, NEIGHBOUR_HALF_LENGTHS):
+            row, column = start[0] + row_offset, start[1] + column_offset
+            if 0 <= row < height and 0 <= column < width and costs[row, column] >= 0:
+                step_cost = half_length * (float(costs[start]) + float(costs[row, column]))
+                start_searches.append((BlockSearch(overlay_graph, (row, column)), step_cost, [start]))
+    end_search = BlockSearch(overlay_graph, end)
+    expanded_nodes = end_search.expanded_nodes + sum(search.expanded_nodes for search, _, _ in start_searches)
+
+    # Connect the start to the boundary cells reached by the searches, through the search of the lowest cost.
+    nodes_per_search: list[np.ndarray] = [np.empty(0, dtype="int64")]
+    costs_per_search: list[np.ndarray] = [np.empty(0)]
+    search_indices_per_search: list[np.ndarray] = [np.empty(0, dtype="int64")]
+    for search_index, (search, step_cost, _) in enumerate(start_searches):
+        nodes_per_search.append(search.boundary_nodes)
+        costs_per_search.append(step_cost + search.get_costs(search.boundary_cells))
+        search_indices_per_search.append(np.full(search.boundary_nodes.size, search_index))
+    start_costs = np.concatenate(costs_per_search)
+    start_search_indices = np.concatenate(search_indices_per_search)
+    order = np.argsort(start_costs, kind="stable")
+    start_nodes, first_index = np.unique(np.concatenate(nodes_per_search)[order].astype("int64"), return_index=True)
+    start_costs, start_search_indices = start_costs[order][first_index], start_search_indices[order][first_index]
+    is_reachable = np.isfinite(start_costs)
+    search_of_start_node = dict(zip(start_nodes[is_reachable].tolist(), start_search_indices[is_reachable].tolist()))
+
+    graph, number_of_nodes = overlay_graph.graph, overlay_graph.node_cells.size
+    graph_with_start = csr_matrix(
+        (
+            np.concatenate([graph.data, start_costs[is_reachable]]),
+            np.concatenate([graph.indices, start_nodes[is_reachable]]),
+            np.concatenate([graph.indptr, [graph.nnz + np.count_nonzero(is_reachable)]]),
+        ),
+        shape=(number_of_nodes + 1, number_of_nodes + 1),
+    )
+    distances, predecessors = dijkstra(
+        graph_with_start, directed=True, indices=number_of_nodes, return_predecessors=True
+    )
+    expanded_nodes += int(np.isfinite(distances).sum())
+
+    # The end is reached through the cheapest boundary cell of its block, or within the block from a start search in it.
+    end_costs = distances[end_search.boundary_nodes] + end_search.get_costs(end_search.boundary_cells)
+    cost, end_node = np.inf, -1
+    if end_costs.size > 0 and np.isfinite(end_costs.min()):
+        cost, end_node = float(end_costs.min()), int(end_search.boundary_nodes[end_costs.argmin()])
+    direct_path = None
+    for search, step_cost, previous_cells in start_searches:
+        if search.block_id == end_search.block_id:
+            direct_cost = step_cost + float(search.get_costs(np.array([end[0] * width + end[1]]))[0])
+            if direct_cost <= cost:
+                cost, direct_path = direct_cost, previous_cells + search.traceback(end)
+    if not np.isfinite(cost):
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+    if direct_path is not None:
+        return LcpaLegResult(direct_path, cost, expanded_nodes)
+
+    nodes = [end_node]
+    while predecessors[nodes[-1]] != number_of_nodes:
+        nodes.append(int(predecessors[nodes[-1]]))
+    nodes.reverse()
+    boundary_path = [divmod(int(overlay_graph.node_cells[node]), width) for node in nodes]
+
+    search, _, indices = start_searches[search_of_start_node[nodes[0]]]
+    indices = indices + search.traceback(boundary_path[0])
+    for cell, next_cell in zip(boundary_path[:-1], boundary_path[1:]):
+        search = BlockSearch(overlay_graph, cell)
+        if search.block_id != get_block_id(next_cell, costs.shape, overlay_graph.block_size):
+            indices.append(next_cell)
+        else:
+            indices.extend(search.traceback(next_cell)[1:])
+    indices.extend(end_search.traceback(boundary_path[-1])[::-1][1:])
+    return LcpaLegResult(indices, cost, expanded_nodes)
+
+
+def get_block_id(cell: tuple[int, int], shape: tuple[int, int], block_size: int) -> int:
+    """Block containing the cell, the blocks are numbered row by row."""
+    return cell[0] // block_size * -(-shape[1] // block_size) + cell[1] // block_size
+
+
+class BlockSearch:
+    """Least cost paths within the block of a cell from that cell, the search ends at the boundary of the block."""
+
+    def __init__(self, overlay_graph: OverlayGraph, cell: tuple[int, int]):
+        self.width = overlay_graph.costs.shape[1]
+        self.block_id = get_block_id(cell, overlay_graph.costs.shape, overlay_graph.block_size)
+        self.window = get_block_window(self.block_id, overlay_graph.costs.shape, overlay_graph.block_size)
+        self.boundary_nodes = np.arange(
+            overlay_graph.block_indptr[self.block_id], overlay_graph.block_indptr[self.block_id + 1]
+        )
+        self.boundary_cells = overlay_graph.node_cells[self.boundary_nodes]
+        block_costs = overlay_graph.costs[self.window]
+        self.mcp = MCP_Geometric(block_costs, fully_connected=True)
+        self.cumulative_costs, _ = self.mcp.find_costs([self.to_local(cell)])
+        self.expanded_nodes = block_costs.size
+
+    def to_local(self, cell: tuple[int, int]) -> tuple[int, int]:
+        return cell[0] - self.window[0].start, cell[1] - self.window[1].start
+
+    def get_costs(self, cells: np.ndarray) -> np.ndarray:
+        """Least cost from the cell of the search to the given flat indices of cells of the block."""
+        rows, columns = np.divmod(cells, self.width)
+        costs = self.cumulative_costs[rows - self.window[0].start, columns - self.window[1].start]
+        return np.where(np.isfinite(costs), costs, np.inf)
+
+    def traceback(self, cell: tuple[int, int]) -> list[tuple[int, int]]:
+        """Least cost path from the cell of the search to the given cell of the block."""
+        return [
+            (int(row + self.window[0].start), int(column + self.window[1].start))
+            for row, column in self.mcp.traceback(self.to_local(cell))
+        ]
@@ -0,0 +1,314 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import numpy as np
+import structlog
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from settings import Config
+from utility_route_planner.models.lcpa.lcpa_datastructures import LcpaLegResult, QuadtreeGraph
+from utility_route_planner.models.lcpa.lcpa_search import NEIGHBOUR_HALF_LENGTHS, NEIGHBOUR_OFFSETS
+
+logger = structlog.get_logger(__name__)
+
+# Directions in which neighbouring cells of different leaves are connected, the opposite directions follow from the
+# symmetry of the edges.
+STRAIGHT_DIRECTIONS = ((0, 1), (1, 0))
+DIAGONAL_DIRECTIONS = ((1, 1), (1, -1))
+
+
+def build_quadtree_graph(
+    costs: np.ndarray,
+    portal_spacing: int = Config.LCPA_QUADTREE_PORTAL_SPACING,
+    max_leaf_size: int = Config.LCPA_QUADTREE_MAX_LEAF_SIZE,
+) -> QuadtreeGraph:
+    """
+    Convert the suitability raster to a graph of variable resolution. Square regions of cells of equal cost are merged
+    to the leaves of a quadtree. The nodes of the graph are portal cells on the boundary of the leaves, connected to
+    the portals of neighbouring leaves with the cost of a step between both cells, and to the other portals of their own
+    leaf with the exact cost of the octile path through the leaf.
+
+    With a portal_spacing of 1 every boundary cell is a portal and the route cost equals route_through_array with
+    geometric=True and fully_connected=True. A larger spacing only keeps the crossings between leaves every
+    portal_spacing cells and at the corners of the leaves, such that a route may have to detour to the nearest portal
+    when crossing to another leaf. This bounds the extra cost to about portal_spacing times the cost of a cell per
+    crossing, in exchange for fewer nodes and edges.
+
+    The portals of a leaf form a clique, such that a leaf with n portals has n * (n - 1) edges. On a raster with few
+    regions of equal cost the graph may therefore have more edges than the grid itself, which max_leaf_size limits.
+
+    :param costs: 2d array with the cost of each cell, negative cells are not traversable.
+    :param portal_spacing: distance in cells between the portals on the boundary of a leaf, 1 keeps the exact costs.
+    :param max_leaf_size: size of the largest leaf in cells, a power of 2, limits the edges between the portals of a
+        leaf.
+    :return: the graph as sparse matrix, the leaf of each cell and the portals of each leaf.
+    """
+    if portal_spacing < 1:
+        raise ValueError("The portal spacing must be at least 1 cell.")
+    if max_leaf_size < 1 or max_leaf_size & (max_leaf_size - 1) != 0:
+        raise ValueError("The maximum leaf size must be a power of 2.")
+
+    leaf_ids, leaf_rows, leaf_columns, leaf_sizes, leaf_costs = find_quadtree_leaves(costs, max_leaf_size)
+    flat_leaf_ids = leaf_ids.ravel()
+    width = leaf_ids.shape[1]
+
+    def is_leaf_corner(cells: np.ndarray) -> np.ndarray:
+        leaves = flat_leaf_ids[cells]
+        rows, columns = np.divmod(cells - leaf_rows[leaves] * width - leaf_columns[leaves], width)
+        last = leaf_sizes[leaves] - 1
+        return ((rows == 0) | (rows == last)) & ((columns == 0) | (columns == last))
+
+    # Straight crossings between leaves are kept every portal_spacing cells along the boundary. A crossing at the corner
+    # of a leaf is always kept, such that every pair of neighbouring leaves remains connected.
+    crossings = []
+    for row_offset, column_offset in STRAIGHT_DIRECTIONS:
+        cells, neighbours = find_leaf_crossings(leaf_ids, row_offset, column_offset)
+        position_along_boundary = cells // width if column_offset else cells % width
+        is_kept = (position_along_boundary % portal_spacing == 0) | is_leaf_corner(cells) | is_leaf_corner(neighbours)
+        crossings.append((cells[is_kept], neighbours[is_kept], 0.5))
+
+    # Diagonal crossings are kept at the same spacing and between portals of the straight crossings. Leaves which only
+    # touch diagonally do so at their corners.
+    portals = np.unique(np.concatenate([cells for cells, _, _ in crossings] + [nbs for _, nbs, _ in crossings]))
+    for row_offset, column_offset in DIAGONAL_DIRECTIONS:
+        cells, neighbours = find_leaf_crossings(leaf_ids, row_offset, column_offset)
+        # The boundary is horizontal when the cell and its horizontal neighbour are in the same leaf.
+        rows, columns = np.divmod(cells, width)
+        is_horizontal_boundary = flat_leaf_ids[cells + column_offset] == flat_leaf_ids[cells]
+        position_along_boundary = np.where(is_horizontal_boundary, columns, rows)
+        is_kept = (position_along_boundary % portal_spacing == 0) | (
+            (np.isin(cells, portals) | is_leaf_corner(cells))
+            & (np.isin(neighbours, portals) | is_leaf_corner(neighbours))
+        )
+        crossings.append((cells[is_kept], neighbours[is_kept], 2**0.5 / 2))
+
+    crossing_cells = np.concatenate([cells for cells, _, _ in crossings])
+    crossing_neighbours = np.concatenate([neighbours for _, neighbours, _ in crossings])
+    crossing_half_lengths = np.concatenate([np.full(cells.size, half_length) for cells, _, half_length in crossings])
+
+    # The portals are numbered by leaf, such that the portals of a leaf are a consecutive range of nodes.
+    def to_node_key(cells: np.ndarray) -> np.ndarray:
+        return flat_leaf_ids[cells].astype("int64") * leaf_ids.size + cells
+
+    node_keys = np.unique(np.concatenate([to_node_key(crossing_cells), to_node_key(crossing_neighbours)]))
+    node_leaves, node_cells = np.divmod(node_keys, leaf_ids.size)
+    leaf_indptr = np.zeros(leaf_costs.size + 1, dtype="int64")
+    leaf_indptr[1:] = np.cumsum(np.bincount(node_leaves, minlength=leaf_costs.size))
+
+    crossing_sources = np.searchsorted(node_keys, to_node_key(crossing_cells))
+    crossing_targets = np.searchsorted(node_keys, to_node_key(crossing_neighbours))
+    crossing_weights = crossing_half_lengths * (
+        leaf_costs[flat_leaf_ids[crossing_cells]] + leaf_costs[flat_leaf_ids[crossing_neighbours]]
+    )
+    leaf_sources, leaf_targets = find_portal_pairs(node_leaves, leaf_indptr)
+    leaf_weights = leaf_costs[node_leaves[leaf_sources]] * octile_distance_between_cells(
+        node_cells[leaf_sources], node_cells[leaf_targets], width
+    )
+
+    number_of_nodes = node_cells.size
+    graph = csr_matrix(
+        (
+            np.concatenate([crossing_weights, crossing_weights, leaf_weights]),
+            (
+                np.concatenate([crossing_sources, crossing_targets, leaf_sources]),
+                np.concatenate([crossing_targets, crossing_sources, leaf_targets]),
+            ),
+        ),
+        shape=(number_of_nodes, number_of_nodes),
+    )
+    logger.info(
+        f"Built a quadtree graph of {leaf_costs.size} leaves with {number_of_nodes} nodes and {graph.nnz} edges, "
+        f"for {np.count_nonzero(flat_leaf_ids >= 0)} traversable cells."
+    )
+    return QuadtreeGraph(graph, leaf_ids, leaf_costs, leaf_indptr, node_cells, costs)
+
+
+def find_quadtree_leaves(costs: np.ndarray, max_leaf_size: int) -> tuple:
+    """
+    Split the traversable cells into square leaves of equal cost, at most max_leaf_size cells wide. The leaves are
+    aligned to their size as in a quadtree and found bottom up, merging 4 blocks of equal cost to a block of twice the
+    size.
+
+    :return: leaf of each cell, -1 for cells which are not traversable, and the row, column, size and cost of each leaf.
+    """
+    height, width = costs.shape
+    padded_shape = -(-height // max_leaf_size) * max_leaf_size, -(-width // max_leaf_size) * max_leaf_size
+    block_costs = np.full(padded_shape, -1, dtype="float64")
+    block_costs[:height, :width] = np.where(costs >= 0, costs, -1)
+    # Cost of each block per level and whether all its cells are of that cost, level n has blocks of 2**n cells wide.
+    levels = [(block_costs, np.ones(padded_shape, dtype=bool))]
+    while 2 ** (len(levels) - 1) < max_leaf_size:
+        block_costs, is_uniform = levels[-1]
+        children = block_costs.reshape(block_costs.shape[0] // 2, 2, block_costs.shape[1] // 2, 2)
+        is_uniform = is_uniform.reshape(children.shape).all(axis=(1, 3)) & (children == children[:, :1, :, :1]).all(
+            axis=(1, 3)
+        )
+        levels.append((children[:, 0, :, 0], is_uniform))
+
+    leaf_ids = np.full(padded_shape, -1, dtype="int32")
+    leaf_rows, leaf_columns, leaf_sizes, leaf_costs = [], [], [], []
+    number_of_leaves = 0
+    for level, (block_costs, is_uniform) in enumerate(levels):
+        size = 2**level
+        # A uniform block is a leaf when the block of the next level containing it is not uniform.
+        is_leaf = is_uniform & (block_costs >= 0)
+        if level + 1 < len(levels):
+            is_leaf &= ~np.repeat(np.repeat(levels[level + 1][1], 2, axis=0), 2, axis=1)
+        rows, columns = np.nonzero(is_leaf)
+        # View of the leaf of each cell per block of this level.
+        blocks = leaf_ids.reshape(is_leaf.shape[0], size, is_leaf.shape[1], size).transpose(0, 2, 1, 3)
+        blocks[is_leaf] = np.arange(number_of_leaves, number_of_leaves + rows.size, dtype="int32")[:, None, None]
+        number_of_leaves += rows.size
+        leaf_rows.append(rows * size)
+        leaf_columns.append(columns * size)
+        leaf_sizes.append(np.full(rows.size, size))
+        leaf_costs.append(block_costs[rows, columns])
+
+    return (
+        np.ascontiguousarray(leaf_ids[:height, :width]),
+        np.concatenate(leaf_rows),
+        np.concatenate(leaf_columns),
+        np.concatenate(leaf_sizes),
+        np.concatenate(leaf_costs),
+    )
+
+
+def find_leaf_crossings(leaf_ids: np.ndarray, row_offset: int, column_offset: int) -> tuple[np.ndarray, np.ndarray]:
+    """Flat indices of the traversable cells of which the neighbour in the given direction is in another leaf."""
+    height, width = leaf_ids.shape
+    rows = slice(max(-row_offset, 0), height - max(row_offset, 0))
+    columns = slice(max(-column_offset, 0), width - max(column_offset, 0))
+    leaves = leaf_ids[rows, columns]
+    neighbour_leaves = leaf_ids[
+        max(row_offset, 0) : height + min(row_offset, 0), max(column_offset, 0) : width + min(column_offset, 0)
+    ]
+    crossing_rows, crossing_columns = np.nonzero((leaves >= 0) & (neighbour_leaves >= 0) & (leaves != neighbour_leaves))
+    cells = (crossing_rows + rows.start) * width + crossing_columns + columns.start
+    return cells, cells + row_offset * width + column_offset
+
+
+def find_portal_pairs(node_leaves: np.ndarray, leaf_indptr: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """All ordered pairs of different portals within the same leaf, as source and target node."""
+    portals_per_node = np.diff(leaf_indptr)[node_leaves]
+    sources = np.repeat(np.arange(node_leaves.size), portals_per_node)
+    # Position of each pair within the pairs of its source, which is the offset of the target within the leaf.
+    pair_offsets = np.arange(sources.size) - np.repeat(np.cumsum(portals_per_node) - portals_per_node, portals_per_node)
+    targets = leaf_indptr[node_leaves[sources]] + pair_offsets
+    is_pair = sources != targets
+    return sources[is_pair], targets[is_pair]
+
+
+def octile_distance_between_cells(cells: np.ndarray | int, other_cells: np.ndarray | int, width: int) -> np.ndarray:
+    """Length of the shortest 8-connected path between two cells, given as flat indices."""
+    rows, columns = np.divmod(cells, width)
+    other_rows, other_columns = np.divmod(other_cells, width)
+    row_distance, column_distance = np.abs(rows - other_rows), np.abs(columns - other_columns)
+    return np.maximum(row_distance, column_distance) + (2**0.5 - 1) * np.minimum(row_distance, column_distance)
+
+
+def find_quadtree_least_cost_path(costs: np.ndarray, start: tuple[int, int], end: tuple[int, int]) -> LcpaLegResult:
+    """Least cost path of a single leg on the quadtree graph of the costs, see find_quadtree_graph_least_cost_path."""
+    return find_quadtree_graph_least_cost_path(build_quadtree_graph(costs), start, end)
+
+
+def find_quadtree_graph_least_cost_path(
+    quadtree_graph: QuadtreeGraph, start: tuple[int, int], end: tuple[int, int]
+) -> LcpaLegResult:
+    """
+    Least cost path on the quadtree graph using scipy.sparse.csgraph.dijkstra. The search starts from the end of the
+    leg, connected to the portals of its leaf, after which the start is reached through the cheapest portal of its own
+    leaf. Within a leaf the path follows the octile path between its portals. The start may be a cell which is not
+    traversable, which is then connected through its cheapest traversable neighbour as in route_through_array.
+
+    :param quadtree_graph: graph of the suitability raster.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :return: row and column indices of the least cost path from start to end, its cost and the expanded nodes.
+    """
+    height, width = quadtree_graph.leaf_ids.shape
+    for row, column in (start, end):
+        if not (-height <= row < height and -width <= column < width):
+            raise ValueError("End points must all be within the costs array.")
+    start = start[0] % height, start[1] % width
+    end = end[0] % height, end[1] % width
+    end_leaf = int(quadtree_graph.leaf_ids[end])
+    if end_leaf < 0:
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    # Add the end as last node of the graph, with an edge to each portal of its leaf.
+    graph, number_of_nodes = quadtree_graph.graph, quadtree_graph.node_cells.size
+    end_portals = np.arange(quadtree_graph.leaf_indptr[end_leaf], quadtree_graph.leaf_indptr[end_leaf + 1])
+    end_cell = end[0] * width + end[1]
+    end_weights = quadtree_graph.leaf_costs[end_leaf] * octile_distance_between_cells(
+        quadtree_graph.node_cells[end_portals], end_cell, width
+    )
+    graph_with_end = csr_matrix(
+        (
+            np.concatenate([graph.data, end_weights]),
+            np.concatenate([graph.indices, end_portals]),
+            np.concatenate([graph.indptr, [graph.nnz + end_portals.size]]),
+        ),
+        shape=(number_of_nodes + 1, number_of_nodes + 1),
+    )
+    distances, predecessors = dijkstra(graph_with_end, directed=True, indices=number_of_nodes, return_predecessors=True)
+    expanded_nodes = int(np.isfinite(distances).sum())
+
+    def find_cheapest_portal(cell: int) -> tuple[int, float]:
+        """Portal through which the end is reached at the lowest cost from a traversable cell, -1 for a direct path."""
+        leaf = int(quadtree_graph.leaf_ids.flat[cell])
+        portals = np.arange(quadtree_graph.leaf_indptr[leaf], quadtree_graph.leaf_indptr[leaf + 1])
+        portal_costs = distances[portals] + quadtree_graph.leaf_costs[leaf] * octile_distance_between_cells(
+            quadtree_graph.node_cells[portals], cell, width
+        )
+        portal, cost = -1, np.inf
+        if portals.size > 0:
+            portal, cost = int(portals[portal_costs.argmin()]), float(portal_costs.min())
+        if leaf == end_leaf:
+            direct_cost = float(quadtree_graph.leaf_costs[leaf] * octile_distance_between_cells(cell, end_cell, width))
+            if direct_cost <= cost:
+                portal, cost = -1, direct_cost
+        return portal, cost
+
+    waypoints = [start]
+    if quadtree_graph.leaf_ids[start] >= 0:
+        portal, cost = find_cheapest_portal(start[0] * width + start[1])
+    else:
+        portal, cost = -1, np.inf
+        for (row_offset, column_offset), half_length in zip(NEIGHBOUR_OFFSETS, NEIGHBOUR_HALF_LENGTHS):
+            row, column = start[0] + row_offset, start[1] + column_offset
+            if not (0 <= row < height and 0 <= column < width) or quadtree_graph.leaf_ids[row, column] < 0:
+                continue
+            neighbour_portal, neighbour_cost = find_cheapest_portal(row * width + column)
+            step_cost = half_length * (
+                float(quadtree_graph.costs[start])
+                + float(quadtree_graph.leaf_costs[quadtree_graph.leaf_ids[row, column]])
+            )
+            if neighbour_cost + step_cost < cost:
+                portal, cost = neighbour_portal, neighbour_cost + step_cost
+                waypoints = [start, (row, column)]
+    if not np.isfinite(cost):
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    # Follow the predecessors towards the end of the leg, which is the source of the search.
+    while portal >= 0 and portal != number_of_nodes:
+        waypoints.append(divmod(int(quadtree_graph.node_cells[portal]), width))
+        portal = int(predecessors[portal])
+    waypoints.append(end)
+    return LcpaLegResult(waypoints_to_indices(waypoints), cost, expanded_nodes)
+
+
+def waypoints_to_indices(waypoints: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Cells of the path along the waypoints, taking diagonal steps first. Consecutive waypoints are neighbours or within
+    the same leaf, such that the cells in between are within that leaf and of equal cost.
+    """
+    indices = [waypoints[0]]
+    for row, column in waypoints[1:]:
+        current_row, current_column = indices[-1]
+        while (current_row, current_column) != (row, column):
+            current_row += int(np.sign(row - current_row))
+            current_column += int(np.sign(column - current_column))
+            indices.append((current_row, current_column))
+    return indices
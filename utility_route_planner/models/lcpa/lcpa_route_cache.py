@@ -0,0 +1,175 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import contextlib
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import rasterio
+import rasterio.windows
+import shapely
+import structlog
+from rasterio.errors import WindowError
+from rasterio.features import geometry_window
+
+from settings import Config
+from utility_route_planner.models.lcpa.lcpa_datastructures import CachedRoute, LcpaLegResult
+from utility_route_planner.models.mcda.mcda_datastructures import CostSurface
+
+logger = structlog.get_logger(__name__)
+
+
+def compute_cost_surface_fingerprint(raster_array: np.ndarray, geotransform: tuple) -> str:
+    """
+    Content hash of the suitability raster within the project area as it is used by the search, which changes when the
+    blocks of the raster, the weights of the criteria, the project area or the geotransform change.
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    fingerprint.update(json.dumps([raster_array.shape, str(raster_array.dtype), list(geotransform)]).encode())
+    fingerprint.update(np.ascontiguousarray(raster_array).data)
+    return fingerprint.hexdigest()
+
+
+def compute_raster_source_fingerprint(
+    path_raster: str | Path | CostSurface, project_area: shapely.Polygon
+) -> tuple[str, tuple] | None:
+    """
+    Fingerprint of the suitability raster within the project area which is computed before the raster is decoded, such
+    that a cached route is returned without reading the raster. The files of a raster on disk, for a vrt its source
+    blocks, are fingerprinted by their modification time and size together with the transform. A cost surface in
+    memory is hashed within the window of the project area, without masking it.
+
+    :param path_raster: path to the suitability raster, or the cost surface in memory.
+    :param project_area: area of the suitability raster to use.
+    :return: the fingerprint and the geotransform of the project area window as returned by
+        load_suitability_raster_data, or None when the files of the raster are not on a local disk.
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    try:
+        if isinstance(path_raster, CostSurface):
+            window = geometry_window(path_raster, [project_area])
+            transform = rasterio.windows.transform(window, path_raster.transform)
+            window_array = path_raster.array[window.toslices()]
+            description = [str(window_array.dtype), path_raster.nodata]
+            fingerprint.update(np.ascontiguousarray(window_array).data)
+        else:
+            with rasterio.open(path_raster) as src:
+                window = geometry_window(src, [project_area])
+                transform = src.window_transform(window)
+                if not all(Path(file).is_file() for file in src.files):
+                    return None
+                file_stats = [Path(file).stat() for file in src.files]
+                description = [
+                    src.dtypes[0],
+                    src.nodata,
+                    list(src.transform.to_gdal()),
+                    [[file, stat.st_mtime_ns, stat.st_size] for file, stat in zip(src.files, file_stats)],
+                ]
+    except WindowError:
+        raise ValueError("Input shapes do not overlap raster.")
+
+    geotransform = transform.to_gdal()
+    window_shape = [round(window.height), round(window.width)]
+    fingerprint.update(json.dumps([description, window_shape, list(geotransform)]).encode())
+    fingerprint.update(shapely.to_wkb(project_area))
+    return fingerprint.hexdigest(), geotransform
+
+
+def get_route_cache_key(fingerprint: str, legs: list[tuple[tuple, tuple]], **search_options) -> str:
+    """
+    Key of a route in the route cache: the fingerprint of the cost surface, the raster indices of the start, stops and
+    end of the route and the options of the search which can change the route.
+    """
+    leg_indices = [[[int(index) for index in start], [int(index) for index in end]] for start, end in legs]
+    key = json.dumps({"fingerprint": fingerprint, "legs": leg_indices, **search_options}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class RouteCache:
+    """
+    On-disk cache of computed routes in a sqlite database, such that a route sketch which is computed again on the same
+    cost surface is not searched again. When the cached routes exceed max_bytes, the least recently used routes are
+    evicted.
+    """
+
+    def __init__(
+        self, path_cache: Path = Config.PATH_LCPA_ROUTE_CACHE, max_bytes: int = Config.LCPA_ROUTE_CACHE_MAX_BYTES
+    ):
+        self.path_cache = path_cache
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.path_cache.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS routes (key TEXT PRIMARY KEY, route BLOB, leg_results TEXT, size INTEGER, "
+                "last_used INTEGER)"
+            )
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Connection to the cache which commits the changes on success."""
+        with contextlib.closing(sqlite3.connect(self.path_cache)) as connection:
+            with connection:
+                yield connection
+
+    def get(self, key: str) -> CachedRoute | None:
+        """Return the cached route of the key and mark it as most recently used, or None when it is not cached."""
+        with self.connect() as connection:
+            row = connection.execute("SELECT route, leg_results FROM routes WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE routes SET last_used = (SELECT MAX(last_used) + 1 FROM routes) WHERE key = ?", (key,)
+                )
+        if row is None:
+            self.misses += 1
+            logger.info(f"Route cache miss, {self.hits} hits and {self.misses} misses.")
+            return None
+
+        self.hits += 1
+        logger.info(f"Route cache hit, {self.hits} hits and {self.misses} misses.")
+        route, leg_results = row
+        return CachedRoute(
+            shapely.from_wkb(route),
+            [
+                LcpaLegResult([tuple(index) for index in leg_result["indices"]], leg_result["cost"], 0)
+                for leg_result in json.loads(leg_results)
+            ],
+        )
+
+    def put(self, key: str, cached_route: CachedRoute):
+        """Store the route as most recently used and evict the least recently used routes exceeding max_bytes."""
+        route = shapely.to_wkb(cached_route.route)
+        leg_results = json.dumps(
+            [
+                {
+                    "indices": [[int(index) for index in indices] for indices in leg_result.indices],
+                    "cost": float(leg_result.cost),
+                }
+                for leg_result in cached_route.leg_results
+            ]
+        )
+        size = len(route) + len(leg_results)
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO routes "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(last_used), 0) + 1 FROM routes))",
+                (key, route, leg_results, size),
+            )
+            cached_keys = connection.execute("SELECT key, size FROM routes ORDER BY last_used DESC").fetchall()
+            # Keep the most recently used routes which fit within max_bytes together.
+            total_sizes = np.cumsum([cached_size for _, cached_size in cached_keys])
+            evicted_keys = [
+                (cached_key,)
+                for (cached_key, _), total_size in zip(cached_keys, total_sizes)
+                if total_size > self.max_bytes
+            ]
+            connection.executemany("DELETE FROM routes WHERE key = ?", evicted_keys)
+        if evicted_keys:
+            self.evictions += len(evicted_keys)
+            logger.info(f"Evicted {len(evicted_keys)} routes from the route cache.")
@@ -0,0 +1,325 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Callable
+
+import numpy as np
+import structlog
+from skimage.graph import MCP_Geometric
+
+from utility_route_planner.models.lcpa.lcpa_datastructures import LcpaLegResult
+
+logger = structlog.get_logger(__name__)
+
+# Row and column offsets of the 8 neighbours of a cell, the index in this array is stored as predecessor direction.
+NEIGHBOUR_OFFSETS = np.array([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# Half of the distance to each neighbour, the cost of a step is the mean of both cells times the distance.
+NEIGHBOUR_HALF_LENGTHS = np.sqrt((NEIGHBOUR_OFFSETS**2).sum(axis=1)) / 2
+NEIGHBOUR_DIRECTIONS = np.arange(len(NEIGHBOUR_OFFSETS), dtype="uint8")
+NO_PREDECESSOR = 255
+
+
+def find_mcp_least_cost_path(mcp: MCP_Geometric, start: tuple, end: tuple) -> LcpaLegResult:
+    """
+    Least cost path using skimage, equal to route_through_array with geometric=True and fully_connected=True but
+    reusing the given graph. The expanded nodes are estimated as the cells reached by the search.
+    """
+    cumulative_costs, _ = mcp.find_costs([start], [end])
+    return LcpaLegResult(mcp.traceback(end), float(cumulative_costs[end]), int(np.isfinite(cumulative_costs).sum()))
+
+
+def find_least_cost_path_to_nearest_target(
+    costs: np.ndarray, sources: list[tuple[int, int]], targets: list[tuple[int, int]]
+) -> tuple[LcpaLegResult, int]:
+    """
+    Least cost path from any of the sources to the nearest of the targets in a single multi-source search of skimage,
+    which stops as soon as the first target is settled. This replaces a search per combination of source and target.
+
+    :param costs: 2d array with the cost of each cell, negative cells are not traversable.
+    :param sources: row and column indices of the source cells.
+    :param targets: row and column indices of the target cells.
+    :return: the least cost path from the nearest source to the nearest target and the index of the reached target.
+    """
+    mcp = MCP_Geometric(costs, fully_connected=True)
+    cumulative_costs, _ = mcp.find_costs(sources, targets, find_all_ends=False)
+    # Other targets may have been reached as well, the settled target is the one with the lowest cost.
+    target_costs = cumulative_costs[tuple(np.array(targets).T)]
+    nearest_target = int(np.argmin(target_costs))
+    if not np.isfinite(target_costs[nearest_target]):
+        raise ValueError("No minimum-cost path was found to any of the targets.")
+
+    leg_result = LcpaLegResult(
+        mcp.traceback(targets[nearest_target]),
+        float(target_costs[nearest_target]),
+        int(np.isfinite(cumulative_costs).sum()),
+    )
+    return leg_result, nearest_target
+
+
+def find_skimage_least_cost_path(costs: np.ndarray, start: tuple, end: tuple) -> LcpaLegResult:
+    """Least cost path using a new skimage graph, use find_mcp_least_cost_path to reuse it for multiple legs."""
+    return find_mcp_least_cost_path(MCP_Geometric(costs, fully_connected=True), start, end)
+
+
+def find_compact_least_cost_path(
+    costs: np.ndarray, start: tuple[int, int], end: tuple[int, int], bucket_width: float | None = None
+) -> LcpaLegResult:
+    """
+    Memory-compact alternative to skimage.graph.route_through_array with geometric=True and fully_connected=True.
+
+    The costs are used in their native dtype (int8 for the suitability raster), the cumulative costs are stored as
+    float32 and the predecessor of each cell as the uint8 index of the neighbour direction. This takes about 6 bytes
+    per cell instead of the ~70 bytes per cell of route_through_array. The cost of the route is recomputed in float64
+    along the traced path, such that it does not include the rounding of the float32 cumulative costs. In case of
+    (nearly) equal costs a different route of the same cost can be returned.
+    """
+    leg_result = find_least_cost_path(costs, start, end, bucket_width, cumulative_cost_dtype="float32")
+    leg_result.cost = compute_path_cost(costs, leg_result.indices)
+    return leg_result
+
+
+def find_astar_least_cost_path(
+    costs: np.ndarray, start: tuple[int, int], end: tuple[int, int], bucket_width: float | None = None
+) -> LcpaLegResult:
+    """
+    A* alternative to skimage.graph.route_through_array with geometric=True and fully_connected=True.
+
+    The octile distance to the end times the lowest cost of a traversable cell is a lower bound of the remaining
+    cost, such that the search is directed towards the end and cells away from the end are not expanded. The pruning
+    is therefore largest when most costs are close to the lowest cost. The cumulative costs are float64, the cost of
+    the route equals the cost of route_through_array. The bucket_width defaults to the maximum cost, a narrower bucket
+    than the Dijkstra default to limit the cells which are expanded before the end is reached.
+    """
+    traversable_costs = costs[costs >= 0]
+    minimum_cost = float(traversable_costs.min()) if traversable_costs.size > 0 else 0.0
+    if bucket_width is None:
+        bucket_width = max(float(costs.max()), 1.0)
+    return find_least_cost_path(costs, start, end, bucket_width, heuristic_cost=minimum_cost)
+
+
+def find_least_cost_path(
+    costs: np.ndarray,
+    start: tuple[int, int],
+    end: tuple[int, int],
+    bucket_width: float | None = None,
+    heuristic_cost: float = 0.0,
+    cumulative_cost_dtype: str = "float64",
+    lower_bound: Callable[[np.ndarray], np.ndarray] | None = None,
+) -> LcpaLegResult:
+    """
+    Least cost path on the 8-connected raster, the cost of a step is the mean cost of both cells times the distance.
+    Cells with a negative cost are not traversable, except for the start cell.
+
+    The search is a vectorized label-correcting Dijkstra: all pending cells within bucket_width of the lowest priority
+    are expanded at once. The priority is the cumulative cost plus the octile distance to the end times the
+    heuristic_cost, which is A* when heuristic_cost is positive. The search stops as soon as the end cell cannot be
+    improved anymore. The cumulative costs are stored as cumulative_cost_dtype and the predecessor of each cell as the
+    uint8 index of the neighbour direction.
+
+    :param costs: 2d array with the cost of each cell.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :param bucket_width: priority range which is expanded per iteration, defaults to 4 times the maximum cost.
+    :param heuristic_cost: lower bound of the cost per unit of distance, 0 disables the heuristic.
+    :param cumulative_cost_dtype: dtype of the cumulative costs, float32 halves the memory at the cost of precision.
+    :param lower_bound: lower bound of the remaining cost to the end from each of the given flat indices of cells,
+        used instead of the heuristic_cost bound where it is higher, see find_alt_least_cost_path.
+    :return: row and column indices of the least cost path from start to end, its cost and the expanded nodes.
+    """
+    height, width = costs.shape
+    flat_costs = costs.reshape(-1)
+    flat_offsets = NEIGHBOUR_OFFSETS[:, 0] * width + NEIGHBOUR_OFFSETS[:, 1]
+    half_lengths = NEIGHBOUR_HALF_LENGTHS.astype(cumulative_cost_dtype)
+    if bucket_width is None:
+        bucket_width = 4 * max(float(flat_costs.max()), 1.0)
+
+    start_index = to_flat_index(start, height, width)
+    end_index = to_flat_index(end, height, width)
+    end_row, end_column = divmod(end_index, width)
+    cumulative_costs = np.full(height * width, np.inf, dtype=cumulative_cost_dtype)
+    predecessors = np.full(height * width, NO_PREDECESSOR, dtype="uint8")
+    is_pending = np.zeros(height * width, dtype=bool)
+    cumulative_costs[start_index] = 0
+    pending = np.array([start_index], dtype="int64")
+    is_pending[start_index] = True
+    expanded_nodes = 0
+    use_heuristic = heuristic_cost > 0 or lower_bound is not None
+    if use_heuristic:
+        # The heuristic of a cell does not change, it is computed once when the cell first becomes pending.
+        remaining_costs = np.full(height * width, np.nan, dtype="float64")
+
+    while pending.size > 0:
+        pending_priorities = cumulative_costs[pending]
+        if use_heuristic:
+            is_new = np.isnan(remaining_costs[pending])
+            if is_new.any():
+                new_cells = pending[is_new]
+                # Slightly reduce the heuristic such that rounding cannot make it exceed the actual remaining cost.
+                new_remaining_costs = (
+                    heuristic_cost * (1 - 1e-9) * octile_distance(new_cells, width, end_row, end_column)
+                )
+                if lower_bound is not None:
+                    new_remaining_costs = np.maximum(new_remaining_costs, lower_bound(new_cells))
+                remaining_costs[new_cells] = new_remaining_costs
+            pending_priorities = pending_priorities + remaining_costs[pending]
+        lowest_priority = pending_priorities.min()
+        if lowest_priority >= cumulative_costs[end_index]:
+            break
+        is_active = pending_priorities < lowest_priority + bucket_width
+        active, pending = pending[is_active], pending[~is_active]
+        is_pending[active] = False
+        expanded_nodes += active.size
+
+        neighbours = relax_neighbours(
+            active, flat_costs, cumulative_costs, predecessors, flat_offsets, half_lengths, width
+        )
+        neighbours = np.unique(neighbours[~is_pending[neighbours]])
+        is_pending[neighbours] = True
+        pending = np.concatenate((pending, neighbours))
+
+    if not np.isfinite(cumulative_costs[end_index]):
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    path = trace_back_path(predecessors, flat_offsets, start_index, end_index, width)
+    return LcpaLegResult(path, float(cumulative_costs[end_index]), expanded_nodes)
+
+
+def find_bucket_least_cost_path(costs: np.ndarray, start: tuple[int, int], end: tuple[int, int]) -> LcpaLegResult:
+    """
+    Bucket queue (Dial's algorithm) alternative to skimage.graph.route_through_array with geometric=True and
+    fully_connected=True, returning a route of the same cost.
+
+    Instead of popping one cell at a time from a binary heap, all pending cells of the lowest bucket are expanded at
+    once. As the costs are bounded below, a step towards a cell costs at least half of the lowest cost plus the cost
+    of that cell. The bucket of a cell therefore ranges from the lowest pending cumulative cost up to that bound: no
+    other pending cell can reach it cheaper, its cumulative cost is final and every cell is expanded only once. The
+    bucket is widest for the high cost cells, which make up most of the suitability raster. The cumulative costs are
+    float64 and the predecessor of each cell is the uint8 index of the neighbour direction, about 10 bytes per cell.
+
+    :param costs: 2d array with the cost of each cell, cells with a negative cost are not traversable.
+    :param start: row and column index of the start cell.
+    :param end: row and column index of the end cell.
+    :return: row and column indices of the least cost path from start to end, its cost and the expanded nodes.
+    """
+    height, width = costs.shape
+    flat_costs = costs.reshape(-1)
+    flat_offsets = NEIGHBOUR_OFFSETS[:, 0] * width + NEIGHBOUR_OFFSETS[:, 1]
+    traversable_costs = flat_costs[flat_costs >= 0]
+    minimum_cost = float(traversable_costs.min()) if traversable_costs.size > 0 else 0.0
+
+    start_index = to_flat_index(start, height, width)
+    end_index = to_flat_index(end, height, width)
+    cumulative_costs = np.full(height * width, np.inf, dtype="float64")
+    predecessors = np.full(height * width, NO_PREDECESSOR, dtype="uint8")
+    is_pending = np.zeros(height * width, dtype=bool)
+    cumulative_costs[start_index] = 0
+    pending = np.array([start_index], dtype="int64")
+    is_pending[start_index] = True
+    expanded_nodes = 0
+
+    while pending.size > 0:
+        pending_costs = cumulative_costs[pending]
+        lowest_cost = pending_costs.min()
+        if lowest_cost >= cumulative_costs[end_index]:
+            break
+        # The start of a route may be no data, its cost is raised to the lowest cost such that it is expanded.
+        is_active = pending_costs <= lowest_cost + 0.5 * (minimum_cost + np.maximum(flat_costs[pending], minimum_cost))
+        active, pending = pending[is_active], pending[~is_active]
+        is_pending[active] = False
+        expanded_nodes += active.size
+
+        neighbours = relax_neighbours(
+            active, flat_costs, cumulative_costs, predecessors, flat_offsets, NEIGHBOUR_HALF_LENGTHS, width
+        )
+        neighbours = np.unique(neighbours[~is_pending[neighbours]])
+        is_pending[neighbours] = True
+        pending = np.concatenate((pending, neighbours))
+
+    if not np.isfinite(cumulative_costs[end_index]):
+        raise ValueError("No minimum-cost path was found to the specified end point.")
+
+    path = trace_back_path(predecessors, flat_offsets, start_index, end_index, width)
+    return LcpaLegResult(path, float(cumulative_costs[end_index]), expanded_nodes)
+
+
+def relax_neighbours(
+    active: np.ndarray,
+    flat_costs: np.ndarray,
+    cumulative_costs: np.ndarray,
+    predecessors: np.ndarray,
+    flat_offsets: np.ndarray,
+    half_lengths: np.ndarray,
+    width: int,
+) -> np.ndarray:
+    """
+    Relax all neighbours of the active cells at once, skipping neighbours outside the raster or without data. The
+    cumulative costs and predecessors are updated in place.
+
+    :return: flat indices of the improved neighbours, a neighbour of multiple active cells can be present repeatedly.
+    """
+    height = flat_costs.size // width
+    rows, columns = np.divmod(active, width)
+    neighbour_rows = rows[:, None] + NEIGHBOUR_OFFSETS[:, 0]
+    neighbour_columns = columns[:, None] + NEIGHBOUR_OFFSETS[:, 1]
+    is_inside = (neighbour_rows >= 0) & (neighbour_rows < height) & (neighbour_columns >= 0)
+    is_inside &= neighbour_columns < width
+    neighbours = (active[:, None] + flat_offsets)[is_inside]
+    sources = np.broadcast_to(active[:, None], is_inside.shape)[is_inside]
+    neighbour_directions = np.broadcast_to(NEIGHBOUR_DIRECTIONS, is_inside.shape)[is_inside]
+    neighbour_costs = flat_costs[neighbours]
+    is_traversable = neighbour_costs >= 0
+    neighbours, sources = neighbours[is_traversable], sources[is_traversable]
+    neighbour_directions = neighbour_directions[is_traversable]
+
+    step_costs = flat_costs[sources].astype(cumulative_costs.dtype) + neighbour_costs[is_traversable].astype(
+        cumulative_costs.dtype
+    )
+    candidate_costs = cumulative_costs[sources] + half_lengths[neighbour_directions] * step_costs
+    is_improved = candidate_costs < cumulative_costs[neighbours]
+    neighbours, candidate_costs = neighbours[is_improved], candidate_costs[is_improved]
+    neighbour_directions = neighbour_directions[is_improved]
+
+    # A cell can be improved by multiple active cells, keep the lowest cost and its direction.
+    np.minimum.at(cumulative_costs, neighbours, candidate_costs)
+    is_lowest = candidate_costs == cumulative_costs[neighbours]
+    predecessors[neighbours[is_lowest]] = neighbour_directions[is_lowest]
+    return neighbours
+
+
+def octile_distance(flat_indices: np.ndarray, width: int, end_row: int, end_column: int) -> np.ndarray:
+    """Length of the shortest 8-connected path without obstacles from the cells to the end, in number of cells."""
+    rows, columns = np.divmod(flat_indices, width)
+    row_distance, column_distance = np.abs(rows - end_row), np.abs(columns - end_column)
+    diagonal_steps = np.minimum(row_distance, column_distance)
+    return np.maximum(row_distance, column_distance) + (np.sqrt(2) - 1) * diagonal_steps
+
+
+def compute_path_cost(costs: np.ndarray, path: list[tuple[int, int]]) -> float:
+    """Cost of the path in float64, the cost of a step is the mean cost of both cells times the distance."""
+    indices = np.asarray(path)
+    path_costs = costs[indices[:, 0], indices[:, 1]].astype("float64")
+    step_lengths = np.sqrt((np.diff(indices, axis=0) ** 2).sum(axis=1))
+    return float((step_lengths * 0.5 * (path_costs[:-1] + path_costs[1:])).sum())
+
+
+def to_flat_index(index: tuple[int, int], height: int, width: int) -> int:
+    """Convert a row and column index to an index in the flattened raster, negative indices count from the end."""
+    row, column = index
+    if not (-height <= row < height and -width <= column < width):
+        raise ValueError("End points must all be within the costs array.")
+    return (row % height) * width + column % width
+
+
+def trace_back_path(
+    predecessors: np.ndarray, flat_offsets: np.ndarray, start_index: int, end_index: int, width: int
+) -> list[tuple[int, int]]:
+    """Follow the predecessor directions from the end back to the start, returning the path from start to end."""
+    path = []
+    index = end_index
+    while index != start_index:
+        path.append(divmod(int(index), width))
+        index -= flat_offsets[predecessors[index]]
+    path.append(divmod(int(start_index), width))
+    path.reverse()
+    return path
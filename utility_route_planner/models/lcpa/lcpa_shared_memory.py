@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import structlog
+from skimage.graph import MCP_Geometric
+
+from utility_route_planner.models.lcpa.lcpa_datastructures import LcpaLegResult
+from utility_route_planner.models.lcpa.lcpa_quadtree import build_quadtree_graph, find_quadtree_graph_least_cost_path
+from utility_route_planner.models.lcpa.lcpa_search import (
+    find_astar_least_cost_path,
+    find_bucket_least_cost_path,
+    find_compact_least_cost_path,
+    find_mcp_least_cost_path,
+)
+
+logger = structlog.get_logger(__name__)
+
+# State of a worker process, filled once by init_worker and reused for every leg submitted to that worker.
+_worker_state: dict = {}
+
+
+@dataclass
+class SharedCostArrayDescription:
+    """Picklable description of the shared memory segment holding the suitability raster."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+class SharedCostArray:
+    """
+    Copies the suitability raster once to shared memory, such that the workers solving the legs of a route do not each
+    receive a copy. Use as context manager such that the shared memory is always released.
+    """
+
+    def __init__(self, suit_raster_array: np.ndarray):
+        self.shared_memory = SharedMemory(create=True, size=max(suit_raster_array.nbytes, 1))
+        np.ndarray(suit_raster_array.shape, dtype=suit_raster_array.dtype, buffer=self.shared_memory.buf)[:] = (
+            suit_raster_array
+        )
+        self.description = SharedCostArrayDescription(
+            self.shared_memory.name, suit_raster_array.shape, suit_raster_array.dtype.str
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+def init_worker(description: SharedCostArrayDescription, search_method: str):
+    """Initializer of a worker process, attaches to the shared suitability raster without copying it."""
+    shared_memory = SharedMemory(name=description.name)
+    # Keep a reference to the shared memory, the array is a view on its buffer for the lifetime of the worker.
+    _worker_state["shared_memory"] = shared_memory
+    _worker_state["suit_raster_array"] = np.ndarray(
+        description.shape, dtype=description.dtype, buffer=shared_memory.buf
+    )
+    _worker_state["search_method"] = search_method
+    _worker_state["mcp"] = None
+    _worker_state["quadtree_graph"] = None
+
+
+def compute_leg_in_worker(start: tuple, end: tuple) -> LcpaLegResult:
+    """Compute the least cost path of a single leg using the suitability raster attached by init_worker."""
+    suit_raster_array = _worker_state["suit_raster_array"]
+    match _worker_state["search_method"]:
+        case "compact":
+            return find_compact_least_cost_path(suit_raster_array, start, end)
+        case "astar":
+            return find_astar_least_cost_path(suit_raster_array, start, end)
+        case "bucket":
+            return find_bucket_least_cost_path(suit_raster_array, start, end)
+        case "quadtree":
+            if _worker_state["quadtree_graph"] is None:
+                _worker_state["quadtree_graph"] = build_quadtree_graph(suit_raster_array)
+            return find_quadtree_graph_least_cost_path(_worker_state["quadtree_graph"], start, end)
+
+    # The graph is built once per worker and reused when the worker solves multiple legs.
+    if _worker_state["mcp"] is None:
+        _worker_state["mcp"] = MCP_Geometric(suit_raster_array, fully_connected=True)
+    return find_mcp_least_cost_path(_worker_state["mcp"], start, end)
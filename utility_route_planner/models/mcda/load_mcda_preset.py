@@ -35,6 +35,10 @@ class RasterPresetCriteria(pydantic.BaseModel):
         default=None,
         description="Contains values for optional computational geometry steps, e.g., buffer.",
     )
+    buffer_in_raster_space: bool = pydantic.Field(
+        default=False,
+        description="Buffer the geometries by dilating them after rasterizing instead of buffering them as vector.",
+    )
 
     @model_validator(mode="after")
     def validate_attributes(self):
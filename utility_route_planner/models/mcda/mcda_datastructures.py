@@ -5,6 +5,7 @@
 from dataclasses import dataclass
 
 import numpy as np
+import shapely
 from affine import Affine
 from pyproj import CRS
 from rasterio.windows import Window
@@ -31,9 +32,63 @@ class RasterizedCriterion:
     criterion: str
     raster: np.ndarray
     group: str
+    # Pixel window of the block covered by the raster, None when the raster covers the complete block.
+    window: Window | None = None
+
+
+@dataclass
+class PreparedCriterion:
+    """
+    Processed vector of a criterion, prepared once for rasterizing it in every block: the geometries are sorted on
+    ascending suitability value such that the highest value is burned last, and the values are int16 within the
+    intermediate raster limits.
+    """
+
+    criterion: str
+    group: str
+    geometries: np.ndarray
+    suitability_values: np.ndarray
+    # Distance by which each geometry is dilated after rasterizing, None when no geometry is buffered in raster space.
+    buffer_distances: np.ndarray | None = None
+    # Spatial index of the geometries to select the geometries of a block, None for the selection of a block.
+    tree: shapely.STRtree | None = None
 
 
 @dataclass
 class RasterBlock:
     array: np.ma.MaskedArray
     window: Window
+
+
+@dataclass
+class RasterBlockResult:
+    block_id: int
+    bbox: list[float]
+    path: str | None = None
+    array: np.ndarray | None = None
+
+
+@dataclass
+class CostSurface:
+    """
+    Suitability raster held in memory, such that LCPA and the route evaluation do not have to decode it from disk.
+    The path is only set when the raster is written to disk as well.
+    """
+
+    array: np.ndarray
+    transform: Affine
+    nodata: int = Config.FINAL_RASTER_NO_DATA
+    crs: CRS = CRS.from_epsg(code=Config.CRS)
+    path: str | None = None
+
+    @property
+    def height(self) -> int:
+        return self.array.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.array.shape[1]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.height, self.width
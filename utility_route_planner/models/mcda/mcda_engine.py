@@ -9,7 +9,6 @@ from functools import cached_property
 
 import shapely
 
-from utility_route_planner.models.mcda.mcda_datastructures import McdaRasterSettings, RasterizedCriterion
 from utility_route_planner.models.mcda.mcda_utils import create_project_area_grid
 from utility_route_planner.models.mcda.vrt_builder import VRTBuilder
 from settings import Config
@@ -18,12 +17,20 @@ from utility_route_planner.models.mcda.load_mcda_preset import RasterPreset, loa
 import structlog
 import geopandas as gpd
 
+from utility_route_planner.models.mcda.exceptions import InvalidSuitabilityRasterInput
+from utility_route_planner.models.mcda.mcda_datastructures import CostSurface, PreparedCriterion, RasterBlockResult
 from utility_route_planner.models.mcda.mcda_rasterizing import (
-    rasterize_vector_data,
     get_raster_settings,
-    merge_criteria_rasters,
-    write_raster_block,
-    clip_raster_mask_to_project_area,
+    compute_and_write_raster_block,
+    get_buffer_distances,
+    mosaic_raster_blocks,
+    prepare_criterion,
+    select_block_features,
+)
+from utility_route_planner.models.mcda.mcda_shared_memory import (
+    SharedCriteria,
+    init_worker,
+    compute_raster_block_in_worker,
 )
 from utility_route_planner.util.timer import time_function
 
@@ -57,16 +64,45 @@ class McdaCostSurfaceEngine:
     def number_of_criteria_to_rasterize(self):
         return len(self.processed_vectors)
 
+    @cached_property
+    def max_geometry_buffer(self) -> float:
+        """Largest buffer distance in the geometry values of the criteria in the preset."""
+        buffer_distances = [
+            value
+            for criterion_settings in self.raster_preset.criteria.values()
+            for value in (criterion_settings.geometry_values or {}).values()
+            if isinstance(value, int | float)
+        ]
+        return max(buffer_distances, default=0)
+
+    @property
+    def criteria_groups(self) -> dict[str, str]:
+        return {
+            criterion: criterion_settings.group for criterion, criterion_settings in self.raster_preset.criteria.items()
+        }
+
+    @property
+    def raster_name(self) -> str:
+        return f"{self.raster_name_prefix}{self.raster_preset.general.final_raster_name}"
+
     @time_function
-    def preprocess_vectors(self):
+    def preprocess_vectors(self, run_in_parallel: bool = False, max_workers: int | None = None):
+        """
+        Preprocess the vectors of all criteria in the raster preset.
+
+        :param run_in_parallel: preprocess the criteria concurrently using a process pool. Results are collected in the
+            order of the preset and the debug output is written sequentially by this process.
+        :param max_workers: maximum number of worker processes, defaults to the number of processors.
+        """
         logger.info(
             f"Processing {self.number_of_criteria} criteria using geopackage: {self.raster_preset.general.path_input_geopackage}"
         )
-        for idx, criterion in enumerate(self.raster_preset.criteria):
-            logger.info(f"Processing criteria number {idx + 1} of {self.number_of_criteria}.")
-            is_processed, processed_gdf = self.raster_preset.criteria[criterion].preprocessing_function.execute(
-                self.raster_preset.general, self.raster_preset.criteria[criterion]
-            )
+        if run_in_parallel:
+            processed_criteria = self.preprocess_criteria_in_parallel(max_workers)
+        else:
+            processed_criteria = self.preprocess_criteria_sequentially()
+
+        for criterion, (is_processed, processed_gdf) in processed_criteria.items():
             if is_processed:
                 self.processed_vectors[criterion] = processed_gdf
             else:
@@ -77,6 +113,45 @@ class McdaCostSurfaceEngine:
             set(self.unprocessed_criteria_names)
         )
 
+    def preprocess_criteria_sequentially(self) -> dict[str, tuple[bool, gpd.GeoDataFrame]]:
+        processed_criteria = {}
+        for idx, criterion in enumerate(self.raster_preset.criteria):
+            logger.info(f"Processing criteria number {idx + 1} of {self.number_of_criteria}.")
+            processed_criteria[criterion] = self.raster_preset.criteria[criterion].preprocessing_function.execute(
+                self.raster_preset.general, self.raster_preset.criteria[criterion]
+            )
+        return processed_criteria
+
+    def preprocess_criteria_in_parallel(
+        self, max_workers: int | None = None
+    ) -> dict[str, tuple[bool, gpd.GeoDataFrame]]:
+        """
+        Each criterion reads its own layers and is independent of the others, execute them concurrently. Writing the
+        debug output is skipped in the workers and done afterward in preset order, as concurrent writers would corrupt
+        the geopackage.
+        """
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                criterion: executor.submit(
+                    criterion_settings.preprocessing_function.execute,
+                    self.raster_preset.general,
+                    criterion_settings,
+                    write_to_file=False,
+                )
+                for criterion, criterion_settings in self.raster_preset.criteria.items()
+            }
+            processed_criteria = {}
+            for idx, (criterion, future) in enumerate(futures.items()):
+                logger.info(f"Processed criteria number {idx + 1} of {self.number_of_criteria}.")
+                processed_criteria[criterion] = future.result()
+
+        for criterion, (is_processed, processed_gdf) in processed_criteria.items():
+            if is_processed:
+                self.raster_preset.criteria[criterion].preprocessing_function.write_to_file(
+                    self.raster_preset.general.prefix, processed_gdf
+                )
+        return processed_criteria
+
     @time_function
     def preprocess_rasters(
         self,
@@ -84,21 +159,180 @@ class McdaCostSurfaceEngine:
         cell_size: float,
         max_block_size: int,
         run_in_parallel: bool,
-    ) -> str:
+        partition_vectors: bool = True,
+        use_shared_memory: bool = False,
+        in_memory: bool = False,
+        write_to_file: bool = True,
+    ) -> str | CostSurface:
+        """
+        Rasterize the processed vectors per block of the project area grid.
+
+        :param vector_to_convert: processed vector of each criterion.
+        :param cell_size: raster cell size in meters.
+        :param max_block_size: maximum size of a block in the project area grid in meters.
+        :param run_in_parallel: rasterize the blocks concurrently using a process pool.
+        :param partition_vectors: pass only the features intersecting a block to the rasterizing of the block, instead
+            of all features of every criterion.
+        :param use_shared_memory: share the processed vectors with the worker processes through shared memory once,
+            instead of pickling the features of every block. Only used when running in parallel.
+        :param in_memory: return the suitability raster as cost surface in memory instead of the path to the vrt.
+        :param write_to_file: write the blocks and the vrt to disk, optional when the raster is returned in memory.
+        :return: path to the vrt of the suitability raster, or the cost surface when in_memory is set.
+        """
+        self.validate_raster_output(in_memory, write_to_file)
         logger.info(f"Starting rasterizing for {self.number_of_criteria_to_rasterize} criteria.")
         min_x, min_y, max_x, max_y = self.project_area_geometry.bounds
         self.project_area_grid = create_project_area_grid(min_x, min_y, max_x, max_y, max_block_size)
-        self.assign_vector_groups_to_grid()
         block_ids = list(self.project_area_grid.index)
 
         logger.info(f"Rasterizing vector using {len(block_ids)} blocks")
+        if run_in_parallel and use_shared_memory:
+            rasters = self.compute_raster_blocks_in_parallel_using_shared_memory(
+                block_ids, vector_to_convert, cell_size, write_to_file, in_memory
+            )
+        elif run_in_parallel:
+            rasters = self.compute_raster_blocks_in_parallel(
+                block_ids,
+                self.prepare_criteria(vector_to_convert),
+                cell_size,
+                partition_vectors,
+                write_to_file,
+                in_memory,
+            )
+        else:
+            rasters = self.compute_raster_blocks_sequentially(
+                block_ids,
+                self.prepare_criteria(vector_to_convert),
+                cell_size,
+                partition_vectors,
+                write_to_file,
+                in_memory,
+            )
+
+        return self.get_suitability_raster(rasters, cell_size, in_memory, write_to_file)
+
+    @time_function
+    def preprocess_and_rasterize_per_block(
+        self,
+        cell_size: float,
+        max_block_size: int,
+        run_in_parallel: bool,
+        max_workers: int | None = None,
+        in_memory: bool = False,
+        write_to_file: bool = True,
+    ) -> str | CostSurface:
+        """
+        Alternative to preprocess_vectors followed by preprocess_rasters, fusing reading, preprocessing and rasterizing
+        per block of the project area grid. Only the features intersecting a block, extended by a margin covering the
+        largest geometry buffer of the preset, are read and processed. Peak memory is bounded by the block size instead
+        of the project area size, and reading the geopackage is done in parallel together with rasterizing.
+
+        Debug output of the processed vectors is not written to the geopackage in this mode.
+
+        :param cell_size: raster cell size in meters.
+        :param max_block_size: maximum size of a block in the project area grid in meters.
+        :param run_in_parallel: process the blocks concurrently using a process pool.
+        :param max_workers: maximum number of worker processes, defaults to the number of processors.
+        :param in_memory: return the suitability raster as cost surface in memory instead of the path to the vrt.
+        :param write_to_file: write the blocks and the vrt to disk, optional when the raster is returned in memory.
+        :return: path to the vrt of the suitability raster, or the cost surface when in_memory is set.
+        """
+        self.validate_raster_output(in_memory, write_to_file)
+        min_x, min_y, max_x, max_y = self.project_area_geometry.bounds
+        self.project_area_grid = create_project_area_grid(min_x, min_y, max_x, max_y, max_block_size)
+        block_ids = list(self.project_area_grid.index)
+        margin = self.max_geometry_buffer + cell_size
+
+        logger.info(f"Processing {self.number_of_criteria} criteria per block using {len(block_ids)} blocks.")
         if run_in_parallel:
-            rasters = self.compute_raster_blocks_in_parallel(block_ids, vector_to_convert, cell_size)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self.preprocess_and_rasterize_block, block_id, cell_size, margin, write_to_file, in_memory
+                    )
+                    for block_id in block_ids
+                ]
+                results = [future.result() for future in as_completed(futures)]
         else:
-            rasters = self.compute_raster_blocks_sequentially(block_ids, vector_to_convert, cell_size)
+            results = [
+                self.preprocess_and_rasterize_block(block_id, cell_size, margin, write_to_file, in_memory)
+                for block_id in block_ids
+            ]
 
-        block_paths, block_bboxes = zip(*rasters)
-        vrt_path = Config.PATH_RESULTS / f"{self.raster_name_prefix}{self.raster_preset.general.final_raster_name}.vrt"
+        rasters, processed_criteria_names_per_block = zip(*results)
+        self.processed_criteria_names = set().union(*processed_criteria_names_per_block)
+        self.unprocessed_criteria_names = set(self.raster_preset.criteria.keys()).difference(
+            self.processed_criteria_names
+        )
+        return self.get_suitability_raster(list(rasters), cell_size, in_memory, write_to_file)
+
+    def preprocess_and_rasterize_block(
+        self,
+        block_id: int,
+        cell_size: float,
+        margin: float,
+        write_to_file: bool = True,
+        keep_in_memory: bool = False,
+    ) -> tuple[RasterBlockResult, set[str]]:
+        """
+        Read, preprocess and rasterize all criteria for a single block of the project area grid.
+
+        :return: the rasterized block and the names of the criteria with data in the block.
+        """
+        block_geometry = self.project_area_grid.iloc[block_id].values[0]
+        block_min_x, block_min_y, block_max_x, block_max_y = block_geometry.bounds
+        bbox = (block_min_x - margin, block_min_y - margin, block_max_x + margin, block_max_y + margin)
+
+        vector_to_convert, processed_criteria_names = {}, set()
+        for criterion, criterion_settings in self.raster_preset.criteria.items():
+            is_processed, processed_gdf = criterion_settings.preprocessing_function.execute(
+                self.raster_preset.general, criterion_settings, write_to_file=False, bbox=bbox
+            )
+            if is_processed:
+                processed_criteria_names.add(criterion)
+            else:
+                # Rasterize as no data such that the block is valid, even if there is no data at all in the block.
+                processed_gdf = gpd.GeoDataFrame({"suitability_value": []}, geometry=[], crs=Config.CRS)
+            vector_to_convert[criterion] = processed_gdf
+
+        raster = compute_and_write_raster_block(
+            block_id,
+            block_geometry,
+            vector_to_convert,
+            self.criteria_groups,
+            self.project_area_geometry,
+            cell_size,
+            self.raster_name,
+            write_to_file,
+            keep_in_memory,
+        )
+        return raster, processed_criteria_names
+
+    @staticmethod
+    def validate_raster_output(in_memory: bool, write_to_file: bool):
+        if not in_memory and not write_to_file:
+            raise InvalidSuitabilityRasterInput(
+                "The suitability raster must be written to file, kept in memory or both."
+            )
+
+    def get_suitability_raster(
+        self, rasters: list[RasterBlockResult], cell_size: float, in_memory: bool, write_to_file: bool
+    ) -> str | CostSurface:
+        """
+        Combine the raster blocks to the suitability raster. When in_memory is set, the blocks are mosaicked to a cost
+        surface which can be passed directly to LCPA and the route evaluation, saving a decode of the vrt each time.
+        """
+        path_vrt = self.write_vrt(rasters) if write_to_file else None
+        if not in_memory and path_vrt is not None:
+            return path_vrt
+        cost_surface = mosaic_raster_blocks(rasters, cell_size)
+        cost_surface.path = path_vrt
+        logger.info(f"Created cost surface in memory with shape {cost_surface.shape}.")
+        return cost_surface
+
+    def write_vrt(self, rasters: list[RasterBlockResult]) -> str:
+        block_paths, block_bboxes = zip(*[(raster.path, raster.bbox) for raster in rasters])
+        vrt_path = Config.PATH_RESULTS / f"{self.raster_name}.vrt"
         raster_settings = get_raster_settings(self.project_area_geometry)
 
         vrt_builder = VRTBuilder(
@@ -114,61 +348,146 @@ class McdaCostSurfaceEngine:
     def compute_raster_blocks_sequentially(
         self,
         block_ids: list[int],
-        vector_to_convert: dict[str, gpd.GeoDataFrame],
+        prepared_criteria: dict[str, PreparedCriterion],
         cell_size: float = Config.RASTER_CELL_SIZE,
-    ) -> list[tuple[str, list[float]]]:
-        rasters = [self.compute_and_write_raster(block_id, cell_size, vector_to_convert) for block_id in block_ids]
+        partition_vectors: bool = True,
+        write_to_file: bool = True,
+        keep_in_memory: bool = False,
+    ) -> list[RasterBlockResult]:
+        rasters = [
+            self.compute_and_write_raster(
+                block_id,
+                cell_size,
+                self.get_prepared_criteria_for_block(block_id, prepared_criteria, cell_size, partition_vectors),
+                write_to_file,
+                keep_in_memory,
+            )
+            for block_id in block_ids
+        ]
         return rasters
 
     def compute_raster_blocks_in_parallel(
         self,
         block_ids: list[int],
-        vector_to_convert: dict[str, gpd.GeoDataFrame],
+        prepared_criteria: dict[str, PreparedCriterion],
         cell_size: float = Config.RASTER_CELL_SIZE,
-    ) -> list[tuple[str, list[float]]]:
+        partition_vectors: bool = True,
+        write_to_file: bool = True,
+        keep_in_memory: bool = False,
+    ) -> list[RasterBlockResult]:
+        """
+        Compute the raster blocks in parallel. Only the inputs of a block are submitted per task, i.e., its geometry and
+        its features, instead of the engine with all processed vectors.
+        """
         with ProcessPoolExecutor() as executor:
             futures = [
-                executor.submit(self.compute_and_write_raster, block_id, cell_size, vector_to_convert)
+                executor.submit(
+                    compute_and_write_raster_block,
+                    block_id,
+                    self.project_area_grid.iloc[block_id].values[0],
+                    self.get_prepared_criteria_for_block(block_id, prepared_criteria, cell_size, partition_vectors),
+                    self.criteria_groups,
+                    self.project_area_geometry,
+                    cell_size,
+                    self.raster_name,
+                    write_to_file,
+                    keep_in_memory,
+                )
                 for block_id in block_ids
             ]
             rasters = [future.result() for future in as_completed(futures)]
         return rasters
 
-    def assign_vector_groups_to_grid(self):
+    def compute_raster_blocks_in_parallel_using_shared_memory(
+        self,
+        block_ids: list[int],
+        vector_to_convert: dict[str, gpd.GeoDataFrame],
+        cell_size: float = Config.RASTER_CELL_SIZE,
+        write_to_file: bool = True,
+        keep_in_memory: bool = False,
+    ) -> list[RasterBlockResult]:
         """
-        For each processed vector, assign the vector to the intersecting project area grid block based on intersection.
+        Compute the raster blocks in parallel, sharing the criteria with the workers once using shared memory.
+
+        Instead of pickling the engine and the vectors for every block, the criteria are serialized once to shared
+        memory. Each worker process reads them in its initializer after which only a block id is submitted per task.
         """
-        for processed_group_name, vector in self.processed_vectors.items():
-            vector_with_grid = gpd.sjoin(vector, self.project_area_grid, how="left", predicate="intersects")
-            vector_with_grid = vector_with_grid.rename(columns={"index_right": "block_id"})
-            vector_with_grid = vector_with_grid.set_index("block_id", drop=True)
-            self.processed_vectors[processed_group_name] = vector_with_grid
+        block_bounds = [block.bounds for block in self.project_area_grid.geometry]
+        with SharedCriteria(vector_to_convert, self.criteria_groups) as shared_criteria:
+            with ProcessPoolExecutor(
+                initializer=init_worker,
+                initargs=(
+                    shared_criteria.description,
+                    block_bounds,
+                    self.project_area_geometry,
+                    cell_size,
+                    self.raster_name,
+                    write_to_file,
+                    keep_in_memory,
+                ),
+            ) as executor:
+                futures = [executor.submit(compute_raster_block_in_worker, block_id) for block_id in block_ids]
+                rasters = [future.result() for future in as_completed(futures)]
+        return rasters
 
-    def compute_and_write_raster(
-        self, block_id: int, cell_size: float, vector_to_convert: dict[str, gpd.GeoDataFrame]
-    ) -> tuple[str, list[float]]:
-        block_geometry = self.project_area_grid.iloc[block_id].values[0]
-        raster_settings = get_raster_settings(block_geometry, cell_size)
-        rasters_to_sum = [
-            self.rasterize_vector(idx, criterion, gdf, raster_settings)
-            for idx, (criterion, gdf) in enumerate(vector_to_convert.items())
-        ]
+    def prepare_criteria(self, vector_to_convert: dict[str, gpd.GeoDataFrame]) -> dict[str, PreparedCriterion]:
+        """
+        Prepare the processed vectors once for rasterizing them per block, see prepare_criterion. The spatial index of
+        each criterion replaces assigning its features to the blocks of the project area grid.
+        """
+        return {
+            criterion: prepare_criterion(
+                criterion,
+                self.criteria_groups[criterion],
+                gdf.geometry.to_numpy(),
+                gdf.suitability_value.to_numpy(),
+                get_buffer_distances(gdf),
+            )
+            for criterion, gdf in vector_to_convert.items()
+        }
 
-        complete_raster = merge_criteria_rasters(rasters_to_sum, raster_settings.height, raster_settings.width)
-        complete_raster = clip_raster_mask_to_project_area(
-            complete_raster, self.project_area_geometry, raster_settings.transform
-        )
+    def get_prepared_criteria_for_block(
+        self,
+        block_id: int,
+        prepared_criteria: dict[str, PreparedCriterion],
+        cell_size: float = Config.RASTER_CELL_SIZE,
+        partition_vectors: bool = True,
+    ) -> dict[str, PreparedCriterion]:
+        """
+        Select only the features which intersect the given block. This keeps the payload per block task and the amount
+        of geometries to burn proportional to the local feature density instead of the size of the complete dataset.
 
-        return write_raster_block(
-            complete_raster,
-            raster_settings,
-            f"{self.raster_name_prefix}{self.raster_preset.general.final_raster_name}-{block_id}",
-        )
+        :param block_id: id of the block in the project area grid.
+        :param prepared_criteria: prepared criteria of the processed vectors.
+        :param cell_size: raster cell size in meters, features buffered in raster space are selected within a cell.
+        :param partition_vectors: when False, all features are returned regardless of the block they intersect.
+        :return: prepared criteria with the features which intersect the block.
+        """
+        if not partition_vectors:
+            return prepared_criteria
+        block_geometry = self.project_area_grid.iloc[block_id].values[0]
+        return {
+            criterion: select_block_features(prepared_criterion, block_geometry, cell_size)
+            for criterion, prepared_criterion in prepared_criteria.items()
+        }
 
-    def rasterize_vector(
-        self, idx: int, criterion: str, gdf: gpd.GeoDataFrame, raster_settings: McdaRasterSettings
-    ) -> RasterizedCriterion:
-        logger.info(f"Processing criteria number {idx + 1} of {self.number_of_criteria_to_rasterize}.")
-        rasterized_vector = rasterize_vector_data(criterion, gdf, raster_settings)
-        raster_criteria = self.raster_preset.criteria[criterion]
-        return RasterizedCriterion(criterion, rasterized_vector, raster_criteria.group)
+    def compute_and_write_raster(
+        self,
+        block_id: int,
+        cell_size: float,
+        vector_to_convert: dict[str, gpd.GeoDataFrame | PreparedCriterion],
+        write_to_file: bool = True,
+        keep_in_memory: bool = False,
+    ) -> RasterBlockResult:
+        block_geometry = self.project_area_grid.iloc[block_id].values[0]
+        return compute_and_write_raster_block(
+            block_id,
+            block_geometry,
+            vector_to_convert,
+            self.criteria_groups,
+            self.project_area_geometry,
+            cell_size,
+            self.raster_name,
+            write_to_file,
+            keep_in_memory,
+        )
@@ -11,12 +11,22 @@ import structlog
 import rasterio
 import rasterio.merge
 import rasterio.mask
+import rasterio.windows
 import numpy as np
 import geopandas as gpd
 from rasterio.features import rasterize, geometry_mask
+from rasterio.transform import array_bounds
+from scipy.ndimage import distance_transform_edt
 
-from utility_route_planner.models.mcda.mcda_datastructures import McdaRasterSettings, RasterizedCriterion
+from utility_route_planner.models.mcda.mcda_datastructures import (
+    CostSurface,
+    McdaRasterSettings,
+    PreparedCriterion,
+    RasterBlockResult,
+    RasterizedCriterion,
+)
 from settings import Config
+from utility_route_planner.util.geo_utilities import coordinates_to_array_indices
 from utility_route_planner.models.mcda.exceptions import (
     InvalidGroupValue,
     InvalidSuitabilityRasterInput,
@@ -25,6 +35,10 @@ from utility_route_planner.models.mcda.exceptions import (
 
 logger = structlog.get_logger(__name__)
 
+# Geometry type ids of shapely.get_type_id which are burned directly by their array indices.
+POINT_TYPE_ID = 0
+MULTIPOINT_TYPE_ID = 4
+
 
 def get_raster_settings(
     project_area: shapely.MultiPolygon | shapely.Polygon, cell_size: float = Config.RASTER_CELL_SIZE
@@ -44,102 +58,508 @@ def get_raster_settings(
     return raster_settings
 
 
+def clip_suitability_values(suitability_values: np.ndarray) -> np.ndarray:
+    """
+    Bump values equal to no data and clip values to the intermediate raster limits, returning them as int16.
+    """
+    suitability_values = np.asarray(suitability_values, dtype="int64")
+    suitability_values = np.where(
+        suitability_values == Config.INTERMEDIATE_RASTER_NO_DATA,
+        Config.INTERMEDIATE_RASTER_NO_DATA + 1,
+        suitability_values,
+    )
+    suitability_values = np.clip(
+        suitability_values, Config.INTERMEDIATE_RASTER_VALUE_LIMIT_LOWER, Config.INTERMEDIATE_RASTER_VALUE_LIMIT_UPPER
+    )
+    return suitability_values.astype("int16")
+
+
+def get_buffer_distances(gdf: gpd.GeoDataFrame) -> np.ndarray | None:
+    """Buffer distance of each feature to dilate in raster space, None when the criterion is buffered as vector."""
+    if "buffer_distance" not in gdf.columns:
+        return None
+    return gdf["buffer_distance"].fillna(0).to_numpy(dtype="float64")
+
+
+def prepare_criterion(
+    criterion: str,
+    group: str,
+    geometries: np.ndarray,
+    suitability_values: np.ndarray,
+    buffer_distances: np.ndarray | None = None,
+    build_tree: bool = True,
+) -> PreparedCriterion:
+    """
+    Sort and clip the processed vector of a criterion and index its geometries once, instead of in every block it is
+    rasterized in.
+
+    :param criterion: name of the criterion.
+    :param group: group ("a", "b" or "c") of the criterion.
+    :param geometries: processed geometries of the criterion.
+    :param suitability_values: suitability value of each geometry.
+    :param buffer_distances: distance to dilate each geometry by in raster space, see get_buffer_distances.
+    :param build_tree: build the spatial index to select the geometries per block.
+    :return: the prepared criterion.
+    """
+    suitability_values = clip_suitability_values(suitability_values)
+    # Highest value is leading within a criteria, using sorting we create the reverse painters algorithm effect.
+    order = np.argsort(suitability_values, kind="stable")
+    geometries = np.asarray(geometries)[order]
+    if buffer_distances is not None:
+        buffer_distances = np.asarray(buffer_distances, dtype="float64")[order]
+    return PreparedCriterion(
+        criterion,
+        group,
+        geometries,
+        suitability_values[order],
+        buffer_distances=buffer_distances,
+        tree=shapely.STRtree(geometries) if build_tree else None,
+    )
+
+
+def select_block_features(
+    prepared_criterion: PreparedCriterion, block_geometry: shapely.Polygon, cell_size: float = Config.RASTER_CELL_SIZE
+) -> PreparedCriterion:
+    """
+    Select the geometries of the prepared criterion which intersect the block, keeping them sorted. Geometries which
+    are dilated in raster space are selected when they are within their buffer distance of the block, extended by the
+    diagonal of a cell as the dilation starts from the centres of the burned cells. A criterion prepared without
+    spatial index is indexed here.
+    """
+    tree = prepared_criterion.tree
+    if tree is None:
+        tree = shapely.STRtree(prepared_criterion.geometries)
+    if prepared_criterion.buffer_distances is None:
+        idx = tree.query(block_geometry, predicate="intersects")
+    else:
+        selection_distances = prepared_criterion.buffer_distances + cell_size * math.sqrt(2)
+        idx = tree.query(block_geometry, predicate="dwithin", distance=selection_distances.max())
+        idx = idx[shapely.dwithin(prepared_criterion.geometries[idx], block_geometry, selection_distances[idx])]
+    idx = np.sort(idx)
+    return PreparedCriterion(
+        prepared_criterion.criterion,
+        prepared_criterion.group,
+        prepared_criterion.geometries[idx],
+        prepared_criterion.suitability_values[idx],
+        buffer_distances=None
+        if prepared_criterion.buffer_distances is None
+        else prepared_criterion.buffer_distances[idx],
+    )
+
+
+def as_prepared_criterion(
+    criterion: str, vector_to_rasterize: gpd.GeoDataFrame | PreparedCriterion, group: str = ""
+) -> PreparedCriterion:
+    """Geometries and suitability values to burn in order, a geodataframe is prepared first."""
+    if isinstance(vector_to_rasterize, PreparedCriterion):
+        return vector_to_rasterize
+    return prepare_criterion(
+        criterion,
+        group,
+        vector_to_rasterize.geometry.to_numpy(),
+        vector_to_rasterize.suitability_value.to_numpy(),
+        get_buffer_distances(vector_to_rasterize),
+        build_tree=False,
+    )
+
+
 def rasterize_vector_data(
     criterion: str,
-    gdf_to_rasterize: gpd.GeoDataFrame,
+    vector_to_rasterize: gpd.GeoDataFrame | PreparedCriterion,
     raster_settings: McdaRasterSettings,
 ) -> np.ndarray:
     """
     Burns the vector data to the project area in the desired raster cell size.
-    If values overlap in the geodataframe, pick the highest value.
+    If values overlap in the geodataframe, pick the highest value. A prepared criterion is burned as is, a
+    geodataframe is prepared first.
     """
-    logger.debug(f"Rasterizing layer: {criterion} in cell size: {Config.RASTER_CELL_SIZE} meters")
-    # Highest value is leading within a criteria, using sorting we create the reverse painters algorithm effect.
-    gdf_to_rasterize.sort_values("suitability_value", ascending=True, inplace=True)
-    # Bump values which would be no-data prior to rasterizing to avoid marking them as no-data unwanted.
-    gdf_to_rasterize.suitability_value = gdf_to_rasterize.suitability_value.replace(
-        raster_settings.nodata, raster_settings.nodata + 1
-    )
-    # Reset values exceeding the min/max.
-    gdf_to_rasterize.loc[
-        gdf_to_rasterize.suitability_value < Config.INTERMEDIATE_RASTER_VALUE_LIMIT_LOWER, "suitability_value"
-    ] = Config.INTERMEDIATE_RASTER_VALUE_LIMIT_LOWER
-    gdf_to_rasterize.loc[
-        gdf_to_rasterize.suitability_value > Config.INTERMEDIATE_RASTER_VALUE_LIMIT_UPPER, "suitability_value"
-    ] = Config.INTERMEDIATE_RASTER_VALUE_LIMIT_UPPER
-
-    out_array = np.full(
+    window, rasterized_window = rasterize_vector_data_in_window(criterion, vector_to_rasterize, raster_settings)
+    rasterized_vector = np.full(
         (raster_settings.height, raster_settings.width), Config.INTERMEDIATE_RASTER_NO_DATA, dtype="int16"
     )
-    shapes = ((geom, value) for geom, value in zip(gdf_to_rasterize.geometry, gdf_to_rasterize.suitability_value))
-    rasterized_vector = rasterize(shapes=shapes, out=out_array, transform=raster_settings.transform, all_touched=False)
+    rasterized_vector[window.toslices()] = rasterized_window
 
     return rasterized_vector
 
 
-def merge_criteria_rasters(
-    rasters_to_process: list[RasterizedCriterion],
-    raster_height: int,
-    raster_width: int,
-) -> np.ma.MaskedArray:
+def get_raster_window(geometries: np.ndarray, raster_settings: McdaRasterSettings) -> rasterio.windows.Window:
+    """
+    Pixel window of the raster containing every cell which can be burned by the geometries: the cells within the
+    bounds of the geometries and one cell around them for points and lines on a cell edge. The window is empty
+    without geometries.
+    """
+    if len(geometries) == 0:
+        return rasterio.windows.Window(0, 0, 0, 0)
+    min_x, min_y, max_x, max_y = shapely.total_bounds(geometries)
+    cell_size, origin_x, origin_y = (
+        raster_settings.transform.a,
+        raster_settings.transform.c,
+        raster_settings.transform.f,
+    )
+    col_start = min(max(math.floor((min_x - origin_x) / cell_size) - 1, 0), raster_settings.width)
+    col_end = min(max(math.ceil((max_x - origin_x) / cell_size) + 1, col_start), raster_settings.width)
+    row_start = min(max(math.floor((origin_y - max_y) / cell_size) - 1, 0), raster_settings.height)
+    row_end = min(max(math.ceil((origin_y - min_y) / cell_size) + 1, row_start), raster_settings.height)
+    return rasterio.windows.Window(col_start, row_start, col_end - col_start, row_end - row_start)
+
+
+def rasterize_vector_data_in_window(
+    criterion: str,
+    vector_to_rasterize: gpd.GeoDataFrame | PreparedCriterion,
+    raster_settings: McdaRasterSettings,
+) -> tuple[rasterio.windows.Window, np.ndarray]:
+    """
+    Burns the vector data like rasterize_vector_data, but only within the pixel window of the bounds of the features.
+    Sparse criteria, such as a few substations in a block, cost memory and time proportional to their footprint
+    instead of the size of the block. Geometries with a buffer distance are dilated in raster space, see
+    dilate_vector_data_in_window.
+
+    :return: the pixel window within the block and the rasterized vector data of that window.
+    """
+    logger.debug(f"Rasterizing layer: {criterion} within the bounds of its features")
+    prepared_criterion = as_prepared_criterion(criterion, vector_to_rasterize)
+    geometries, suitability_values = prepared_criterion.geometries, prepared_criterion.suitability_values
+    if prepared_criterion.buffer_distances is None:
+        return burn_vector_data_in_window(geometries, suitability_values, raster_settings)
+
+    is_buffered = prepared_criterion.buffer_distances > 0
+    rasterized_windows = [
+        burn_vector_data_in_window(geometries[~is_buffered], suitability_values[~is_buffered], raster_settings)
+    ]
+    # The highest value is leading within a criterion, which is the maximum of the features dilated by each distance.
+    buffered_parts = np.unique(
+        np.column_stack([prepared_criterion.buffer_distances[is_buffered], suitability_values[is_buffered]]), axis=0
+    )
+    for buffer_distance, suitability_value in buffered_parts:
+        is_part = is_buffered & (prepared_criterion.buffer_distances == buffer_distance)
+        is_part &= suitability_values == suitability_value
+        rasterized_windows.append(
+            dilate_vector_data_in_window(geometries[is_part], int(suitability_value), buffer_distance, raster_settings)
+        )
+    return combine_raster_windows(rasterized_windows)
+
+
+def burn_vector_data_in_window(
+    geometries: np.ndarray, suitability_values: np.ndarray, raster_settings: McdaRasterSettings
+) -> tuple[rasterio.windows.Window, np.ndarray]:
+    """
+    Burn the geometries sorted on ascending suitability value within the pixel window of their bounds. Points are
+    burned directly by their array indices, see burn_points, only the other geometries are burned by GDAL.
+    """
+    window = get_raster_window(geometries, raster_settings)
+    out_array = np.full((window.height, window.width), Config.INTERMEDIATE_RASTER_NO_DATA, dtype="int16")
+    if out_array.size > 0:
+        transform = rasterio.windows.transform(window, raster_settings.transform)
+        is_point = np.isin(shapely.get_type_id(geometries), [POINT_TYPE_ID, MULTIPOINT_TYPE_ID])
+        if not is_point.all():
+            shapes = zip(geometries[~is_point], suitability_values[~is_point].tolist())
+            rasterize(shapes=shapes, out=out_array, transform=transform, all_touched=False)
+        # The highest value is leading, burning the points afterward keeps the highest value of both.
+        burn_points(out_array, transform, geometries[is_point], suitability_values[is_point])
+
+    return window, out_array
+
+
+def get_disk_offsets(radius: float) -> tuple[np.ndarray, np.ndarray]:
+    """Row and column offsets of the cells with their centre within the radius, in cells, of the centre cell."""
+    extent = math.floor(radius)
+    row_offsets, col_offsets = np.mgrid[-extent : extent + 1, -extent : extent + 1]
+    in_disk = row_offsets**2 + col_offsets**2 <= radius**2
+    return row_offsets[in_disk], col_offsets[in_disk]
+
+
+def get_point_indices(
+    geometries: np.ndarray,
+    suitability_values: np.ndarray,
+    transform: affine.Affine,
+    offsets: tuple[np.ndarray, np.ndarray] | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Array indices and suitability value of the cell of every (multi)point coordinate, optionally of every cell of the
+    footprint offsets around it. Indices outside the raster are not removed.
+    """
+    coordinates, geometry_index = shapely.get_coordinates(geometries, return_index=True)
+    rows, cols = coordinates_to_array_indices(
+        coordinates[:, 0], coordinates[:, 1], transform.c, transform.f, transform.a, transform.e
+    )
+    values = suitability_values[geometry_index]
+    if offsets is not None:
+        rows = (rows[:, np.newaxis] + offsets[0]).ravel()
+        cols = (cols[:, np.newaxis] + offsets[1]).ravel()
+        values = np.repeat(values, len(offsets[0]))
+    return rows, cols, values
+
+
+def burn_points(
+    out_array: np.ndarray,
+    transform: affine.Affine,
+    geometries: np.ndarray,
+    suitability_values: np.ndarray,
+    offsets: tuple[np.ndarray, np.ndarray] | None = None,
+):
+    """
+    Burn (multi)points in place without GDAL, keeping the highest value per cell. This equals rasterizing the points one
+    geometry at a time, which dominates the rasterizing time for the many trees and obstacles in urban BGT data.
+
+    :param out_array: raster to burn the points in.
+    :param transform: transform of the raster.
+    :param geometries: points and multipoints to burn.
+    :param suitability_values: suitability value of each geometry.
+    :param offsets: footprint around each point to burn, see get_disk_offsets.
     """
-    List of rasters to combine and their respective group.
+    rows, cols, values = get_point_indices(geometries, suitability_values, transform, offsets)
+    in_raster = (rows >= 0) & (rows < out_array.shape[0]) & (cols >= 0) & (cols < out_array.shape[1])
+    np.maximum.at(out_array, (rows[in_raster], cols[in_raster]), values[in_raster])
+
+
+def dilate_vector_data_in_window(
+    geometries: np.ndarray, suitability_value: int, buffer_distance: float, raster_settings: McdaRasterSettings
+) -> tuple[rasterio.windows.Window, np.ndarray]:
+    """
+    Buffer the geometries in raster space: the cells of the geometries are burned and every cell centre within the
+    buffer distance of a burned cell centre gets the suitability value, using a distance transform. The result equals
+    burning the buffered geometries within one cell, while the original points and lines are much cheaper to burn.
+
+    Geometries outside the block can be buffered into it, so they are burned on a raster extended by the buffer.
+    Points are stamped directly with a disk footprint of the buffer distance instead.
+    """
+    cell_size = raster_settings.transform.a
+    if np.isin(shapely.get_type_id(geometries), [POINT_TYPE_ID, MULTIPOINT_TYPE_ID]).all():
+        return stamp_points_in_window(geometries, suitability_value, buffer_distance, raster_settings)
+
+    padding = math.floor(buffer_distance / cell_size)
+    padded_raster_settings = McdaRasterSettings(
+        width=raster_settings.width + 2 * padding,
+        height=raster_settings.height + 2 * padding,
+        nodata=raster_settings.nodata,
+        transform=raster_settings.transform * affine.Affine.translation(-padding, -padding),
+    )
+    window = get_raster_window(geometries, padded_raster_settings)
+    if window.width == 0 or window.height == 0:
+        return rasterio.windows.Window(0, 0, 0, 0), np.empty((0, 0), dtype="int16")
+
+    # The dilated cells are within the padding around the burned cells.
+    window = rasterio.windows.Window(
+        window.col_off - padding, window.row_off - padding, window.width + 2 * padding, window.height + 2 * padding
+    )
+    is_burned = rasterize(
+        shapes=((geometry, 1) for geometry in geometries),
+        out_shape=(window.height, window.width),
+        transform=rasterio.windows.transform(window, padded_raster_settings.transform),
+        # Every point of the geometries is in a burned cell, such that the dilation is within a cell of the buffer.
+        all_touched=True,
+        dtype="uint8",
+    )
+    if not is_burned.any():
+        # Geometries around the raster without any burned cell, the distance transform needs at least one.
+        return rasterio.windows.Window(0, 0, 0, 0), np.empty((0, 0), dtype="int16")
+    is_dilated = distance_transform_edt(is_burned == 0) * cell_size <= buffer_distance
+
+    # Crop the dilated window to the block, the window is relative to the padded raster.
+    col_start, row_start = max(window.col_off, padding), max(window.row_off, padding)
+    col_end = min(window.col_off + window.width, padding + raster_settings.width)
+    row_end = min(window.row_off + window.height, padding + raster_settings.height)
+    if col_end <= col_start or row_end <= row_start:
+        return rasterio.windows.Window(0, 0, 0, 0), np.empty((0, 0), dtype="int16")
+    is_dilated = is_dilated[
+        row_start - window.row_off : row_end - window.row_off, col_start - window.col_off : col_end - window.col_off
+    ]
+    block_window = rasterio.windows.Window(
+        col_start - padding, row_start - padding, col_end - col_start, row_end - row_start
+    )
+    return block_window, np.where(is_dilated, suitability_value, Config.INTERMEDIATE_RASTER_NO_DATA).astype("int16")
+
+
+def stamp_points_in_window(
+    geometries: np.ndarray, suitability_value: int, buffer_distance: float, raster_settings: McdaRasterSettings
+) -> tuple[rasterio.windows.Window, np.ndarray]:
+    """Buffer points in raster space by stamping the disk of the buffer distance around the cell of each point."""
+    offsets = get_disk_offsets(buffer_distance / raster_settings.transform.a)
+    rows, cols, _ = get_point_indices(
+        geometries, np.zeros(len(geometries), dtype="int16"), raster_settings.transform, offsets
+    )
+    in_raster = (rows >= 0) & (rows < raster_settings.height) & (cols >= 0) & (cols < raster_settings.width)
+    rows, cols = rows[in_raster], cols[in_raster]
+    if len(rows) == 0:
+        return rasterio.windows.Window(0, 0, 0, 0), np.empty((0, 0), dtype="int16")
+
+    window = rasterio.windows.Window(
+        int(cols.min()), int(rows.min()), int(cols.max() - cols.min() + 1), int(rows.max() - rows.min() + 1)
+    )
+    out_array = np.full((window.height, window.width), Config.INTERMEDIATE_RASTER_NO_DATA, dtype="int16")
+    out_array[rows - window.row_off, cols - window.col_off] = suitability_value
+    return window, out_array
+
+
+def combine_raster_windows(
+    rasterized_windows: list[tuple[rasterio.windows.Window, np.ndarray]],
+) -> tuple[rasterio.windows.Window, np.ndarray]:
+    """Combine rasterized windows of a criterion into the window covering them all, keeping the highest value."""
+    rasterized_windows = [(window, raster) for window, raster in rasterized_windows if raster.size > 0]
+    if not rasterized_windows:
+        return rasterio.windows.Window(0, 0, 0, 0), np.empty((0, 0), dtype="int16")
+
+    window = rasterio.windows.union(*[window for window, _ in rasterized_windows])
+    window = rasterio.windows.Window(int(window.col_off), int(window.row_off), int(window.width), int(window.height))
+    out_array = np.full((window.height, window.width), Config.INTERMEDIATE_RASTER_NO_DATA, dtype="int16")
+    for part_window, raster in rasterized_windows:
+        rows = slice(part_window.row_off - window.row_off, part_window.row_off - window.row_off + part_window.height)
+        cols = slice(part_window.col_off - window.col_off, part_window.col_off - window.col_off + part_window.width)
+        np.maximum(out_array[rows, cols], raster, out=out_array[rows, cols])
+    return window, out_array
+
+
+def compute_and_write_raster_block(
+    block_id: int,
+    block_geometry: shapely.Polygon,
+    vector_to_convert: dict[str, gpd.GeoDataFrame | PreparedCriterion],
+    criteria_groups: dict[str, str],
+    project_area: shapely.Polygon | shapely.MultiPolygon,
+    cell_size: float,
+    raster_name: str,
+    write_to_file: bool = True,
+    keep_in_memory: bool = False,
+) -> RasterBlockResult:
+    """
+    Rasterize, merge and clip all criteria for a single block of the project area grid and write it to disk.
+
+    :param block_id: id of the block in the project area grid, used as suffix for the raster name.
+    :param block_geometry: geometry of the block in the project area grid.
+    :param vector_to_convert: processed vectors per criterion to burn in the block, optionally prepared.
+    :param criteria_groups: group ("a", "b" or "c") per criterion.
+    :param project_area: project area, all cells outside are set to no data.
+    :param cell_size: raster cell size in meters.
+    :param raster_name: name of the final raster, the block id is appended.
+    :param write_to_file: write the block as GeoTIFF to the results folder.
+    :param keep_in_memory: return the final int8 values of the block, used to assemble the cost surface in memory.
+    :return: bounding box of the block, its path if written and its values if kept in memory.
+    """
+    raster_settings = get_raster_settings(block_geometry, cell_size)
+    # Each criterion is merged as soon as it is rasterized, such that only one rasterized criterion is kept at a time.
+    criteria_raster_merger = CriteriaRasterMerger(raster_settings.height, raster_settings.width)
+    for idx, (criterion, gdf) in enumerate(vector_to_convert.items()):
+        logger.info(f"Processing criteria number {idx + 1} of {len(vector_to_convert)}.")
+        window, rasterized_vector = rasterize_vector_data_in_window(criterion, gdf, raster_settings)
+        criteria_raster_merger.add(
+            RasterizedCriterion(criterion, rasterized_vector, criteria_groups[criterion], window)
+        )
+
+    complete_raster = criteria_raster_merger.merge()
+    complete_raster = clip_raster_mask_to_project_area(complete_raster, project_area, raster_settings.transform)
+
+    block_result = RasterBlockResult(
+        block_id, list(array_bounds(raster_settings.height, raster_settings.width, raster_settings.transform))
+    )
+    if write_to_file:
+        block_result.path, block_result.bbox = write_raster_block(
+            complete_raster, raster_settings, f"{raster_name}-{block_id}"
+        )
+    if keep_in_memory:
+        block_result.array = np.ma.filled(complete_raster, Config.FINAL_RASTER_NO_DATA).astype(raster_settings.dtype)
+    return block_result
+
+
+class CriteriaRasterMerger:
+    """
+    Merge the rasterized criteria of a block into the cost surface one criterion at a time, instead of stacking all
+    criteria of a group before combining them. The memory use does not depend on the number of criteria: the highest
+    value of group a is kept as int16, the sum of group b as int32 and the cells with data of group b and c as packed
+    bitmasks.
 
     Criteria in group a: highest value in group a is leading.
     Criteria in group b: values in group b are added or subtracted to group a if present.
     Criteria in group c: mark as no data if present, overruling group a and b.
     """
-    logger.debug(f"Starting summing {len(rasters_to_process)} rasters into the final cost surface.")
 
-    # Split groups and process accordingly prior to summing all together.
-    group_a, group_b, group_c = [], [], []
-    for rasterized_vector in rasters_to_process:
-        match rasterized_vector.group:
+    def __init__(self, raster_height: int, raster_width: int):
+        self.shape = raster_height, raster_width
+        # No data is lower than any value, such that it is overruled by the first criterion with data in a cell.
+        self.max_group_a = np.full(self.shape, Config.INTERMEDIATE_RASTER_NO_DATA, dtype="int16")
+        # The sum of multiple int16 criteria can exceed the int16 range before it is clipped to the final range.
+        self.sum_group_b = np.zeros(self.shape, dtype="int32")
+        # Bitmasks are packed per row, such that the cells of a window can be updated without unpacking the block.
+        self.has_data_group_b = np.zeros((raster_height, math.ceil(raster_width / 8)), dtype="uint8")
+        self.has_data_group_c = np.zeros((raster_height, math.ceil(raster_width / 8)), dtype="uint8")
+        self.number_of_criteria = {"a": 0, "b": 0, "c": 0}
+
+    def add(self, rasterized_criterion: RasterizedCriterion):
+        """
+        Fold the raster of the criterion into the merged raster of its group. A raster of a window only updates the
+        cells of that window in place.
+        """
+        raster = rasterized_criterion.raster
+        if rasterized_criterion.window is None:
+            rows, cols = slice(0, self.shape[0]), slice(0, self.shape[1])
+        else:
+            rows, cols = rasterized_criterion.window.toslices()
+        match rasterized_criterion.group:
             case "a":
-                group_a.append(rasterized_vector)
+                max_group_a = self.max_group_a[rows, cols]
+                np.maximum(max_group_a, raster, out=max_group_a)
             case "b":
-                group_b.append(rasterized_vector)
+                has_data = raster != Config.INTERMEDIATE_RASTER_NO_DATA
+                sum_group_b = self.sum_group_b[rows, cols]
+                np.add(sum_group_b, raster, out=sum_group_b, where=has_data)
+                self.pack(self.has_data_group_b, has_data, rows, cols)
             case "c":
-                group_c.append(rasterized_vector)
+                self.pack(self.has_data_group_c, raster != Config.INTERMEDIATE_RASTER_NO_DATA, rows, cols)
             case _:
                 raise InvalidGroupValue(
-                    f"Invalid group value encountered during raster processing: {rasterized_vector.group}"
+                    f"Invalid group value encountered during raster processing: {rasterized_criterion.group}"
                 )
+        self.number_of_criteria[rasterized_criterion.group] += 1
 
-    merged_group_a = np.ma.empty(shape=(raster_height, raster_width))
-    merged_group_b = np.ma.empty(shape=(raster_height, raster_width))
-    merged_group_c = np.ma.empty(shape=(raster_height, raster_width))
-    if len(group_a) > 0:
-        merged_group_a = process_raster_groups(group_a, "max", raster_height, raster_width)
-    if len(group_b) > 0:
-        merged_group_b = process_raster_groups(group_b, "sum", raster_height, raster_width)
-    if len(group_c) > 0:
-        merged_group_c = process_raster_groups(group_c, "sum", raster_height, raster_width)
-
-    if len(group_b) > 0 and len(group_a) > 0:
-        summed_raster = np.ma.sum([merged_group_a, merged_group_b], axis=0)
-
-    elif len(group_b) > 0 and len(group_a) == 0:
-        summed_raster = merged_group_b
-    elif len(group_a) > 0 and len(group_b) == 0:
-        summed_raster = merged_group_a
-    else:
-        raise InvalidSuitabilityRasterInput("No rasters to sum, exiting.")
+    def merge(self) -> np.ma.MaskedArray:
+        """Combine the groups of the added criteria into the cost surface, masking the cells without data."""
+        if self.number_of_criteria["a"] == 0 and self.number_of_criteria["b"] == 0:
+            raise InvalidSuitabilityRasterInput("No rasters to sum, exiting.")
 
-    # Force values to fit in the int8 datatype
-    summed_raster = np.ma.clip(
-        summed_raster, Config.FINAL_RASTER_VALUE_LIMIT_LOWER, Config.FINAL_RASTER_VALUE_LIMIT_UPPER
-    )
+        has_data_group_a = self.max_group_a != Config.INTERMEDIATE_RASTER_NO_DATA
+        has_data_group_b = self.unpack(self.has_data_group_b)
+        summed_raster = self.sum_group_b.copy()
+        np.add(summed_raster, self.max_group_a, out=summed_raster, where=has_data_group_a)
+        # Force values to fit in the int8 datatype
+        np.clip(
+            summed_raster,
+            Config.FINAL_RASTER_VALUE_LIMIT_LOWER,
+            Config.FINAL_RASTER_VALUE_LIMIT_UPPER,
+            out=summed_raster,
+        )
+
+        # Every cell without data in group a and b, or intersecting with group c, is set to no data.
+        mask = ~(has_data_group_a | has_data_group_b) | self.unpack(self.has_data_group_c)
+        return np.ma.MaskedArray(summed_raster.astype("int16"), mask=mask)
+
+    @staticmethod
+    def pack(bitmask: np.ndarray, has_data: np.ndarray, rows: slice, cols: slice):
+        """Set the cells with data of a window in the bitmask, the window is widened to whole bytes of the rows."""
+        col_start = cols.start // 8 * 8
+        aligned_has_data = np.zeros((has_data.shape[0], cols.stop - col_start), dtype=bool)
+        aligned_has_data[:, cols.start - col_start :] = has_data
+        packed_has_data = np.packbits(aligned_has_data, axis=1)
+        bitmask[rows, col_start // 8 : col_start // 8 + packed_has_data.shape[1]] |= packed_has_data
+
+    def unpack(self, bitmask: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bitmask, axis=1, count=self.shape[1]).astype(bool)
 
-    # Update the mask of the summed_raster so that every cell intersecting with group c is set to no data.
-    if len(group_c) > 0:
-        summed_raster.mask = np.ma.mask_or(summed_raster.mask, ~merged_group_c.mask)
 
-    return summed_raster
+def merge_criteria_rasters(
+    rasters_to_process: list[RasterizedCriterion],
+    raster_height: int,
+    raster_width: int,
+) -> np.ma.MaskedArray:
+    """
+    List of rasters to combine and their respective group, see CriteriaRasterMerger.
+    """
+    logger.debug(f"Starting summing {len(rasters_to_process)} rasters into the final cost surface.")
+    criteria_raster_merger = CriteriaRasterMerger(raster_height, raster_width)
+    for rasterized_vector in rasters_to_process:
+        criteria_raster_merger.add(rasterized_vector)
+    return criteria_raster_merger.merge()
 
 
 def clip_raster_mask_to_project_area(
-    raster: np.ma.MaskedArray, project_area: shapely.Polygon, transform: affine.Affine
+    raster: np.ma.MaskedArray, project_area: shapely.Polygon | shapely.MultiPolygon, transform: affine.Affine
 ):
     """
     Update the raster mask such that all values outside the project area are masked and set to no data later on
@@ -149,38 +569,6 @@ def clip_raster_mask_to_project_area(
     return raster
 
 
-def process_raster_groups(
-    group: list[RasterizedCriterion],
-    method: str,
-    height: int,
-    width: int,
-) -> np.ma.MaskedArray:
-    """
-    Iterate over all raster groups and perform the desired method to combine the different groups.
-    :param group: list of criterion groups to process.
-    :param method: mathematical operation to perform on the rasters. Currently, "sum" and "max" are supported.
-    :param height: height of the raster
-    :param width: width of the raster
-
-    :return: masked numpy array of processed raster groups
-    """
-    # Use numpy masks to ignore the nodata values in the computations.
-    stacked_raster_groups = np.ma.empty(shape=(len(group), height, width))
-    for idx, criterion in enumerate(group):
-        stacked_raster_groups[idx] = np.ma.masked_equal(criterion.raster, Config.INTERMEDIATE_RASTER_NO_DATA)
-
-    match method:
-        case "sum":
-            processed_raster = np.ma.sum(stacked_raster_groups, axis=0)
-        case "max":
-            processed_raster = np.ma.max(stacked_raster_groups, axis=0)
-        case _:
-            raise InvalidSuitabilityRasterInput(
-                f"Invalid method for processing raster group: {method}. Expected 'sum' or 'max'."
-            )
-    return processed_raster
-
-
 def write_raster_block(
     complete_raster: np.ma.MaskedArray, raster_settings: McdaRasterSettings, final_raster_name
 ) -> tuple[str, list[float]]:
@@ -191,3 +579,23 @@ def write_raster_block(
         bbox = list(dest.bounds)
 
     return final_raster_path.__str__(), bbox
+
+
+def mosaic_raster_blocks(blocks: list[RasterBlockResult], cell_size: float) -> CostSurface:
+    """
+    Assemble the blocks kept in memory into a single cost surface, equal to the vrt built from the written blocks.
+    """
+    block_bboxes = np.array([block.bbox for block in blocks])
+    min_x, max_y = block_bboxes[:, 0].min(), block_bboxes[:, 3].max()
+    width = round((block_bboxes[:, 2].max() - min_x) / cell_size)
+    height = round((max_y - block_bboxes[:, 1].min()) / cell_size)
+
+    cost_surface = np.full((height, width), Config.FINAL_RASTER_NO_DATA, dtype="int8")
+    for block in blocks:
+        if block.array is None:
+            raise InvalidSuitabilityRasterInput(f"Block {block.block_id} is not kept in memory.")
+        row = round((max_y - block.bbox[3]) / cell_size)
+        col = round((block.bbox[0] - min_x) / cell_size)
+        cost_surface[row : row + block.array.shape[0], col : col + block.array.shape[1]] = block.array
+
+    return CostSurface(cost_surface, affine.Affine(cell_size, 0.0, min_x, 0.0, -cell_size, max_y))
@@ -0,0 +1,202 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+import geopandas as gpd
+import numpy as np
+import shapely
+import structlog
+
+from utility_route_planner.models.mcda.mcda_datastructures import RasterBlockResult
+from utility_route_planner.models.mcda.mcda_rasterizing import (
+    clip_suitability_values,
+    compute_and_write_raster_block,
+    get_buffer_distances,
+    prepare_criterion,
+    select_block_features,
+)
+
+logger = structlog.get_logger(__name__)
+
+# State of a worker process, filled once by init_worker and reused for every block submitted to that worker.
+_worker_state: dict = {}
+
+
+@dataclass
+class SharedCriterionDescription:
+    criterion: str
+    group: str
+    start: int
+    end: int
+    # Whether the criterion has buffer distances to dilate the geometries by in raster space.
+    is_buffered_in_raster_space: bool = False
+
+
+@dataclass
+class SharedCriteriaDescription:
+    """Picklable description of the shared memory segments, this is the only criteria data sent to the workers."""
+
+    name_wkb: str
+    name_offsets: str
+    name_values: str
+    name_buffer_distances: str
+    number_of_features: int
+    criteria: list[SharedCriterionDescription]
+
+
+class SharedCriteria:
+    """
+    Serializes the processed criteria to shared memory: the geometries as one WKB buffer with offsets, the suitability
+    values as an int16 array and the buffer distances as a float64 array. Use as context manager such that the shared
+    memory is always released.
+    """
+
+    def __init__(self, vector_to_convert: dict[str, gpd.GeoDataFrame], criteria_groups: dict[str, str]):
+        wkb_per_feature, values, distances, criteria = [], [], [], []
+        start = 0
+        for criterion, gdf in vector_to_convert.items():
+            wkb_per_feature.extend(shapely.to_wkb(gdf.geometry.values))
+            values.append(clip_suitability_values(gdf.suitability_value.to_numpy()))
+            criterion_buffer_distances = get_buffer_distances(gdf)
+            distances.append(np.zeros(len(gdf)) if criterion_buffer_distances is None else criterion_buffer_distances)
+            criteria.append(
+                SharedCriterionDescription(
+                    criterion,
+                    criteria_groups[criterion],
+                    start,
+                    start + len(gdf),
+                    is_buffered_in_raster_space=criterion_buffer_distances is not None,
+                )
+            )
+            start += len(gdf)
+
+        wkb_buffer = b"".join(wkb_per_feature)
+        offsets = np.zeros(len(wkb_per_feature) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(i) for i in wkb_per_feature])
+        suitability_values = np.concatenate(values) if values else np.empty(0, dtype="int16")
+        buffer_distances = np.concatenate(distances) if distances else np.empty(0, dtype="float64")
+
+        self.shared_memory = [
+            self._to_shared_memory(np.frombuffer(wkb_buffer, dtype="uint8")),
+            self._to_shared_memory(offsets),
+            self._to_shared_memory(suitability_values),
+            self._to_shared_memory(buffer_distances),
+        ]
+        self.description = SharedCriteriaDescription(
+            name_wkb=self.shared_memory[0].name,
+            name_offsets=self.shared_memory[1].name,
+            name_values=self.shared_memory[2].name,
+            name_buffer_distances=self.shared_memory[3].name,
+            number_of_features=len(wkb_per_feature),
+            criteria=criteria,
+        )
+        logger.info(
+            f"Shared {len(wkb_per_feature)} features of {len(criteria)} criteria using {len(wkb_buffer)} bytes."
+        )
+
+    @staticmethod
+    def _to_shared_memory(array: np.ndarray) -> SharedMemory:
+        shared_memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shared_memory.buf)[:] = array
+        return shared_memory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for shared_memory in self.shared_memory:
+            shared_memory.close()
+            shared_memory.unlink()
+
+
+def read_shared_criteria(
+    description: SharedCriteriaDescription,
+) -> dict[str, tuple[str, np.ndarray, np.ndarray, np.ndarray | None]]:
+    """
+    Read the criteria from shared memory, returning the group, geometries, suitability values and buffer distances, if
+    buffered in raster space, per criterion.
+    """
+    shared_wkb = SharedMemory(name=description.name_wkb)
+    shared_offsets = SharedMemory(name=description.name_offsets)
+    shared_values = SharedMemory(name=description.name_values)
+    shared_buffer_distances = SharedMemory(name=description.name_buffer_distances)
+    try:
+        offsets = np.ndarray(description.number_of_features + 1, dtype="int64", buffer=shared_offsets.buf)
+        suitability_values = np.ndarray(description.number_of_features, dtype="int16", buffer=shared_values.buf)
+        buffer_distances = np.ndarray(
+            description.number_of_features, dtype="float64", buffer=shared_buffer_distances.buf
+        )
+        # One contiguous copy of the WKB buffer, of which the slices per feature are passed to shapely directly.
+        wkb_buffer = np.ndarray(offsets[-1], dtype="uint8", buffer=shared_wkb.buf).tobytes()
+        feature_offsets = offsets.tolist()
+        geometries = shapely.from_wkb(
+            [wkb_buffer[start:end] for start, end in zip(feature_offsets[:-1], feature_offsets[1:])]
+        )
+        criteria = {
+            criterion.criterion: (
+                criterion.group,
+                np.asarray(geometries[criterion.start : criterion.end]),
+                suitability_values[criterion.start : criterion.end].copy(),
+                buffer_distances[criterion.start : criterion.end].copy()
+                if criterion.is_buffered_in_raster_space
+                else None,
+            )
+            for criterion in description.criteria
+        }
+        # Release the views on the shared memory, otherwise it cannot be closed.
+        del offsets, suitability_values, buffer_distances
+    finally:
+        shared_wkb.close()
+        shared_offsets.close()
+        shared_values.close()
+        shared_buffer_distances.close()
+    return criteria
+
+
+def init_worker(
+    description: SharedCriteriaDescription,
+    block_bounds: list[tuple[float, float, float, float]],
+    project_area: shapely.Polygon | shapely.MultiPolygon,
+    cell_size: float,
+    raster_name: str,
+    write_to_file: bool = True,
+    keep_in_memory: bool = False,
+):
+    """Initializer of a worker process, reads the shared criteria once and prepares them for querying per block."""
+    criteria = read_shared_criteria(description)
+    _worker_state["criteria"] = {
+        criterion: prepare_criterion(criterion, group, geometries, suitability_values, buffer_distances)
+        for criterion, (group, geometries, suitability_values, buffer_distances) in criteria.items()
+    }
+    _worker_state["block_bounds"] = block_bounds
+    _worker_state["project_area"] = project_area
+    _worker_state["cell_size"] = cell_size
+    _worker_state["raster_name"] = raster_name
+    _worker_state["write_to_file"] = write_to_file
+    _worker_state["keep_in_memory"] = keep_in_memory
+
+
+def compute_raster_block_in_worker(block_id: int) -> RasterBlockResult:
+    """Compute a raster block using the criteria which are loaded in the worker process by init_worker."""
+    block_geometry = shapely.box(*_worker_state["block_bounds"][block_id])
+    vector_to_convert, criteria_groups = {}, {}
+    for criterion, prepared_criterion in _worker_state["criteria"].items():
+        vector_to_convert[criterion] = select_block_features(
+            prepared_criterion, block_geometry, _worker_state["cell_size"]
+        )
+        criteria_groups[criterion] = prepared_criterion.group
+
+    return compute_and_write_raster_block(
+        block_id,
+        block_geometry,
+        vector_to_convert,
+        criteria_groups,
+        _worker_state["project_area"],
+        _worker_state["cell_size"],
+        _worker_state["raster_name"],
+        _worker_state["write_to_file"],
+        _worker_state["keep_in_memory"],
+    )
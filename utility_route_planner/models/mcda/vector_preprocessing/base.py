@@ -8,6 +8,7 @@ import abc
 import typing
 
 import fiona
+import numpy as np
 import pandas
 import shapely
 import geopandas as gpd
@@ -34,34 +35,58 @@ class VectorPreprocessorBase(abc.ABC):
         """Name of the criterion"""
 
     @time_function
-    def execute(self, general: RasterPresetGeneral, criterion: RasterPresetCriteria) -> tuple[bool, gpd.GeoDataFrame]:
-        """Run all methods in order for a criteria returning the processed geodataframe with suitability values."""
+    def execute(
+        self,
+        general: RasterPresetGeneral,
+        criterion: RasterPresetCriteria,
+        write_to_file: bool = True,
+        bbox: tuple[float, float, float, float] | None = None,
+    ) -> tuple[bool, gpd.GeoDataFrame]:
+        """
+        Run all methods in order for a criteria returning the processed geodataframe with suitability values.
+        Writing the result to the geopackage can be skipped when the caller takes care of it, e.g., in parallel runs.
+        Optionally, only the features intersecting the bbox are read, e.g., to process a single block of the project
+        area.
+        """
         logger.info(f"Start preprocessing: {self.criterion}.")
 
-        prepared_gdfs = self.prepare_input_data(general.project_area_geometry, criterion, general.path_input_geopackage)
+        prepared_gdfs = self.prepare_input_data(
+            general.project_area_geometry, criterion, general.path_input_geopackage, bbox
+        )
         if len(prepared_gdfs) == 1 and prepared_gdfs[0].empty:
             return False, get_empty_geodataframe()  # Nothing to process when there is no data available, return.
         processed_gdf = self.specific_preprocess(prepared_gdfs, criterion)
         if not self.is_valid_result(processed_gdf):
             return False, get_empty_geodataframe()
-        self.write_to_file(general.prefix, processed_gdf)
+        if write_to_file:
+            self.write_to_file(general.prefix, processed_gdf)
 
         return True, processed_gdf
 
     @staticmethod
     def prepare_input_data(
-        project_area: shapely.MultiPolygon, criterion: RasterPresetCriteria, path_geopackage_mcda_input
+        project_area: shapely.MultiPolygon,
+        criterion: RasterPresetCriteria,
+        path_geopackage_mcda_input,
+        bbox: tuple[float, float, float, float] | None = None,
     ) -> list[gpd.GeoDataFrame]:
-        """Check existing layers in geopackage / clip data / check if gdf is empty / filter historic BGT data"""
+        """
+        Check existing layers in geopackage / clip data / check if gdf is empty / filter historic BGT data
+
+        Features are read using the bbox of the project area, unless a smaller bbox is given. Features intersecting the
+        bbox are read completely and are only clipped to the project area.
+        """
+        if bbox is None:
+            bbox = project_area.bounds
         prepared_input = []
         for layer_name in criterion.layer_names:
             if layer_name not in fiona.listlayers(path_geopackage_mcda_input):
                 logger.warning(f"Layer name: {layer_name} is not available in geopackage, skipping.")
                 gdf = get_empty_geodataframe()
             else:
-                gdf = gpd.read_file(
-                    path_geopackage_mcda_input, layer=layer_name, engine="pyogrio", bbox=project_area.bounds
-                ).clip(project_area)
+                gdf = gpd.read_file(path_geopackage_mcda_input, layer=layer_name, engine="pyogrio", bbox=bbox).clip(
+                    project_area
+                )
             # TODO determine a proper datasource (nl extract) which has one of either fields, not both: https://geoforum.nl/t/bgt-begroeid-terreindeel-en-ondersteunend-wegdeel-steeds-vaker-niet-leesbaar-via-gdal/9295/15
             if gdf.columns.__contains__("eindRegistratie"):  # BGT data has this attribute, filter historic items.
                 gdf = gdf.loc[gdf["eindRegistratie"].isna()]
@@ -77,6 +102,27 @@ class VectorPreprocessorBase(abc.ABC):
 
         return prepared_input
 
+    @staticmethod
+    def buffer_geometries(
+        input_gdf: gpd.GeoDataFrame,
+        buffer_value: float,
+        mask: np.ndarray | None = None,
+        buffer_in_raster_space: bool = False,
+    ) -> gpd.GeoDataFrame:
+        """
+        Buffer the geometries of the features in the mask, or all features without a mask. When buffering in raster
+        space, the geometries are kept and the buffer distance is set in the buffer_distance column instead. The
+        rasterized features are dilated by this distance, which is cheaper than buffering and burning the polygons.
+        """
+        if mask is None:
+            mask = np.full(len(input_gdf), True)
+        if buffer_in_raster_space:
+            buffer_distance = input_gdf["buffer_distance"] if "buffer_distance" in input_gdf.columns else 0.0
+            input_gdf["buffer_distance"] = np.where(mask, buffer_value, buffer_distance)
+        else:
+            input_gdf["geometry"] = np.where(mask, input_gdf["geometry"].buffer(buffer_value), input_gdf["geometry"])
+        return input_gdf
+
     @abc.abstractmethod
     def specific_preprocess(self, prepared_data, criterion) -> gpd.GeoDataFrame:
         """Subclasses must implement this abstract method which contains logic for handling the criteria."""
@@ -29,12 +29,16 @@ class ExistingUtilities(VectorPreprocessorBase):
             input_gdf,
             criterion.weight_values,
             criterion.geometry_values,  # type: ignore
+            criterion.buffer_in_raster_space,
         )
         return input_gdf
 
     @staticmethod
     def _set_suitability_and_geometry_values(
-        input_gdf: list[gpd.GeoDataFrame], weight_values: dict, buffer_values: dict
+        input_gdf: list[gpd.GeoDataFrame],
+        weight_values: dict,
+        buffer_values: dict,
+        buffer_in_raster_space: bool = False,
     ) -> gpd.GeoDataFrame:
         logger.info("Setting suitability and updating geometry values.")
         # High voltage assets
@@ -47,23 +51,29 @@ class ExistingUtilities(VectorPreprocessorBase):
                 if gdf.iloc[0].type == "high_voltage_cable_overhead":
                     gdf_high_voltage_overhead = gdf.copy()
                     gdf_high_voltage_overhead["suitability_value"] = weight_values["hoogspanning_bovengronds"]
-                    gdf_high_voltage_overhead["geometry"] = gdf_high_voltage_overhead["geometry"].buffer(
-                        buffer_values["hoogspanning_bovengronds_buffer"]
+                    gdf_high_voltage_overhead = VectorPreprocessorBase.buffer_geometries(
+                        gdf_high_voltage_overhead,
+                        buffer_values["hoogspanning_bovengronds_buffer"],
+                        buffer_in_raster_space=buffer_in_raster_space,
                     )
                     # Possibly we may need to dissolve based on highest suitability value.
                 elif gdf.iloc[0].type == "high_voltage_cable_underground":
                     gdf_high_voltage_underground = gdf.copy()
                     gdf_high_voltage_underground["suitability_value"] = weight_values["hoogspanning_ondergronds"]
-                    gdf_high_voltage_underground["geometry"] = gdf_high_voltage_underground["geometry"].buffer(
-                        buffer_values["hoogspanning_ondergronds_buffer"]
+                    gdf_high_voltage_underground = VectorPreprocessorBase.buffer_geometries(
+                        gdf_high_voltage_underground,
+                        buffer_values["hoogspanning_ondergronds_buffer"],
+                        buffer_in_raster_space=buffer_in_raster_space,
                     )
                     # Possibly we may need to dissolve based on highest suitability value.
             elif "Leiding" in gdf.columns:
                 gdf_gasunie_leiding = gdf.copy()
                 gdf_gasunie_leiding = gdf_gasunie_leiding[gdf_gasunie_leiding["StatusOperationeel"] == "In Bedrijf"]
                 gdf_gasunie_leiding["suitability_value"] = weight_values["gasunie_leidingen"]
-                gdf_gasunie_leiding["geometry"] = gdf_gasunie_leiding["geometry"].buffer(
-                    buffer_values["gasunie_leidingen_buffer"]
+                gdf_gasunie_leiding = VectorPreprocessorBase.buffer_geometries(
+                    gdf_gasunie_leiding,
+                    buffer_values["gasunie_leidingen_buffer"],
+                    buffer_in_raster_space=buffer_in_raster_space,
                 )
                 gdf_gasunie_leiding = gdf_gasunie_leiding.dissolve()
             elif "STATIONCOMPLEX" in gdf.columns:
@@ -39,34 +39,40 @@ class SmallAboveGroundObstacles(VectorPreprocessorBase):
                 bgt_scheiding.append(gdf)
             else:
                 bgt_others.append(gdf)
-        gdf_bgt_scheiding = pd.concat(bgt_scheiding)
-        validate_values_to_reclassify(gdf_bgt_scheiding["bgt-type"].unique().tolist(), weight_values)
-        logger.info("Setting suitability values.")
-        # Function is always filled in.
-        gdf_bgt_scheiding["sv_1"] = gdf_bgt_scheiding["bgt-type"]
-        gdf_bgt_scheiding["sv_1"] = gdf_bgt_scheiding["sv_1"].case_when(
-            [(gdf_bgt_scheiding["sv_1"].eq(i), weight_values[i]) for i in weight_values]
-        )
-        gdf_bgt_scheiding = gdf_bgt_scheiding[gdf_bgt_scheiding["bgt-type"] != "niet-bgt"]
-        gdf_bgt_scheiding["suitability_value"] = gdf_bgt_scheiding["sv_1"]
+        # Blocks of a project area do not necessarily contain both types of obstacles.
+        gdfs_to_merge = []
+        if bgt_scheiding:
+            gdf_bgt_scheiding = pd.concat(bgt_scheiding)
+            validate_values_to_reclassify(gdf_bgt_scheiding["bgt-type"].unique().tolist(), weight_values)
+            logger.info("Setting suitability values.")
+            # Function is always filled in.
+            gdf_bgt_scheiding["sv_1"] = gdf_bgt_scheiding["bgt-type"]
+            gdf_bgt_scheiding["sv_1"] = gdf_bgt_scheiding["sv_1"].case_when(
+                [(gdf_bgt_scheiding["sv_1"].eq(i), weight_values[i]) for i in weight_values]
+            )
+            gdf_bgt_scheiding = gdf_bgt_scheiding[gdf_bgt_scheiding["bgt-type"] != "niet-bgt"]
+            gdf_bgt_scheiding["suitability_value"] = gdf_bgt_scheiding["sv_1"]
+            gdfs_to_merge.append(gdf_bgt_scheiding)
 
-        logger.info("Merging remaining obstacles.")
-        gdf_remaining_obstacles = pd.concat(bgt_others)
-        gdf_remaining_obstacles = gdf_remaining_obstacles.dropna(subset=["plus-type", "function"], how="all")
-        gdf_remaining_obstacles = gdf_remaining_obstacles[
-            ~(gdf_remaining_obstacles["function"].isin(["niet-bgt"]) & gdf_remaining_obstacles["plus-type"].isna())
-        ]
-        gdf_remaining_obstacles = gdf_remaining_obstacles[gdf_remaining_obstacles["function"] != "waardeOnbekend"]
-        validate_values_to_reclassify(gdf_remaining_obstacles["plus-type"].unique().tolist(), weight_values)
-        # plus-type is not always filled in.
-        gdf_remaining_obstacles["sv_1"] = gdf_remaining_obstacles["plus-type"]
-        gdf_remaining_obstacles["sv_1"] = gdf_remaining_obstacles["sv_1"].case_when(
-            [(gdf_remaining_obstacles["sv_1"].eq(i), weight_values[i]) for i in weight_values]
-        )
-        gdf_remaining_obstacles = gdf_remaining_obstacles[gdf_remaining_obstacles["plus-type"] != "waardeOnbekend"]
-        gdf_remaining_obstacles["suitability_value"] = gdf_remaining_obstacles["sv_1"]
+        if bgt_others:
+            logger.info("Merging remaining obstacles.")
+            gdf_remaining_obstacles = pd.concat(bgt_others)
+            gdf_remaining_obstacles = gdf_remaining_obstacles.dropna(subset=["plus-type", "function"], how="all")
+            gdf_remaining_obstacles = gdf_remaining_obstacles[
+                ~(gdf_remaining_obstacles["function"].isin(["niet-bgt"]) & gdf_remaining_obstacles["plus-type"].isna())
+            ]
+            gdf_remaining_obstacles = gdf_remaining_obstacles[gdf_remaining_obstacles["function"] != "waardeOnbekend"]
+            validate_values_to_reclassify(gdf_remaining_obstacles["plus-type"].unique().tolist(), weight_values)
+            # plus-type is not always filled in.
+            gdf_remaining_obstacles["sv_1"] = gdf_remaining_obstacles["plus-type"]
+            gdf_remaining_obstacles["sv_1"] = gdf_remaining_obstacles["sv_1"].case_when(
+                [(gdf_remaining_obstacles["sv_1"].eq(i), weight_values[i]) for i in weight_values]
+            )
+            gdf_remaining_obstacles = gdf_remaining_obstacles[gdf_remaining_obstacles["plus-type"] != "waardeOnbekend"]
+            gdf_remaining_obstacles["suitability_value"] = gdf_remaining_obstacles["sv_1"]
+            gdfs_to_merge.append(gdf_remaining_obstacles)
 
         # Merge dfs
-        gdf_merged = pd.concat([gdf_bgt_scheiding, gdf_remaining_obstacles])
+        gdf_merged = pd.concat(gdfs_to_merge)
 
         return gdf_merged
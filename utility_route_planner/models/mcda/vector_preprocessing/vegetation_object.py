@@ -8,7 +8,6 @@ from utility_route_planner.models.mcda.vector_preprocessing.base import VectorPr
 import structlog
 import geopandas as gpd
 import pandas as pd
-import numpy as np
 import typing
 
 from utility_route_planner.models.mcda.vector_preprocessing.validation import validate_values_to_reclassify
@@ -26,7 +25,11 @@ class VegetationObject(VectorPreprocessorBase):
         self, input_gdf: list[gpd.GeoDataFrame], criterion: RasterPresetCriteria
     ) -> gpd.GeoDataFrame:
         input_gdf = self._set_suitability_values(input_gdf, criterion.weight_values)
-        input_gdf = self._update_geometry_values(input_gdf, criterion.geometry_values)  # type: ignore
+        input_gdf = self._update_geometry_values(
+            input_gdf,
+            criterion.geometry_values,  # type: ignore
+            criterion.buffer_in_raster_space,
+        )
         return input_gdf
 
     @staticmethod
@@ -48,12 +51,14 @@ class VegetationObject(VectorPreprocessorBase):
         return gdf_vegetation
 
     @staticmethod
-    def _update_geometry_values(input_gdf: gpd.GeoDataFrame, buffer_values: dict):
+    def _update_geometry_values(
+        input_gdf: gpd.GeoDataFrame, buffer_values: dict, buffer_in_raster_space: bool = False
+    ) -> gpd.GeoDataFrame:
         logger.info("Updating geometry values.")
 
         for key, value in buffer_values.items():
-            input_gdf["geometry"] = np.where(
-                input_gdf["plus-type"].eq(key), input_gdf["geometry"].buffer(value), input_gdf["geometry"]
+            input_gdf = VectorPreprocessorBase.buffer_geometries(
+                input_gdf, value, input_gdf["plus-type"].eq(key).to_numpy(), buffer_in_raster_space
             )
 
         return input_gdf
@@ -7,7 +7,6 @@ from __future__ import annotations
 from utility_route_planner.models.mcda.vector_preprocessing.base import VectorPreprocessorBase
 import structlog
 import geopandas as gpd
-import numpy as np
 import typing
 
 from utility_route_planner.models.mcda.vector_preprocessing.validation import validate_values_to_reclassify
@@ -23,7 +22,11 @@ class Waterdeel(VectorPreprocessorBase):
 
     def specific_preprocess(self, input_gdf: list, criterion: RasterPresetCriteria) -> gpd.GeoDataFrame:
         input_gdf = self._set_suitability_values(input_gdf[0], criterion.weight_values)  # we only have 1 layer.
-        input_gdf = self._update_geometry_values(input_gdf, criterion.geometry_values)  # type: ignore
+        input_gdf = self._update_geometry_values(
+            input_gdf,
+            criterion.geometry_values,  # type: ignore
+            criterion.buffer_in_raster_space,
+        )
         return input_gdf
 
     @staticmethod
@@ -50,12 +53,14 @@ class Waterdeel(VectorPreprocessorBase):
         return input_gdf
 
     @staticmethod
-    def _update_geometry_values(input_gdf: gpd.GeoDataFrame, buffer_values: dict):
+    def _update_geometry_values(
+        input_gdf: gpd.GeoDataFrame, buffer_values: dict, buffer_in_raster_space: bool = False
+    ) -> gpd.GeoDataFrame:
         logger.info("Updating geometry values.")
 
         for key, value in buffer_values.items():
-            input_gdf["geometry"] = np.where(
-                input_gdf["class"].eq(key), input_gdf["geometry"].buffer(value), input_gdf["geometry"]
+            input_gdf = VectorPreprocessorBase.buffer_geometries(
+                input_gdf, value, input_gdf["class"].eq(key).to_numpy(), buffer_in_raster_space
             )
 
         return input_gdf
@@ -8,9 +8,12 @@ import rasterio.features
 import geopandas as gpd
 import shapely
 import structlog
+from affine import Affine
 from scipy.ndimage import generic_filter
 
 from settings import Config
+from utility_route_planner.models.mcda.mcda_datastructures import CostSurface
+from utility_route_planner.util.geo_utilities import mask_cost_surface
 from utility_route_planner.util.write import write_results_to_geopackage
 
 logger = structlog.get_logger(__name__)
@@ -20,7 +23,7 @@ class RouteEvaluationMetrics:
     def __init__(
         self,
         route_sota: shapely.LineString,
-        path_cost_surface: str,
+        path_cost_surface: str | CostSurface,
         route_human: shapely.LineString = shapely.LineString(),
         project_area: shapely.Polygon = shapely.Polygon(),
         similarity_threshold_m: float = 7.50,  # max width of a provincial road https://www.crow.nl/blog/zijn-80-km-wegen-te-smal/
@@ -81,30 +84,42 @@ class RouteEvaluationMetrics:
             logger.info(f"SOTA route overlaps: {self.route_similarity_sota}% with the human route.")
             logger.info(f"Human route overlaps: {self.route_similarity_human}% with the SOTA route.")
 
-    def get_route_cost_estimation(self, route: shapely.LineString, path_cost_surface: str) -> tuple:
+    @staticmethod
+    def mask_cost_surface(
+        path_cost_surface: str | CostSurface, shapes: list[shapely.Geometry], crop: bool
+    ) -> tuple[np.ndarray, Affine, int, tuple[int, int]]:
+        """
+        Mask the cost surface with the given shapes, either from disk or directly from memory.
+
+        :return: masked cost surface, its transform, the no data value and the shape of the complete cost surface.
+        """
+        if isinstance(path_cost_surface, CostSurface):
+            image, transform = mask_cost_surface(path_cost_surface, shapes, crop)
+            return image, transform, path_cost_surface.nodata, path_cost_surface.shape
+
         with rasterio.Env():
             with rasterio.open(path_cost_surface) as src:
-                raster_shape = src.shape
                 image, transform = rasterio.mask.mask(
                     src,
-                    [route],
+                    shapes,
                     all_touched=True,  # Include a pixel in the mask if it touches any of the shapes.
-                    crop=True,  # Crop result to input project area.
-                    filled=True,  # Values outside input project area will be set to nodata.
+                    crop=crop,  # Crop result to input shapes.
+                    filled=True,  # Values outside input shapes will be set to nodata.
                     indexes=1,
                 )
-                no_data = src.nodata
+                return image, transform, src.nodata, src.shape
 
-                intersecting_cells = list(
-                    rasterio.features.shapes(image.astype("uint8"), transform=transform, connectivity=8)
-                )
-                gdf_cells = gpd.GeoDataFrame(
-                    [[i[1], shapely.Polygon(i[0]["coordinates"][0])] for i in intersecting_cells],
-                    columns=["suitability_value", "geometry"],
-                    crs=28992,
-                )
+    def get_route_cost_estimation(self, route: shapely.LineString, path_cost_surface: str | CostSurface) -> tuple:
+        image, transform, no_data, raster_shape = self.mask_cost_surface(path_cost_surface, [route], crop=True)
+
+        intersecting_cells = list(rasterio.features.shapes(image.astype("uint8"), transform=transform, connectivity=8))
+        gdf_cells = gpd.GeoDataFrame(
+            [[i[1], shapely.Polygon(i[0]["coordinates"][0])] for i in intersecting_cells],
+            columns=["suitability_value", "geometry"],
+            crs=28992,
+        )
 
-                gdf_cells = gdf_cells[gdf_cells["suitability_value"] != no_data]
+        gdf_cells = gdf_cells[gdf_cells["suitability_value"] != no_data]
 
         gdf_route_segments = gpd.GeoDataFrame(geometry=gpd.GeoSeries(route), crs=28992).overlay(
             gdf_cells, how="intersection", keep_geom_type=False
@@ -154,19 +169,11 @@ class RouteEvaluationMetrics:
 
         return round(overlap_percentage_sota, 2), round(overlap_percentage_human, 2)
 
-    def get_number_of_nodes_edges(self, path_cost_surface: str, project_area: shapely.Polygon) -> tuple[int, int]:
+    def get_number_of_nodes_edges(
+        self, path_cost_surface: str | CostSurface, project_area: shapely.Polygon
+    ) -> tuple[int, int]:
         """Calculates the graph size as used by the LCPA algorithm."""
-        with rasterio.Env():
-            with rasterio.open(path_cost_surface) as src:
-                no_data = src.nodata
-                image, transform = rasterio.mask.mask(
-                    src,
-                    [project_area],
-                    all_touched=True,  # Include a pixel in the mask if it touches any of the shapes.
-                    crop=False,  # Crop result to input project area.
-                    filled=True,  # Values outside input project area will be set to nodata.
-                    indexes=1,
-                )
+        image, _, no_data, _ = self.mask_cost_surface(path_cost_surface, [project_area], crop=False)
 
         nodes, edges = self.count_cells(image, no_data)
         return nodes, edges
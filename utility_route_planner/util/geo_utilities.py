@@ -4,13 +4,19 @@
 
 from pathlib import Path
 
+import affine
+import numpy as np
 import rasterio
 import rasterio.mask
+import rasterio.windows
 import shapely
 import structlog
 import geopandas as gpd
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask, geometry_window, rasterize
 
 from utility_route_planner.models.mcda.exceptions import InvalidRasterValues
+from utility_route_planner.models.mcda.mcda_datastructures import CostSurface
 
 logger = structlog.get_logger(__name__)
 
@@ -35,6 +41,23 @@ def coordinates_to_array_index(
     return y_index, x_index  # Note that the order must be y, x because of indexing on the suitability raster.
 
 
+def coordinates_to_array_indices(
+    x: np.ndarray, y: np.ndarray, upper_left_x: float, upper_left_y: float, x_size: float, y_size: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized coordinates_to_array_index for arrays of coordinates. Coordinates outside the raster are rounded down
+    as well, such that they result in indices outside the raster instead of in its first row or column. The index is
+    computed using the inverse geotransform like GDAL does, such that coordinates on the edge of a cell are assigned to
+    the same cell as when they are rasterized.
+
+    :return: tuple containing the row and column indices of the rastercells.
+    """
+    x_index = np.floor(-upper_left_x / x_size + np.asarray(x) * (1 / x_size)).astype("int64")
+    y_index = np.floor(-upper_left_y / y_size + np.asarray(y) * (1 / y_size)).astype("int64")
+
+    return y_index, x_index
+
+
 def array_indices_to_linestring(raster_metadata: tuple, array_indices: list) -> shapely.LineString:
     """
     Create a linestring from the raster by stringing the centroids together for each cost path cell.
@@ -75,6 +98,30 @@ def align_linestring(linestring: shapely.LineString, cell_size: float) -> shapel
     return aligned_linestring
 
 
+def geometries_to_array_indices(
+    geometries: list[shapely.Geometry], geotransform: tuple, shape: tuple[int, int]
+) -> tuple[list[tuple[int, int]], list[int]]:
+    """
+    Rasterize the geometries to the indices of all cells they touch, for example the cells of existing cables.
+
+    :param geometries: points, lines or polygons in the crs of the raster.
+    :param geotransform: metadata of the raster from gdal.
+    :param shape: height and width of the raster.
+    :return: row and column index of each touched cell and the index of the geometry touching it. A cell touched by
+        multiple geometries belongs to the last of them.
+    """
+    geometry_ids = rasterize(
+        [(geometry, idx + 1) for idx, geometry in enumerate(geometries) if not shapely.is_empty(geometry)],
+        out_shape=shape,
+        transform=affine.Affine.from_gdal(*geotransform),
+        fill=0,
+        all_touched=True,
+        dtype="int32",
+    )
+    rows, columns = np.nonzero(geometry_ids)
+    return list(zip(rows.tolist(), columns.tolist())), (geometry_ids[rows, columns] - 1).tolist()
+
+
 def get_first_last_point_from_linestring(linestring: shapely.LineString) -> tuple:
     """
     Get the first and last point of a linestring.
@@ -103,23 +150,63 @@ def get_empty_geodataframe() -> gpd.GeoDataFrame:
     )
 
 
-def load_suitability_raster_data(path_raster: Path | str, project_area: shapely.Polygon):
+def read_cost_surface(path_raster: Path | str) -> CostSurface:
     """
-    Read only the intersection of the project area with the large suitability raster from S3 (or local).
+    Read a suitability raster from disk as cost surface, such that it is decoded only once when used multiple times.
     """
-    logger.info(f"Loading {path_raster} based on input project area.")
+    with rasterio.open(path_raster) as src:
+        return CostSurface(src.read(1), src.transform, src.nodata, src.crs, str(path_raster))
 
-    with rasterio.Env():
-        with rasterio.open(path_raster) as src:
-            image, transform = rasterio.mask.mask(
-                src,
-                [project_area],
-                all_touched=True,  # Include a pixel in the mask if it touches any of the shapes.
-                crop=True,  # Crop result to input project area.
-                filled=True,  # Values outside input project area will be set to nodata.
-                indexes=1,
-            )
-            no_data = src.nodata
+
+def mask_cost_surface(
+    cost_surface: CostSurface, shapes: list[shapely.Geometry], crop: bool = True
+) -> tuple[np.ndarray, affine.Affine]:
+    """
+    In memory equivalent of rasterio.mask.mask as used on the suitability raster: all touched cells are included and
+    values outside the shapes are filled with no data.
+
+    :param cost_surface: suitability raster in memory.
+    :param shapes: geometries to mask the cost surface with.
+    :param crop: crop the result to the bounds of the shapes.
+    :return: masked copy of the cost surface and its transform.
+    """
+    if crop:
+        try:
+            window = geometry_window(cost_surface, shapes)
+        except WindowError:
+            raise ValueError("Input shapes do not overlap raster.")
+        transform = rasterio.windows.transform(window, cost_surface.transform)
+        image = cost_surface.array[window.toslices()]
+    else:
+        transform = cost_surface.transform
+        image = cost_surface.array
+
+    shape_mask = geometry_mask(shapes, transform=transform, out_shape=image.shape, all_touched=True)
+    return np.where(shape_mask, cost_surface.nodata, image).astype(image.dtype), transform
+
+
+def load_suitability_raster_data(path_raster: Path | str | CostSurface, project_area: shapely.Polygon):
+    """
+    Read only the intersection of the project area with the large suitability raster from S3 (or local). A cost
+    surface which is already in memory is masked directly, avoiding to decode the raster again.
+    """
+    if isinstance(path_raster, CostSurface):
+        logger.info("Loading cost surface from memory based on input project area.")
+        image, transform = mask_cost_surface(path_raster, [project_area])
+        no_data = path_raster.nodata
+    else:
+        logger.info(f"Loading {path_raster} based on input project area.")
+        with rasterio.Env():
+            with rasterio.open(path_raster) as src:
+                image, transform = rasterio.mask.mask(
+                    src,
+                    [project_area],
+                    all_touched=True,  # Include a pixel in the mask if it touches any of the shapes.
+                    crop=True,  # Crop result to input project area.
+                    filled=True,  # Values outside input project area will be set to nodata.
+                    indexes=1,
+                )
+                no_data = src.nodata
 
     if len(image) < 1:
         raise InvalidRasterValues("Unexpected values retrieved from suitability raster. Check project area.")
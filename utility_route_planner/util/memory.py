@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: Contributors to the utility-route-project and Alliander N.V.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass
+class PeakMemory:
+    peak_bytes: int = 0
+
+
+@contextmanager
+def trace_peak_memory(description: str, enabled: bool = False):
+    """
+    Trace the peak memory allocated within the context, which includes numpy arrays. The peak is logged and available
+    on the yielded PeakMemory after the context is closed.
+
+    :param description: description of the traced code in the log message.
+    :param enabled: trace the peak memory, tracemalloc slows down the traced code considerably so it is off by default.
+        When disabled the peak stays 0 and nothing is traced.
+    """
+    if not enabled:
+        yield PeakMemory()
+        return
+    is_tracing = tracemalloc.is_tracing()
+    if not is_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    memory_at_start, _ = tracemalloc.get_traced_memory()
+    peak_memory = PeakMemory()
+    try:
+        yield peak_memory
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if not is_tracing:
+            tracemalloc.stop()
+        peak_memory.peak_bytes = peak - memory_at_start
+        logger.info(f"Peak memory of {description}: {peak_memory.peak_bytes / 1e6:.1f} MB.")
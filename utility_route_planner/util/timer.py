@@ -2,6 +2,7 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import functools
 import time
 import structlog
 
@@ -11,6 +12,8 @@ logger = structlog.get_logger(__name__)
 
 
 def time_function(func):
+    # Keep the name of the decorated function, decorated methods can then be pickled, e.g., for process pools.
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if Config.DEBUG:
             start_time = time.time()